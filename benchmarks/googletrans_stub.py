@@ -0,0 +1,41 @@
+"""
+Stand-in for the googletrans Translator used by the googletrans fallback provider.
+
+googletrans talks to translate.google.com over HTTPS with a scraped token, so
+it cannot be pointed at a local server. run_server.py swaps this stub in
+instead. Like googletrans, its calls block, and the provider runs them on
+its dedicated executor.
+"""
+import time
+import random
+
+class StubTranslation:
+    def __init__(self, text, src, dest):
+        self.text = text
+        self.src = src
+        self.dest = dest
+
+class StubDetection:
+    def __init__(self, lang):
+        self.lang = lang
+        self.confidence = 1.0
+
+class StubTranslator:
+    """Drop-in for googletrans.Translator with configurable latency"""
+
+    def __init__(self, latency_ms=80, jitter_ms=20):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.calls = 0
+
+    def _delay(self):
+        self.calls += 1
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+    def detect(self, text):
+        self._delay()
+        return StubDetection("en")
+
+    def translate(self, text, dest="en", src=None):
+        self._delay()
+        return StubTranslation(f"[{dest}] {text}", src or "en", dest)
@@ -0,0 +1,323 @@
+"""
+WebSocket and REST load generator for the voice assistant.
+
+Simulates concurrent clients sending translate_text and process_audio
+messages over /api/ws (or POSTing to /api/transcribe_audio_upload), and
+reports latency percentiles, throughput and server memory growth.
+
+With --spawn, the mock Groq server and the app (with the translation stand-ins) are
+started as subprocesses, so one command runs a complete offline benchmark:
+    python benchmarks/load_test.py --spawn --clients 50 --duration 30
+
+Use --json for a machine-readable report, and --max-p95-ms / --max-error-rate
+to make the run fail on regressions.
+"""
+import os
+import sys
+import io
+import json
+import math
+import time
+import wave
+import struct
+import random
+import asyncio
+import argparse
+import subprocess
+from pathlib import Path
+import aiohttp
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+
+PHRASES = [
+    "Good morning, how are you today?",
+    "Could you please tell me where the train station is?",
+    "I would like to order a coffee with milk",
+    "The meeting has been moved to Thursday afternoon",
+    "Thank you very much for your help",
+    "What time does the museum open tomorrow?",
+    "My flight was delayed by two hours",
+    "Please speak a little more slowly",
+]
+
+def make_test_audio(duration_ms=1500, sample_rate=16000):
+    """Generate a WAV file with a short tone, standing in for recorded speech"""
+    samples = bytearray()
+    for i in range(sample_rate * duration_ms // 1000):
+        value = int(8000 * math.sin(2 * math.pi * 220 * i / sample_rate))
+        samples += struct.pack("<h", value)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(bytes(samples))
+    return buffer.getvalue()
+
+def binary_frame(header, payload):
+    """Encode a binary WebSocket frame: 2-byte header length, JSON header, raw audio"""
+    header_bytes = json.dumps(header).encode("utf-8")
+    return struct.pack(">H", len(header_bytes)) + header_bytes + payload
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+class LoadStats:
+    """Latencies and outcomes collected by all simulated clients"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.outcomes = {}
+
+    def record(self, kind, outcome, latency=None):
+        key = (kind, outcome)
+        self.outcomes[key] = self.outcomes.get(key, 0) + 1
+        if latency is not None and outcome == "ok":
+            self.latencies.setdefault(kind, []).append(latency)
+
+    def report(self, elapsed):
+        report = {"elapsed_s": round(elapsed, 2), "kinds": {}}
+        total_ok = 0
+        total = 0
+        for (kind, outcome), count in sorted(self.outcomes.items()):
+            entry = report["kinds"].setdefault(kind, {"outcomes": {}})
+            entry["outcomes"][outcome] = count
+            total += count
+            if outcome == "ok":
+                total_ok += count
+        for kind, values in self.latencies.items():
+            values.sort()
+            report["kinds"][kind].update({
+                "p50_ms": round(percentile(values, 0.50) * 1000, 1),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 1),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 1),
+                "max_ms": round(values[-1] * 1000, 1)
+            })
+        all_latencies = sorted(value for values in self.latencies.values() for value in values)
+        report["messages"] = total
+        report["messages_per_s"] = round(total_ok / elapsed, 2) if elapsed else 0.0
+        report["error_rate"] = round(1 - total_ok / total, 4) if total else 0.0
+        report["p95_ms"] = round(percentile(all_latencies, 0.95) * 1000, 1) if all_latencies else None
+        return report
+
+async def websocket_client(session, url, stats, deadline, audio, audio_ratio, think_time, timeout):
+    """One simulated browser: sends a message, waits for its final frame, repeats"""
+    async with session.ws_connect(url, max_msg_size=0) as ws:
+        # The server announces the session first
+        await ws.receive_json()
+        while time.monotonic() < deadline:
+            trace_id = os.urandom(8).hex()
+            if random.random() < audio_ratio:
+                kind = "process_audio"
+                final_types = ("processed_speech",)
+                await ws.send_bytes(binary_frame(
+                    {"action": "process_audio", "language": "en", "trace_id": trace_id}, audio
+                ))
+            else:
+                kind = "translate_text"
+                final_types = ("translation_only",)
+                await ws.send_json({
+                    "action": "translate_text",
+                    "text": random.choice(PHRASES),
+                    "source_language": "en",
+                    "target_language": "de",
+                    "trace_id": trace_id
+                })
+            started = time.perf_counter()
+
+            outcome = None
+            while outcome is None:
+                try:
+                    message = await ws.receive(timeout=timeout)
+                except asyncio.TimeoutError:
+                    outcome = "timeout"
+                    break
+                if message.type != aiohttp.WSMsgType.TEXT:
+                    stats.record(kind, "disconnected")
+                    return
+                frame = json.loads(message.data)
+                if frame.get("trace_id") != trace_id:
+                    continue
+                if frame["type"] in final_types:
+                    translated = frame.get("translated_text", "")
+                    outcome = "error" if translated.startswith("Translation error") else "ok"
+                elif frame["type"] in ("busy", "error"):
+                    outcome = frame["type"]
+            stats.record(kind, outcome, time.perf_counter() - started)
+
+            if think_time:
+                await asyncio.sleep(random.uniform(0, 2 * think_time))
+
+async def rest_client(session, base_url, stats, deadline, audio, think_time):
+    """One simulated REST caller uploading audio for transcription and translation"""
+    url = f"{base_url}/api/transcribe_audio_upload?language=en"
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            async with session.post(url, data=audio, headers={"Content-Type": "audio/wav"}) as response:
+                body = await response.json()
+                if response.status == 503:
+                    outcome = "busy"
+                elif response.status != 200 or not body.get("success"):
+                    outcome = "error"
+                else:
+                    outcome = "ok"
+        except aiohttp.ClientError:
+            outcome = "error"
+        stats.record("transcribe_audio_upload", outcome, time.perf_counter() - started)
+        if think_time:
+            await asyncio.sleep(random.uniform(0, 2 * think_time))
+
+def read_rss_kb(pid):
+    """Resident memory of a process in KiB (Linux), or None"""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+async def wait_for_port(url, timeout=20):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(url):
+                    return
+            except aiohttp.ClientError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout} s")
+
+def spawn_stack(args):
+    """Start the mock Groq server and the app as subprocesses"""
+    mock = subprocess.Popen([
+        sys.executable, str(BENCHMARK_DIR / "mock_groq.py"),
+        "--port", str(args.mock_port),
+        "--latency-ms", str(args.mock_latency_ms),
+        "--stt-latency-ms", str(args.mock_stt_latency_ms),
+        "--error-rate", str(args.mock_error_rate),
+        "--rate-limit-rate", str(args.mock_rate_limit_rate)
+    ])
+    server_args = [
+        sys.executable, str(BENCHMARK_DIR / "run_server.py"),
+        "--port", str(args.port),
+        "--mock-url", f"http://127.0.0.1:{args.mock_port}"
+    ]
+    if args.disable_cache:
+        server_args.append("--disable-cache")
+    server = subprocess.Popen(server_args)
+    return [mock, server]
+
+async def run(args):
+    base_url = args.url.rstrip("/")
+    processes = spawn_stack(args) if args.spawn else []
+    try:
+        await wait_for_port(f"{base_url}/api/stats")
+        server_pid = processes[1].pid if processes else args.server_pid
+        rss_before = read_rss_kb(server_pid) if server_pid else None
+
+        audio = make_test_audio(args.audio_ms)
+        stats = LoadStats()
+        ws_url = base_url.replace("http", "ws", 1) + "/api/ws"
+
+        started = time.monotonic()
+        deadline = started + args.duration
+        connector = aiohttp.TCPConnector(limit=0)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            clients = [
+                websocket_client(
+                    session, ws_url, stats, deadline, audio, args.audio_ratio, args.think_time, args.timeout
+                )
+                for _ in range(args.clients)
+            ] + [
+                rest_client(session, base_url, stats, deadline, audio, args.think_time)
+                for _ in range(args.rest_clients)
+            ]
+            results = await asyncio.gather(*clients, return_exceptions=True)
+            failed_clients = [result for result in results if isinstance(result, Exception)]
+            elapsed = time.monotonic() - started
+
+            async with session.get(f"{base_url}/api/stats") as response:
+                server_stats = await response.json()
+
+        report = stats.report(elapsed)
+        report["clients"] = args.clients
+        report["rest_clients"] = args.rest_clients
+        report["failed_clients"] = len(failed_clients)
+        rss_after = read_rss_kb(server_pid) if server_pid else None
+        if rss_before is not None and rss_after is not None:
+            report["server_rss_kb"] = {"before": rss_before, "after": rss_after, "growth": rss_after - rss_before}
+        report["server"] = {
+            key: server_stats.get(key) for key in ("translation_cache", "coalescing", "batching", "rate_limiter")
+        }
+        return report
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+def print_report(report):
+    print(f"Duration: {report['elapsed_s']} s, clients: {report['clients']} WebSocket + {report['rest_clients']} REST")
+    print(f"Throughput: {report['messages_per_s']} messages/s, error rate: {report['error_rate']:.2%}")
+    for kind, entry in report["kinds"].items():
+        latency = ""
+        if "p50_ms" in entry:
+            latency = f"p50 {entry['p50_ms']} ms, p95 {entry['p95_ms']} ms, p99 {entry['p99_ms']} ms, max {entry['max_ms']} ms"
+        print(f"  {kind}: {entry['outcomes']} {latency}")
+    if "server_rss_kb" in report:
+        rss = report["server_rss_kb"]
+        print(f"Server memory: {rss['before']} KiB -> {rss['after']} KiB ({rss['growth']:+d} KiB)")
+    if report["failed_clients"]:
+        print(f"WARNING: {report['failed_clients']} clients failed")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test the voice assistant offline")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of the app")
+    parser.add_argument("--clients", type=int, default=20, help="Concurrent WebSocket clients")
+    parser.add_argument("--rest-clients", type=int, default=0, help="Concurrent REST upload clients")
+    parser.add_argument("--duration", type=float, default=30, help="Test duration in seconds")
+    parser.add_argument("--audio-ratio", type=float, default=0.3, help="Share of process_audio messages")
+    parser.add_argument("--audio-ms", type=int, default=1500, help="Length of the test audio")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean pause between messages in seconds")
+    parser.add_argument("--timeout", type=float, default=30, help="Seconds to wait for the reply to a message")
+    parser.add_argument("--server-pid", type=int, help="PID of an already running server, for memory growth")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--max-p95-ms", type=float, help="Fail if the overall p95 latency is higher")
+    parser.add_argument("--max-error-rate", type=float, help="Fail if the share of failed messages is higher")
+
+    spawn = parser.add_argument_group("spawned stack (--spawn)")
+    spawn.add_argument("--spawn", action="store_true", help="Start the mock Groq server and the app")
+    spawn.add_argument("--port", type=int, default=8000)
+    spawn.add_argument("--mock-port", type=int, default=8765)
+    spawn.add_argument("--mock-latency-ms", type=float, default=150)
+    spawn.add_argument("--mock-stt-latency-ms", type=float, default=300)
+    spawn.add_argument("--mock-error-rate", type=float, default=0.0)
+    spawn.add_argument("--mock-rate-limit-rate", type=float, default=0.0)
+    spawn.add_argument("--disable-cache", action="store_true")
+    args = parser.parse_args()
+    if args.spawn:
+        args.url = f"http://127.0.0.1:{args.port}"
+    return args
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    failed = False
+    if args.max_p95_ms is not None and (report["p95_ms"] is None or report["p95_ms"] > args.max_p95_ms):
+        print(f"FAIL: p95 latency {report['p95_ms']} ms exceeds {args.max_p95_ms} ms")
+        failed = True
+    if args.max_error_rate is not None and report["error_rate"] > args.max_error_rate:
+        print(f"FAIL: error rate {report['error_rate']:.2%} exceeds {args.max_error_rate:.2%}")
+        failed = True
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,161 @@
+"""
+Local stand-in for the Groq API used by the benchmarks.
+
+Imitates the audio/transcriptions and chat/completions endpoints (including
+streamed completions and numbered batch prompts) with configurable latency,
+error rate and rate limiting, so load tests spend no API quota. It also
+answers the Google web translation endpoint used by the fallback provider.
+
+Usage:
+    python benchmarks/mock_groq.py --port 8765 --latency-ms 150 --error-rate 0.01
+"""
+import re
+import json
+import random
+import asyncio
+import argparse
+from aiohttp import web
+
+BATCH_LINE_PATTERN = re.compile(r"^\[(\d+)\] (.*)$", re.MULTILINE)
+
+class MockGroq:
+    """aiohttp application imitating the Groq endpoints the app uses"""
+
+    def __init__(self, latency_ms=150, jitter_ms=50, stt_latency_ms=300, error_rate=0.0,
+                 rate_limit_rate=0.0, retry_after=1.0, stream_chunks=5):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.stt_latency = stt_latency_ms / 1000
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.stream_chunks = stream_chunks
+
+        # Counters
+        self.requests = {"chat": 0, "audio": 0, "web_translate": 0}
+        self.errors = 0
+        self.rate_limited = 0
+
+    def create_app(self):
+        app = web.Application(client_max_size=32 * 1024 * 1024)
+        app.router.add_post("/openai/v1/chat/completions", self.chat_completions)
+        app.router.add_post("/openai/v1/audio/transcriptions", self.transcriptions)
+        app.router.add_post("/translate_a/single", self.web_translate)
+        app.router.add_get("/stats", self.stats)
+        return app
+
+    async def _delay(self, base):
+        await asyncio.sleep(max(0.0, base + random.uniform(-self.jitter, self.jitter)))
+
+    def _failure(self):
+        """Return an error response for a share of the requests, like an overloaded API"""
+        roll = random.random()
+        if roll < self.rate_limit_rate:
+            self.rate_limited += 1
+            return web.json_response(
+                {"error": {"message": "Rate limit reached"}},
+                status=429,
+                headers={"retry-after": str(self.retry_after)}
+            )
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.errors += 1
+            return web.json_response({"error": {"message": "Internal server error"}}, status=500)
+        return None
+
+    @staticmethod
+    def _translate(text):
+        return f"Übersetzt: {text}"
+
+    async def chat_completions(self, request):
+        self.requests["chat"] += 1
+        body = await request.json()
+        failure = self._failure()
+        if failure is not None:
+            return failure
+
+        user_prompt = body["messages"][-1]["content"]
+        numbered = BATCH_LINE_PATTERN.findall(user_prompt)
+        if numbered:
+            content = "\n".join(f"[{index}] {self._translate(text)}" for index, text in numbered)
+        else:
+            # The text to translate is the last paragraph, after any context and the instruction
+            content = self._translate(user_prompt.rsplit("\n\n", 1)[-1].strip())
+
+        if not body.get("stream"):
+            await self._delay(self.latency)
+            return web.json_response({
+                "choices": [{"message": {"role": "assistant", "content": content}}]
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        words = content.split(" ")
+        chunk_size = max(1, len(words) // self.stream_chunks)
+        for start in range(0, len(words), chunk_size):
+            await self._delay(self.latency / self.stream_chunks)
+            piece = " ".join(words[start:start + chunk_size])
+            if start:
+                piece = " " + piece
+            chunk = {"choices": [{"delta": {"content": piece}}]}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    async def transcriptions(self, request):
+        self.requests["audio"] += 1
+        form = await request.post()
+        failure = self._failure()
+        if failure is not None:
+            return failure
+
+        audio = form.get("file")
+        size = len(audio.file.read()) if audio is not None else 0
+        await self._delay(self.stt_latency)
+        return web.json_response({
+            "text": f"This is a transcription of {size} bytes of audio",
+            "language": form.get("language") or "english"
+        })
+
+    async def web_translate(self, request):
+        """Imitate Google's web translation endpoint (detection and translation in one response)"""
+        self.requests["web_translate"] += 1
+        await self._delay(self.latency / 2)
+        text = (await request.post()).get("q", "")
+        source_lang = request.query.get("sl", "auto")
+        target_lang = request.query.get("tl", "de")
+        return web.json_response([
+            [[f"[{target_lang}] {text}", text, None, None]],
+            None,
+            "en" if source_lang == "auto" else source_lang
+        ])
+
+    async def stats(self, request):
+        return web.json_response({
+            "requests": self.requests,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited
+        })
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Groq API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=150, help="Chat completion latency")
+    parser.add_argument("--jitter-ms", type=float, default=50, help="Random latency variation")
+    parser.add_argument("--stt-latency-ms", type=float, default=300, help="Transcription latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After of 429 responses in seconds")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    mock = MockGroq(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        stt_latency_ms=args.stt_latency_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after
+    )
+    web.run_app(mock.create_app(), host=args.host, port=args.port, print=None)
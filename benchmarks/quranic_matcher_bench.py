@@ -0,0 +1,77 @@
+"""
+Microbenchmark of the Quranic glossary matcher.
+
+Measures the per-message cost of Quranic detection and address extraction
+for growing glossaries, comparing the precompiled automaton with the former
+approach of testing every glossary entry with a substring check.
+
+Usage:
+    python benchmarks/quranic_matcher_bench.py --sizes 20 1000 10000 --messages 2000
+"""
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from services.quranic_matcher import QuranicMatcher, quranic_matcher
+
+ARABIC_LETTERS = "ابتثجحخدذرزسشصضطظعغفقكلمنهوي"
+
+MESSAGES = [
+    "يَا أَيُّهَا النَّبِيُّ اتَّقِ اللَّهَ وَلَا تُطِعِ الْكَافِرِينَ وَالْمُنَافِقِينَ",
+    "قُلْ هُوَ اللَّهُ أَحَدٌ اللَّهُ الصَّمَدُ",
+    "بسم الله الرحمن الرحيم الحمد لله رب العالمين",
+    "أين محطة القطار من فضلك",
+    "شكرا جزيلا على مساعدتك اليوم",
+    "يا أيها الناس اعبدوا ربكم الذي خلقكم والذين من قبلكم لعلكم تتقون",
+]
+
+def random_word(rng, length):
+    return "".join(rng.choice(ARABIC_LETTERS) for _ in range(length))
+
+def build_glossary(size, rng):
+    """The shipped glossary padded with random address forms up to size entries"""
+    addresses = dict(quranic_matcher.addresses)
+    while len(addresses) < size:
+        addresses[f"يا {random_word(rng, rng.randint(3, 7))} {random_word(rng, rng.randint(3, 7))}"] = "O ..."
+    return quranic_matcher.markers, addresses
+
+def naive_scan(markers, addresses, text):
+    """The former approach: one substring check per glossary entry"""
+    has_marker = any(marker in text for marker in markers)
+    found = [(address, addresses[address]) for address in addresses if address in text]
+    return has_marker, found
+
+def time_per_message(function, messages, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for message in messages:
+            function(message)
+    return (time.perf_counter() - start) / (rounds * len(messages)) * 1e6
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Microbenchmark of the Quranic glossary matcher")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 1000, 10000], help="Glossary sizes to measure")
+    parser.add_argument("--messages", type=int, default=2000, help="Messages scanned per measurement")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    rng = random.Random(args.seed)
+    rounds = max(1, args.messages // len(MESSAGES))
+
+    print(f"{'entries':>8} {'build ms':>9} {'automaton us/msg':>17} {'substring us/msg':>17}")
+    for size in args.sizes:
+        markers, addresses = build_glossary(size, rng)
+
+        start = time.perf_counter()
+        matcher = QuranicMatcher(markers, addresses)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        automaton_us = time_per_message(matcher.scan, MESSAGES, rounds)
+        naive_us = time_per_message(lambda text: naive_scan(markers, addresses, text), MESSAGES, rounds)
+        print(f"{len(addresses):>8} {build_ms:>9.1f} {automaton_us:>17.1f} {naive_us:>17.1f}")
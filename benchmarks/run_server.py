@@ -0,0 +1,63 @@
+"""
+Run the app against the local stand-ins instead of the real APIs.
+
+Groq and fallback translation requests go to mock_groq.py (GROQ_API_BASE_URL,
+FALLBACK_TRANSLATE_URL). With FALLBACK_TRANSLATION_PROVIDER=googletrans,
+googletrans is replaced by StubTranslator.
+
+Usage:
+    python benchmarks/run_server.py --port 8000 --mock-url http://127.0.0.1:8765
+"""
+import os
+import sys
+import argparse
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the app against the local API stand-ins")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--mock-url", default="http://127.0.0.1:8765", help="Base URL of mock_groq.py")
+    parser.add_argument("--googletrans-latency-ms", type=float, default=80)
+    parser.add_argument("--disable-cache", action="store_true", help="Measure without the translation cache")
+    return parser.parse_args()
+
+def create_app():
+    """Import the app with the stand-ins installed (also used by uvicorn workers)"""
+    from googletrans_stub import StubTranslator
+    import main
+    from src.api import routes
+    from services.fallback_translation import GoogletransProvider
+
+    if isinstance(routes.stt_service.provider, GoogletransProvider):
+        routes.stt_service.provider.translator = StubTranslator(
+            latency_ms=float(os.environ.get("BENCHMARK_GOOGLETRANS_LATENCY_MS", 80))
+        )
+    return main.app
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    # The services read their configuration when imported, so set it up first
+    mock_url = args.mock_url.rstrip("/")
+    os.environ["GROQ_API_BASE_URL"] = f"{mock_url}/openai/v1"
+    os.environ["FALLBACK_TRANSLATE_URL"] = f"{mock_url}/translate_a/single"
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    os.environ["BENCHMARK_GOOGLETRANS_LATENCY_MS"] = str(args.googletrans_latency_ms)
+    if args.disable_cache:
+        os.environ["TRANSLATION_CACHE_ENABLED"] = "false"
+
+    import uvicorn
+    uvicorn.run(
+        "run_server:create_app",
+        factory=True,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level="warning"
+    )
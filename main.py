@@ -1,8 +1,10 @@
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
+from contextlib import asynccontextmanager
 import os
+import time
 from pathlib import Path
 import sys
 
@@ -12,9 +14,62 @@ sys.path.append(str(BASE_DIR))
 sys.path.append(str(BASE_DIR / "src"))
 
 # Now import the api router
-from src.api.routes import router as api_router
+from src.api.routes import router as api_router, batch_job_manager
+from services.http_client import http_pool
+from services.translation_cache import translation_cache
+from services.state_backend import STATE_BACKEND, state_backend
+from services.fallback_translation import fallback_provider
+from services.audio_preprocessor import audio_preprocessor
+from services.metrics import metrics, new_trace_id, http_request_duration, http_requests_in_flight
 
-app = FastAPI(title="Voice Assistant")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Process-local state is not shared when uvicorn runs several workers
+    if int(os.getenv("WEB_CONCURRENCY", 1)) > 1 and STATE_BACKEND == "memory":
+        print("WARNING: Running several workers with STATE_BACKEND=memory. Set STATE_BACKEND=redis to share session context between workers.")
+    
+    # Open the shared Groq connection pool on startup and close it on shutdown
+    await http_pool.start()
+    # Batch jobs interrupted by the last shutdown resume here
+    if batch_job_manager is not None:
+        await batch_job_manager.start()
+    yield
+    if batch_job_manager is not None:
+        await batch_job_manager.close()
+    await http_pool.close()
+    await fallback_provider.close()
+    await audio_preprocessor.close()
+    if translation_cache is not None:
+        translation_cache.close()
+    await state_backend.close()
+
+app = FastAPI(title="Voice Assistant", lifespan=lifespan)
+
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    # Time every HTTP request by route and tag it with a trace ID
+    trace_id = request.headers.get("x-trace-id") or new_trace_id()
+    start = time.perf_counter()
+    http_requests_in_flight.inc()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Trace-Id"] = trace_id[:64]
+        return response
+    finally:
+        http_requests_in_flight.dec()
+        if metrics.enabled:
+            # Label by route template, not the raw path, to keep the label values bounded
+            route = request.scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - start, request.method, getattr(route, "path", "unmatched"), status
+            )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 # Include routes from the api module
 app.include_router(api_router, prefix="/api")
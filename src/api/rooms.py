@@ -0,0 +1,392 @@
+import os
+import re
+import json
+import uuid
+import asyncio
+from collections import deque
+from dotenv import load_dotenv
+from fastapi import WebSocketDisconnect
+from services.metrics import metrics, stage_duration, frames_sent
+from services.state_backend import STATE_BACKEND, state_backend
+
+# Load environment variables
+load_dotenv()
+ROOM_MAX_LISTENERS = int(os.getenv("ROOM_MAX_LISTENERS", 500))  # Listeners per room
+ROOM_LISTENER_QUEUE = int(os.getenv("ROOM_LISTENER_QUEUE", 64))  # Frames waiting to be sent per listener
+ROOM_DROP_POLICY = os.getenv("ROOM_DROP_POLICY", "drop_interim")  # "drop_interim", "drop_oldest" or "disconnect"
+ROOM_MAX_LANGUAGES = int(os.getenv("ROOM_MAX_LANGUAGES", 8))  # Target languages the listeners of a room can request
+ROOM_CLAIM_TTL = int(os.getenv("ROOM_CLAIM_TTL", 30))  # Seconds a worker's claim on its rooms outlives the worker
+ROOM_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+# Publisher frames that are forwarded to the listeners of a room
+BROADCAST_FRAME_TYPES = {"interim_speech", "translation_delta", "translation_only", "processed_speech", "stream_ended"}
+# Frames a slow listener can miss without losing results: a later frame supersedes them
+INTERIM_FRAME_TYPES = {"interim_speech", "translation_delta"}
+# Fields of a publisher frame that only concern the publisher's own connection
+PUBLISHER_FIELDS = ("seq",)
+
+room_frames_total = metrics.counter(
+    "room_frames_total",
+    "Room frames broadcast, dropped for slow listeners, or listeners disconnected as too slow",
+    ("event",)
+)
+
+class RoomError(Exception):
+    """Raised when a client cannot join a room"""
+
+    def __init__(self, message, close_code=1008):
+        super().__init__(message)
+        # WebSocket close code: 1008 (policy violation), or 1013 (try again later) if reconnecting may help
+        self.close_code = close_code
+
+class EncodedFrame:
+    """A frame serialized once and shared by all listeners of a room"""
+
+    __slots__ = ("type", "language", "text")
+
+    def __init__(self, frame_type, language, text):
+        self.type = frame_type
+        self.language = language
+        self.text = text
+
+class RoomListener:
+    """
+    One listener of a room. Frames are queued per listener and sent by the
+    listener's own task, so a slow connection only delays itself; when its
+    queue is full, the drop policy decides what it misses.
+    """
+
+    def __init__(self, websocket, languages=None, max_queue=ROOM_LISTENER_QUEUE, drop_policy=ROOM_DROP_POLICY):
+        """
+        Parameters:
+        - websocket: The accepted WebSocket connection
+        - languages: Target languages to receive (None for all of the room's languages)
+        """
+        self.websocket = websocket
+        self.languages = set(languages) if languages else None
+        self.max_queue = max_queue
+        self.drop_policy = drop_policy
+        self._queue = deque()
+        self._ready = asyncio.Event()
+        self.closed = False
+
+        # Counters
+        self.sent = 0
+        self.dropped = 0
+
+    def wants(self, frame):
+        """Check whether the listener follows the frame's target language"""
+        return self.languages is None or frame.language is None or frame.language in self.languages
+
+    def offer(self, frame):
+        """
+        Queue a frame without waiting.
+
+        Returns:
+        - The number of frames dropped to make room, or None if the listener
+          must be disconnected
+        """
+        if self.closed:
+            return 0
+        dropped = 0
+        if len(self._queue) >= self.max_queue:
+            if self.drop_policy == "disconnect":
+                self.close()
+                return None
+            dropped = self._drop_one(frame)
+            if not dropped:
+                # Only final frames are queued: the arriving interim frame is the one missed
+                self.dropped += 1
+                return 1
+        self._queue.append(frame)
+        self._ready.set()
+        return dropped
+
+    def _drop_one(self, incoming):
+        """Drop a queued frame: the oldest interim one first, under drop_oldest any oldest one"""
+        for index, queued in enumerate(self._queue):
+            if queued.type in INTERIM_FRAME_TYPES:
+                del self._queue[index]
+                self.dropped += 1
+                return 1
+        if self.drop_policy == "drop_oldest" or incoming.type not in INTERIM_FRAME_TYPES:
+            self._queue.popleft()
+            self.dropped += 1
+            return 1
+        return 0
+
+    def close(self):
+        self.closed = True
+        self._queue.clear()
+        self._ready.set()
+
+    async def run(self):
+        """Send queued frames until the listener disconnects or is closed"""
+        receiver = asyncio.create_task(self._receive_loop())
+        sender = asyncio.create_task(self._send_loop())
+        try:
+            done, pending = await asyncio.wait(
+                {receiver, sender}, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                task.result()
+        finally:
+            for task in (receiver, sender):
+                task.cancel()
+            await asyncio.gather(receiver, sender, return_exceptions=True)
+
+    async def _receive_loop(self):
+        """Listeners only receive; their messages are read to notice disconnects"""
+        while True:
+            frame = await self.websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+
+    async def _send_loop(self):
+        while not self.closed:
+            if not self._queue:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            frame = self._queue.popleft()
+            with metrics.timer(stage_duration, "send", "websocket", "none"):
+                await self.websocket.send_text(frame.text)
+            frames_sent.inc(frame.type)
+            self.sent += 1
+
+    def queued(self):
+        return len(self._queue)
+
+class Room:
+    """
+    A room in which one publisher speaks and any number of listeners follow.
+    The publisher's utterances are transcribed once on its own connection and
+    translated once per target language (the publisher's and those its
+    listeners follow); every result frame is serialized once and fanned out
+    to the send queues of the listeners following its language.
+    """
+
+    def __init__(self, room_id, max_listeners=ROOM_MAX_LISTENERS, max_languages=ROOM_MAX_LANGUAGES):
+        self.room_id = room_id
+        self.max_listeners = max_listeners
+        self.max_languages = max_languages
+        self.publisher = None
+        self.listeners = set()
+        # Number of listeners following each target language
+        self.language_counts = {}
+
+        # Counters
+        self.broadcast_frames = 0
+        self.broadcast_bytes = 0
+        self.dropped = 0
+        self.disconnected = 0
+
+    def broadcast(self, frame):
+        """Forward a frame sent to the publisher to all listeners"""
+        frame_type = frame.get("type")
+        if frame_type not in BROADCAST_FRAME_TYPES or not self.listeners:
+            return
+        shared = {key: value for key, value in frame.items() if key not in PUBLISHER_FIELDS}
+        shared["room"] = self.room_id
+        encoded = EncodedFrame(frame_type, frame.get("target_language"), json.dumps(shared, ensure_ascii=False))
+        self.broadcast_frames += 1
+        self.broadcast_bytes += len(encoded.text)
+        room_frames_total.inc("broadcast")
+
+        for listener in list(self.listeners):
+            if not listener.wants(encoded):
+                continue
+            dropped = listener.offer(encoded)
+            if dropped is None:
+                # Too slow under the disconnect policy; its connection handler closes the socket
+                self.remove_listener(listener)
+                self.disconnected += 1
+                room_frames_total.inc("disconnected")
+            elif dropped:
+                self.dropped += dropped
+                room_frames_total.inc("dropped", amount=dropped)
+
+    def languages(self):
+        """Target languages followed by the listeners"""
+        return list(self.language_counts)
+
+    def add_listener(self, listener):
+        """
+        Raises:
+        - RoomError: If the room is full or the listener's languages would exceed the room's limit
+        """
+        if len(self.listeners) >= self.max_listeners:
+            raise RoomError("The room is full")
+        new_languages = (listener.languages or set()) - set(self.language_counts)
+        if len(self.language_counts) + len(new_languages) > self.max_languages:
+            raise RoomError("The room already serves the maximum number of languages")
+        self.listeners.add(listener)
+        for language in listener.languages or ():
+            self.language_counts[language] = self.language_counts.get(language, 0) + 1
+
+    def remove_listener(self, listener):
+        if listener not in self.listeners:
+            return
+        self.listeners.discard(listener)
+        for language in listener.languages or ():
+            self.language_counts[language] -= 1
+            if not self.language_counts[language]:
+                del self.language_counts[language]
+
+    def stats(self):
+        return {
+            "has_publisher": self.publisher is not None,
+            "listeners": len(self.listeners),
+            "languages": dict(self.language_counts),
+            "broadcast_frames": self.broadcast_frames,
+            "broadcast_bytes": self.broadcast_bytes,
+            "dropped": self.dropped,
+            "disconnected": self.disconnected
+        }
+
+class RoomRegistry:
+    """
+    Rooms of this worker, created on first join and removed when the last client leaves.
+    A room's publisher and listeners must be connected to the same worker, as
+    frames are fanned out in process. With a shared state backend, the first
+    worker a client of a room reaches claims the room, and joins of the room
+    reaching any other worker are rejected (instead of a listener silently
+    receiving nothing). A claim is refreshed while the room exists, and expires
+    ROOM_CLAIM_TTL seconds after its worker stopped.
+    """
+
+    def __init__(self, backend=None, claim_ttl=ROOM_CLAIM_TTL):
+        """
+        Parameters:
+        - backend: State backend shared by all workers, or None for a single worker
+        """
+        self.rooms = {}
+        self.backend = backend
+        self.claim_ttl = claim_ttl
+        self.worker_id = uuid.uuid4().hex
+        self._refresher = None
+
+        # Counters
+        self.rejected = 0
+
+    @staticmethod
+    def is_valid_room_id(room_id):
+        return bool(room_id) and ROOM_ID_PATTERN.fullmatch(room_id) is not None
+
+    @staticmethod
+    def _claim_key(room_id):
+        return f"room_worker:{room_id}"
+
+    async def _claim(self, room_id):
+        """
+        Claim a room for this worker, unless it already has the room.
+
+        Raises:
+        - RoomError: If another worker has the room
+        """
+        if self.backend is None or room_id in self.rooms:
+            return
+        key = self._claim_key(room_id)
+        try:
+            if not await self.backend.set_if_missing(key, self.worker_id, ttl=self.claim_ttl):
+                owner = await self.backend.get(key)
+                if owner is not None and owner != self.worker_id:
+                    self.rejected += 1
+                    raise RoomError("The room is served by another worker process; reconnect to reach it", 1013)
+                await self.backend.set(key, self.worker_id, ttl=self.claim_ttl)
+        except RoomError:
+            raise
+        except Exception as e:
+            # Without the shared backend, the room is served by this worker alone
+            print(f"WARNING: Could not claim room {room_id}: {str(e)}")
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.create_task(self._refresh_claims())
+
+    async def _refresh_claims(self):
+        """Keep the claims on this worker's rooms alive while it has rooms"""
+        while self.rooms:
+            await asyncio.sleep(self.claim_ttl / 3)
+            for room_id in list(self.rooms):
+                key = self._claim_key(room_id)
+                try:
+                    owner = await self.backend.get(key)
+                    if owner is None or owner == self.worker_id:
+                        await self.backend.set(key, self.worker_id, ttl=self.claim_ttl)
+                    else:
+                        print(f"WARNING: Room {room_id} was claimed by another worker")
+                except Exception as e:
+                    print(f"WARNING: Could not refresh the claim on room {room_id}: {str(e)}")
+
+    async def _release(self, room_id):
+        """Give up this worker's claim on a room it no longer has"""
+        key = self._claim_key(room_id)
+        try:
+            if await self.backend.get(key) == self.worker_id and room_id not in self.rooms:
+                await self.backend.delete(key)
+        except Exception as e:
+            print(f"WARNING: Could not release room {room_id}: {str(e)}")
+
+    async def _get_room(self, room_id):
+        if not self.is_valid_room_id(room_id):
+            raise RoomError("Invalid room name")
+        await self._claim(room_id)
+        room = self.rooms.get(room_id)
+        if room is None:
+            room = Room(room_id)
+            self.rooms[room_id] = room
+        return room
+
+    async def join_publisher(self, room_id, session_id):
+        """
+        Register the publisher of a room.
+
+        Raises:
+        - RoomError: If the room name is invalid, another worker has the room or it already has a publisher
+        """
+        room = await self._get_room(room_id)
+        if room.publisher is not None:
+            raise RoomError("The room already has a publisher")
+        room.publisher = session_id
+        return room
+
+    async def join_listener(self, room_id, listener):
+        """
+        Add a listener to a room.
+
+        Raises:
+        - RoomError: If the room name is invalid, another worker has the room, or the room
+          is full or serves too many languages
+        """
+        room = await self._get_room(room_id)
+        try:
+            room.add_listener(listener)
+        except RoomError:
+            await self._remove_if_empty(room)
+            raise
+        return room
+
+    async def leave(self, room, session_id=None, listener=None):
+        """Remove the publisher (by session ID) or a listener from a room"""
+        if session_id is not None and room.publisher == session_id:
+            room.publisher = None
+        if listener is not None:
+            listener.close()
+            room.remove_listener(listener)
+        await self._remove_if_empty(room)
+
+    async def _remove_if_empty(self, room):
+        if room.publisher is None and not room.listeners and self.rooms.get(room.room_id) is room:
+            del self.rooms[room.room_id]
+            if self.backend is not None:
+                await self._release(room.room_id)
+
+    def stats(self):
+        return {
+            "rooms": len(self.rooms),
+            "rejected_joins": self.rejected,
+            "listeners": sum(len(room.listeners) for room in self.rooms.values()),
+            "by_room": {room_id: room.stats() for room_id, room in self.rooms.items()}
+        }
+
+# Rooms of this worker; with shared state, workers claim rooms so clients of a room are not split up
+room_registry = RoomRegistry(state_backend if STATE_BACKEND == "redis" else None)
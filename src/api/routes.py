@@ -1,18 +1,39 @@
-from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 import json
+import base64
+from collections import Counter
 import os
+import re
 from dotenv import load_dotenv
 from services.stt_service import STTService
 from services.whisper_stt_service import WhisperSTTService
 from services.groq_translation_service import GroqTranslationService
+from services.http_client import http_pool
+from services.translation_cache import translation_cache
+from services.session_store import session_store
+from services.streaming_stt import StreamingSTTEngine, STREAM_SAMPLE_RATE
+from services.rate_limiter import ServiceBusyError, rate_limiter
+from services.metrics import metrics
+from services.speculative_translation import SpeculativeTranslator
+from services.text_utils import is_error_translation, join_segments
+from services.long_audio import LongAudioTranscriber
+from services.batch_jobs import BATCH_MAX_FILES, BatchJobError, BatchJobManager
+from services.translation_router import TranslationBackend, TranslationError, TranslationRouter
+from .ws_pipeline import ConnectionPipeline
+from .rooms import RoomError, RoomListener, room_registry
 import asyncio
 
 # Load environment variables
 load_dotenv()
 USE_WHISPER = os.getenv("USE_WHISPER", "true").lower() == "true"  # Default to using Whisper
 USE_GROQ = os.getenv("USE_GROQ", "true").lower() == "true"  # Default to using Groq for contextual translation
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 25 * 1024 * 1024))  # Groq's upload limit for audio files
+UPLOAD_CHUNK_SIZE = 64 * 1024
+MAX_TARGET_LANGUAGES = int(os.getenv("MAX_TARGET_LANGUAGES", 4))  # Target languages a client can subscribe to at once
+DEFAULT_TARGET_LANGUAGE = "de"  # Translate to German unless the client asks for other languages
+LANGUAGE_CODE_PATTERN = re.compile(r"[a-z]{2,3}(-[a-z]{2,4})?")
 
 router = APIRouter()
 
@@ -20,6 +41,8 @@ router = APIRouter()
 stt_service = STTService()
 whisper_stt_service = WhisperSTTService() if USE_WHISPER else None
 groq_service = GroqTranslationService() if USE_GROQ else None
+streaming_stt_engine = StreamingSTTEngine(whisper_stt_service) if whisper_stt_service else None
+long_audio_transcriber = LongAudioTranscriber(whisper_stt_service) if whisper_stt_service else None
 
 # Pydantic models for request validation
 class SpeechToTextRequest(BaseModel):
@@ -31,208 +54,843 @@ class AudioToTextRequest(BaseModel):
     audio_data: str  # Base64 encoded audio data
     language: str = "auto"
     target_language: str = "de"  # Default to German
+    target_languages: list = []  # Optional list of target languages, translated concurrently
+    session_id: str = ""  # Optional session ID to keep translation context across requests
+    long_audio: bool = False  # Transcribe in parallel segments and stream the results as NDJSON
 
-# Store session IDs for continuous context
-client_sessions = {}
+class BatchJobRequest(BaseModel):
+    paths: list = []  # Recordings on the server, within BATCH_INPUT_DIRS
+    directory: str = ""  # Server directory whose recordings are all added
+    recursive: bool = False  # Include the directory's subdirectories
+    pattern: str = "*"  # Glob pattern the recordings' names must match
+    language: str = "auto"
+    target_languages: list = []  # Languages every segment is translated into (German if empty)
+    priority: int = 0  # Jobs with a higher priority are processed first
 
-# Active WebSocket connections
+# Active WebSocket connections of this worker, keyed by session ID
 active_connections = {}
 
+def parse_target_languages(value, default=None):
+    """
+    Parse target languages sent by a client (a list or a comma-separated string)
+    
+    Returns:
+    - The distinct valid language codes, at most MAX_TARGET_LANGUAGES, or default if there are none
+    """
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, list):
+        return default
+    languages = []
+    for language in value:
+        if not isinstance(language, str):
+            continue
+        language = language.strip().lower()
+        if LANGUAGE_CODE_PATTERN.fullmatch(language) and language not in languages:
+            languages.append(language)
+    return languages[:MAX_TARGET_LANGUAGES] or default
+
+class ClientConnection:
+    """State of one WebSocket client"""
+    
+    def __init__(self, websocket, session_id, room=None, target_languages=None):
+        self.websocket = websocket
+        self.session_id = session_id
+        # Languages every utterance is translated to, unless a message names its own
+        self.target_languages = target_languages or [DEFAULT_TARGET_LANGUAGE]
+        # Languages with a translation history in this session
+        self.used_languages = set(self.target_languages)
+        # The room this client publishes to; its result frames are broadcast to the room's listeners
+        self.room = room
+        # Receive, process and send concurrently so a slow translation does not stall later messages
+        self.pipeline = ConnectionPipeline(
+            websocket,
+            lambda message, emit: handle_message(message, emit, self),
+            on_send=room.broadcast if room else None
+        )
+
 @router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for real-time communication with the client"""
     await websocket.accept()
-    client_id = id(websocket)
-    active_connections[client_id] = websocket
     
-    # Create a unique session ID for this client for contextual translation
-    session_id = f"session_{client_id}"
-    client_sessions[client_id] = session_id
+    # Room mode: one publisher speaks, listeners receive its results (?room=<name>&role=listener)
+    room_id = websocket.query_params.get("room")
+    if room_id and websocket.query_params.get("role", "publisher") == "listener":
+        await listen_to_room(websocket, room_id)
+        return
     
-    try:
-        while True:
-            data = await websocket.receive_text()
-            message = json.loads(data)
-            
-            if message.get("action") == "process_speech":
-                # Get the recognized text from the client
-                text = message.get("text", "")
-                source_lang = message.get("language", "auto")
-                # Always translate to German
-                target_lang = "de"
-                
-                if not text:
-                    continue
-                
-                try:
-                    # Use contextual Groq translation if available, otherwise fallback to basic translation
-                    if groq_service and len(text.split()) > 2:  # Only use Groq for phrases (not single words)
-                        translated_text = await groq_service.translate(
-                            text, 
-                            source_lang, 
-                            target_lang, 
-                            session_id=client_sessions.get(client_id)
-                        )
-                    else:
-                        translated_text = await stt_service.recognize(text, source_lang, target_lang)
-                    
-                    # Send the processed data back to the client
-                    await websocket.send_json({
-                        "type": "processed_speech",
-                        "original_text": text,
-                        "translated_text": translated_text,
-                        "detected_language": source_lang
-                    })
-                except Exception as e:
-                    await websocket.send_json({
-                        "type": "error",
-                        "message": str(e)
-                    })
-            
-            # New action handler for direct text translation requests from the browser's Web Speech API
-            elif message.get("action") == "translate_text":
-                text = message.get("text", "")
-                source_lang = message.get("source_language", "auto")
-                target_lang = message.get("target_language", "de")  # Default to German
-                is_incremental = message.get("is_incremental", False)  # Check if this is an incremental update
-                
-                if not text:
-                    continue
-                
-                try:
-                    # Use different translation strategies based on the text length and if it's incremental
-                    if is_incremental and len(text.split()) < 3:
-                        # For very short incremental updates, use basic translation for speed
-                        translated_text = await stt_service.recognize(text, source_lang, target_lang)
-                    elif groq_service:
-                        # Use Groq for contextual translation
-                        translated_text = await groq_service.translate(
-                            text, 
-                            source_lang, 
-                            target_lang, 
-                            session_id=client_sessions.get(client_id)
-                        )
-                    else:
-                        # Fallback to basic translation
-                        translated_text = await stt_service.recognize(text, source_lang, target_lang)
-                    
-                    # Send only the translation back to the client
-                    await websocket.send_json({
-                        "type": "translation_only",
-                        "translated_text": translated_text,
-                        "is_incremental": is_incremental  # Pass back this flag so client knows how to handle it
-                    })
-                except Exception as e:
-                    await websocket.send_json({
-                        "type": "error",
-                        "message": str(e)
-                    })
-            
-            elif message.get("action") == "process_audio" and whisper_stt_service:
-                # Whisper-based speech recognition optimized for live transcription
-                audio_data = message.get("audio_data", "")
-                source_lang = message.get("language", "auto")
-                target_lang = "de"  # Always translate to German
-                
-                if not audio_data:
-                    continue
-                
-                try:
-                    # Create background tasks for transcription and translation
-                    transcription_task = asyncio.create_task(
-                        whisper_stt_service.transcribe_audio(audio_data, source_lang)
-                    )
-                    
-                    # Get transcription result
-                    result = await transcription_task
-                    text = result.get("text", "")
-                    detected_language = result.get("detected_language", source_lang)
-                    
-                    # Skip processing if transcription failed
-                    if not text:
-                        continue
-                    
-                    if text.startswith("API Error") or text.startswith("Transcription error"):
-                        await websocket.send_json({
-                            "type": "error",
-                            "message": text
-                        })
-                        continue
-                    
-                    # Start translation in parallel for efficiency
-                    # Use Groq for contextual translation if available
-                    if groq_service and len(text.split()) > 2:
-                        translation_task = asyncio.create_task(
-                            groq_service.translate(
-                                text, 
-                                detected_language, 
-                                target_lang, 
-                                session_id=client_sessions.get(client_id)
-                            )
-                        )
-                    else:
-                        translation_task = asyncio.create_task(
-                            stt_service.recognize(text, detected_language, target_lang)
-                        )
-                    
-                    # Send intermediate response immediately with just the original text
-                    # This provides instant feedback to the user while translation is in progress
-                    await websocket.send_json({
-                        "type": "interim_speech",
-                        "original_text": text,
-                        "detected_language": detected_language
-                    })
-                    
-                    # Now wait for translation to complete
-                    translated_text = await translation_task
-                    
-                    if not translated_text:
-                        await websocket.send_json({
-                            "type": "error",
-                            "message": "Translation returned empty result"
-                        })
-                        continue
-                    
-                    # Send the final processed data back to the client
-                    await websocket.send_json({
-                        "type": "processed_speech",
-                        "original_text": text,
-                        "translated_text": translated_text,
-                        "detected_language": detected_language
-                    })
-                except Exception as e:
-                    await websocket.send_json({
-                        "type": "error",
-                        "message": str(e)
-                    })
-            
-            elif message.get("action") == "process_audio" and not whisper_stt_service:
-                await websocket.send_json({
-                    "type": "error",
-                    "message": "Whisper service is not enabled. Set USE_WHISPER=true in .env file."
-                })
+    # A client may resume its session (on any worker, when state is shared) by passing
+    # the session ID it was given; otherwise create a unique session ID for contextual translation
+    requested_session_id = websocket.query_params.get("session_id")
+    if session_store.is_valid_session_id(requested_session_id):
+        session_id = requested_session_id
+        resumable = True
+    else:
+        session_id = session_store.new_session_id()
+        resumable = websocket.query_params.get("resumable", "false").lower() == "true"
+    
+    room = None
+    if room_id:
+        try:
+            room = await room_registry.join_publisher(room_id, session_id)
+        except RoomError as e:
+            await websocket.send_json({"type": "error", "message": str(e)})
+            await websocket.close(code=e.close_code)
+            return
+    
+    target_languages = parse_target_languages(websocket.query_params.get("target_languages"))
+    connection = ClientConnection(websocket, session_id, room, target_languages)
+    active_connections[session_id] = connection
+    await websocket.send_json({"type": "session", "session_id": session_id})
+    if room:
+        await websocket.send_json({"type": "room", "room": room.room_id, "role": "publisher"})
     
+    try:
+        await connection.pipeline.run()
     except WebSocketDisconnect:
-        if client_id in active_connections:
-            del active_connections[client_id]
-        if client_id in client_sessions:
-            del client_sessions[client_id]
+        pass
     except Exception as e:
-        if client_id in active_connections:
-            try:
-                await websocket.send_json({
-                    "type": "error",
-                    "message": str(e)
-                })
-            except:
-                pass
-            del active_connections[client_id]
-        if client_id in client_sessions:
-            del client_sessions[client_id]
+        try:
+            await websocket.send_json({
+                "type": "error",
+                "message": str(e)
+            })
+        except:
+            pass
+    finally:
+        if streaming_stt_engine:
+            await streaming_stt_engine.close_session(session_id)
+        speculative_translator.discard(session_id)
+        active_connections.pop(session_id, None)
+        if room:
+            await room_registry.leave(room, session_id=session_id)
+        # Drop the session's translation history, unless the client may resume it
+        # (it then expires after SESSION_IDLE_TTL)
+        if not resumable:
+            await session_store.end_session(session_id, connection.used_languages)
+
+async def listen_to_room(websocket, room_id):
+    """Follow a room: receive the publisher's result frames without sending anything to process"""
+    # Listeners may only follow some languages; the publisher then also translates to these
+    listener = RoomListener(websocket, parse_target_languages(websocket.query_params.get("target_languages")))
+    try:
+        room = await room_registry.join_listener(room_id, listener)
+    except RoomError as e:
+        await websocket.send_json({"type": "error", "message": str(e)})
+        await websocket.close(code=e.close_code)
+        return
+    
+    try:
+        await websocket.send_json({
+            "type": "room",
+            "room": room.room_id,
+            "role": "listener",
+            "has_publisher": room.publisher is not None,
+            "target_languages": sorted(listener.languages) if listener.languages else None
+        })
+        await listener.run()
+        if listener.closed:
+            # Dropped by the room for falling too far behind
+            await websocket.close(code=1013)
+    except WebSocketDisconnect:
+        pass
+    except Exception:
+        pass
+    finally:
+        await room_registry.leave(room, listener=listener)
+
+async def handle_message(message, emit, connection):
+    """
+    Process one WebSocket message and emit the response frames
+    
+    Parameters:
+    - message: The decoded client message
+    - emit: Coroutine function sending a frame back to the client (in order)
+    - connection: The ClientConnection the message was received on
+    """
+    try:
+        await dispatch_message(message, emit, connection)
+    except ServiceBusyError as e:
+        # Tell the client the message was shed instead of sending an error as its result
+        await emit(busy_frame(e))
+
+def message_target_languages(message, connection):
+    """
+    Return the target languages of a message: those it names (target_languages or
+    target_language), otherwise the connection's subscription. A room publisher
+    also translates to every language its listeners follow.
+    """
+    languages = (
+        parse_target_languages(message.get("target_languages")) or
+        parse_target_languages([message.get("target_language")]) or
+        connection.target_languages
+    )
+    if connection.room:
+        languages = languages + [language for language in connection.room.languages() if language not in languages]
+    connection.used_languages.update(languages)
+    return languages
+
+async def for_each_language(languages, emit, translate_into, **fields):
+    """
+    Run translate_into(target_lang) for every target language concurrently. Each
+    language sends its frames as soon as they are ready; a language that is shed
+    or fails reports it in its own frame without holding up the others.
+    """
+    async def run(target_lang):
+        try:
+            await translate_into(target_lang)
+        except ServiceBusyError as e:
+            await emit(busy_frame(e, target_language=target_lang, **fields))
+        except Exception as e:
+            await emit({"type": "error", "message": str(e), "target_language": target_lang, **fields})
+    
+    if len(languages) == 1:
+        await run(languages[0])
+    else:
+        await asyncio.gather(*(run(target_lang) for target_lang in languages))
+
+def busy_frame(error, **fields):
+    """Build the frame telling a client that its request was shed under load"""
+    return {
+        "type": "busy",
+        "message": str(error),
+        "retry_after": error.retry_after,
+        **fields
+    }
+
+async def dispatch_message(message, emit, connection):
+    """Run the handler for the message's action"""
+    action = message.get("action")
+    session_id = connection.session_id
+    
+    if action == "process_speech":
+        await handle_process_speech(message, emit, session_id, message_target_languages(message, connection))
+    
+    # New action handler for direct text translation requests from the browser's Web Speech API
+    elif action == "translate_text":
+        await handle_translate_text(message, emit, session_id, message_target_languages(message, connection))
+    
+    # Subscribe the connection to the languages every utterance is translated to
+    elif action == "set_target_languages":
+        languages = parse_target_languages(message.get("target_languages"))
+        if not languages:
+            await emit({
+                "type": "error",
+                "message": "target_languages must list language codes such as \"de\" or \"en\""
+            })
+            return
+        connection.target_languages = languages
+        connection.used_languages.update(languages)
+        await emit({"type": "target_languages", "target_languages": languages})
+    
+    elif action in ("process_audio", "stream_audio", "stream_end") and not whisper_stt_service:
+        await emit({
+            "type": "error",
+            "message": "Whisper service is not enabled. Set USE_WHISPER=true in .env file."
+        })
+    
+    elif action == "process_audio":
+        await handle_process_audio(message, emit, session_id, message_target_languages(message, connection))
+    
+    # Continuous audio streams segmented on the server by voice activity
+    elif action == "stream_audio":
+        await handle_stream_audio(message, connection)
+    
+    elif action == "stream_end":
+        # Flush the last segment; the end marker follows all segment results
+        await streaming_stt_engine.finish_session(session_id)
+        await emit({"type": "stream_ended"})
+
+async def groq_translate(text, source_lang, target_lang, session_id):
+    return await groq_service.translate(text, source_lang, target_lang, session_id=session_id, remember=False)
+
+async def groq_translate_stream(text, source_lang, target_lang, session_id, on_delta):
+    return await groq_service.translate_stream(
+        text, source_lang, target_lang, session_id=session_id, on_delta=on_delta, remember=False
+    )
+
+async def basic_translate(text, source_lang, target_lang, session_id):
+    translated_text = await stt_service.recognize(text, source_lang, target_lang)
+    if groq_service and not is_error_translation(translated_text):
+        # Hedges and failovers keep the divine addresses a Groq translation would
+        translated_text = groq_service.check_addresses(text, source_lang, target_lang, translated_text)
+    return translated_text
+
+# Routes translations between Groq (preferred for phrases) and the basic provider by latency and health;
+# the session history is updated here once per final translation, whichever backend served it
+translation_router = TranslationRouter(
+    [TranslationBackend(stt_service.provider.name, basic_translate)] +
+    ([TranslationBackend("groq", groq_translate, groq_translate_stream)] if groq_service else []),
+    phrase_backend="groq" if groq_service else None
+)
+
+async def translate_text(text, source_lang, target_lang, session_id, on_delta=None, slo_ms=None):
+    """
+    Translate recognized speech with the backend chosen by the translation router
+    
+    Parameters:
+    - on_delta: Optional coroutine function receiving the translation piece by piece as it streams
+    - slo_ms: Optional latency target of the message in ms
+    
+    Returns:
+    - Tuple of (translation, name of the backend that served it)
+    
+    Raises:
+    - ServiceBusyError or TranslationError if no backend could translate the text
+    """
+    translated_text, provider = await translation_router.translate(
+        text, source_lang, target_lang, session_id, on_delta=on_delta, slo_ms=slo_ms
+    )
+    if groq_service and session_id and translated_text:
+        await groq_service.remember_translation(session_id, text, translated_text, target_lang)
+    return translated_text, provider
+
+async def translate_segment(text, source_lang, target_lang, session_id, slo_ms=None):
+    """Translate part of an utterance, without adding it to the session history"""
+    # Groq is preferred even for short segments, so all parts of an utterance read alike
+    return await translation_router.translate(
+        text, source_lang, target_lang, session_id, slo_ms=slo_ms, preferred="groq"
+    )
+
+async def stream_segment(text, source_lang, target_lang, session_id, on_delta, slo_ms=None):
+    """Like translate_segment, but stream the translation through on_delta"""
+    return await translation_router.translate(
+        text, source_lang, target_lang, session_id, on_delta=on_delta, slo_ms=slo_ms, preferred="groq"
+    )
+
+# Translates interim transcripts ahead of time and reuses the work for the final one
+speculative_translator = SpeculativeTranslator(translate_segment, stream_segment)
+
+async def batch_translate(text, source_lang, target_lang):
+    """Translate a segment of a batch job as background work, without session context"""
+    if groq_service:
+        return await groq_service.translate(text, source_lang, target_lang, remember=False, background=True)
+    return await stt_service.recognize(text, source_lang, target_lang)
+
+# Bulk transcription and translation of recordings (started and stopped with the application)
+batch_job_manager = BatchJobManager(long_audio_transcriber, batch_translate) if long_audio_transcriber else None
+
+async def translate_utterance(message, text, source_lang, target_lang, session_id, on_delta=None):
+    """
+    Translate an interim (is_incremental) or final transcript of an utterance
+    through the speculative translator. Utterances are identified by the
+    message's action and optional utterance_id within the session, separately
+    for each target language.
+    
+    Returns:
+    - Tuple of (translation, backends that served it)
+    """
+    key = (session_id, message.get("action"), message.get("utterance_id"), target_lang)
+    slo_ms = message_slo_ms(message)
+    if message.get("is_incremental"):
+        return await speculative_translator.speculate(key, text, source_lang, target_lang, session_id, slo_ms=slo_ms)
+    
+    translated_text, provider = await speculative_translator.finalize(
+        key, text, source_lang, target_lang, session_id, on_delta=on_delta, slo_ms=slo_ms
+    )
+    # Only the final transcript becomes part of the session history
+    if groq_service and session_id and translated_text and not is_error_translation(translated_text):
+        await groq_service.remember_translation(session_id, text, translated_text, target_lang)
+    return translated_text, provider
+
+def message_slo_ms(message):
+    """Return the latency target a client gave a message (latency_slo_ms), or None"""
+    slo_ms = message.get("latency_slo_ms")
+    if isinstance(slo_ms, (int, float)) and not isinstance(slo_ms, bool) and slo_ms > 0:
+        return float(slo_ms)
+    return None
+
+def delta_sender(emit, message, **fields):
+    """Return an on_delta callback emitting translation_delta frames, if the client asked for streaming"""
+    if not message.get("stream"):
+        return None
+    
+    async def on_delta(delta):
+        await emit({"type": "translation_delta", "delta": delta, **fields})
+    return on_delta
+
+async def handle_process_speech(message, emit, session_id, target_langs):
+    """Translate text recognized by the client into each target language"""
+    # Get the recognized text from the client
+    text = message.get("text", "")
+    source_lang = message.get("language", "auto")
+    
+    if not text:
+        return
+    
+    async def translate_into(target_lang):
+        translated_text, provider = await translate_text(
+            text, source_lang, target_lang, session_id,
+            on_delta=delta_sender(emit, message, target_language=target_lang),
+            slo_ms=message_slo_ms(message)
+        )
+        
+        # Send the processed data back to the client
+        await emit({
+            "type": "processed_speech",
+            "original_text": text,
+            "translated_text": translated_text,
+            "detected_language": source_lang,
+            "target_language": target_lang,
+            "provider": provider
+        })
+    
+    await for_each_language(target_langs, emit, translate_into)
+
+async def handle_translate_text(message, emit, session_id, target_langs):
+    """Translate text from the browser's Web Speech API into each target language"""
+    text = message.get("text", "")
+    source_lang = message.get("source_language", "auto")
+    is_incremental = message.get("is_incremental", False)  # Check if this is an incremental update
+    
+    if not text:
+        return
+    
+    async def translate_into(target_lang):
+        on_delta = delta_sender(emit, message, is_incremental=is_incremental, target_language=target_lang)
+        
+        if speculative_translator.enabled:
+            # Interim updates are translated sentence by sentence; the final update reuses that work
+            translated_text, provider = await translate_utterance(
+                message, text, source_lang, target_lang, session_id, on_delta=on_delta
+            )
+        else:
+            translated_text, provider = await translate_text(
+                text, source_lang, target_lang, session_id,
+                on_delta=on_delta,
+                slo_ms=message_slo_ms(message)
+            )
+        
+        # Send only the translation back to the client
+        await emit({
+            "type": "translation_only",
+            "translated_text": translated_text,
+            "target_language": target_lang,
+            "provider": provider,
+            "is_incremental": is_incremental  # Pass back this flag so client knows how to handle it
+        })
+    
+    await for_each_language(target_langs, emit, translate_into)
+
+async def handle_process_audio(message, emit, session_id, target_langs):
+    """Whisper-based speech recognition optimized for live transcription, translated into each target language"""
+    # Binary frames carry raw audio bytes, JSON frames carry base64 audio
+    audio_data = message.get("audio_bytes")
+    if audio_data is None:
+        audio_data = message.get("audio_data", "")
+    source_lang = message.get("language", "auto")
+    
+    if not audio_data:
+        return
+    
+    # Transcription stage
+    result = await whisper_stt_service.transcribe_audio(audio_data, source_lang, session_id=session_id)
+    text = result.get("text", "")
+    detected_language = result.get("detected_language", source_lang)
+    
+    # Skip processing if transcription failed
+    if not text:
+        return
+    
+    if text.startswith("API Error") or text.startswith("Transcription error"):
+        await emit({
+            "type": "error",
+            "message": text
+        })
+        return
+    
+    async def translate_into(target_lang):
+        on_delta = delta_sender(emit, message, target_language=target_lang)
+        if speculative_translator.enabled:
+            translated_text, provider = await translate_utterance(
+                message, text, detected_language, target_lang, session_id, on_delta=on_delta
+            )
+        else:
+            translated_text, provider = await translate_text(
+                text, detected_language, target_lang, session_id,
+                on_delta=on_delta, slo_ms=message_slo_ms(message)
+            )
+        
+        if not translated_text:
+            await emit({
+                "type": "error",
+                "message": "Translation returned empty result",
+                "target_language": target_lang
+            })
+            return
+        
+        # Send the final processed data back to the client
+        await emit({
+            "type": "processed_speech",
+            "original_text": text,
+            "translated_text": translated_text,
+            "detected_language": detected_language,
+            "target_language": target_lang,
+            "provider": provider,
+            "is_incremental": bool(message.get("is_incremental", False))
+        })
+    
+    # Translation stage, started before the interim frame is sent
+    translation_task = asyncio.create_task(for_each_language(target_langs, emit, translate_into))
+    
+    try:
+        # Send intermediate response immediately with just the original text
+        # This provides instant feedback to the user while translation is in progress
+        await emit({
+            "type": "interim_speech",
+            "original_text": text,
+            "detected_language": detected_language
+        })
+        
+        # Now wait for the translations to complete
+        await translation_task
+    finally:
+        # Do not leave the translations running if this message was cancelled
+        translation_task.cancel()
+
+async def handle_stream_audio(message, connection):
+    """Feed a chunk of a continuous audio stream into the streaming transcription engine"""
+    audio_data = message.get("audio_bytes")
+    if audio_data is None:
+        raise ValueError("stream_audio requires a binary frame with raw audio")
+    
+    session_id = connection.session_id
+    
+    async def on_segment_result(result):
+        """
+        Send each transcribed segment in segment order, and return its translation,
+        which the engine runs concurrently with the following segments
+        """
+        text = result.get("text", "")
+        detected_language = result.get("detected_language", "auto")
+        segment_info = {
+            "segment": result["segment"],
+            "start_ms": result["start_ms"],
+            "end_ms": result["end_ms"]
+        }
+        
+        if result.get("busy"):
+            await connection.pipeline.push(busy_frame(
+                ServiceBusyError("The service is busy, the segment was skipped", result.get("retry_after")),
+                **segment_info
+            ))
+            return
+        
+        if not text:
+            return
+        
+        if text.startswith("API Error") or text.startswith("Transcription error"):
+            await connection.pipeline.push({"type": "error", "message": text, **segment_info})
+            return
+        
+        await connection.pipeline.push({
+            "type": "interim_speech",
+            "original_text": text,
+            "detected_language": detected_language,
+            **segment_info
+        })
+        
+        async def translate_into(target_lang):
+            translated_text, provider = await translate_text(
+                text, detected_language, target_lang, session_id, slo_ms=message_slo_ms(message)
+            )
+            await connection.pipeline.push({
+                "type": "processed_speech",
+                "original_text": text,
+                "translated_text": translated_text,
+                "detected_language": detected_language,
+                "target_language": target_lang,
+                "provider": provider,
+                **segment_info
+            })
+        
+        # Languages are looked up per segment, so subscription changes apply to the running stream
+        return for_each_language(
+            message_target_languages(message, connection), connection.pipeline.push, translate_into,
+            original_text=text, **segment_info
+        )
+    
+    stream = streaming_stt_engine.open_session(
+        session_id,
+        on_segment_result,
+        language=message.get("language", "auto"),
+        input_format=message.get("format", "webm"),
+        input_sample_rate=int(message.get("sample_rate", STREAM_SAMPLE_RATE)),
+        input_channels=int(message.get("channels", 1))
+    )
+    await stream.feed(audio_data)
 
 @router.post("/transcribe_audio", response_model=dict)
 async def transcribe_audio(request: AudioToTextRequest):
     """Endpoint to transcribe audio using Whisper API"""
+    target_languages = (
+        parse_target_languages(request.target_languages) or
+        parse_target_languages([request.target_language], [DEFAULT_TARGET_LANGUAGE])
+    )
+    if request.long_audio:
+        try:
+            audio_bytes = base64.b64decode(request.audio_data)
+        except Exception as e:
+            return JSONResponse(status_code=400, content={"success": False, "error": str(e)})
+        return long_transcription_response(audio_bytes, request.language, target_languages)
+    return await transcribe_and_translate(request.audio_data, request.language, request.session_id, target_languages)
+
+@router.post("/transcribe_audio_upload", response_model=dict)
+async def transcribe_audio_upload(request: Request, language: str = "auto", session_id: str = "",
+                                  target_languages: str = DEFAULT_TARGET_LANGUAGE, long_audio: bool = False):
+    """
+    Endpoint to transcribe uploaded audio without base64 encoding.
+    Accepts either a multipart/form-data upload (field "file", optional fields
+    "language", "target_languages" and "long_audio") or the raw audio bytes streamed as the request body.
+    """
+    audio_buffer = bytearray()
+    content_type = request.headers.get("content-type", "")
+    
+    try:
+        if content_type.startswith("multipart/form-data"):
+            form = await request.form()
+            upload = form.get("file")
+            if upload is None or isinstance(upload, str):
+                return JSONResponse(
+                    status_code=400,
+                    content={"success": False, "error": "Missing audio file in field 'file'"}
+                )
+            language = form.get("language", language)
+            session_id = form.get("session_id", session_id)
+            target_languages = form.get("target_languages", target_languages)
+            long_audio = str(form.get("long_audio", long_audio)).lower() == "true"
+            while True:
+                chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                audio_buffer += chunk
+                if len(audio_buffer) > MAX_UPLOAD_BYTES:
+                    break
+        else:
+            async for chunk in request.stream():
+                audio_buffer += chunk
+                if len(audio_buffer) > MAX_UPLOAD_BYTES:
+                    break
+    except Exception as e:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "error": str(e)}
+        )
+    
+    if len(audio_buffer) > MAX_UPLOAD_BYTES:
+        return JSONResponse(
+            status_code=413,
+            content={"success": False, "error": f"Audio upload exceeds {MAX_UPLOAD_BYTES} bytes"}
+        )
+    
+    target_languages = parse_target_languages(target_languages, [DEFAULT_TARGET_LANGUAGE])
+    if long_audio:
+        return long_transcription_response(bytes(audio_buffer), language, target_languages)
+    return await transcribe_and_translate(audio_buffer, language, session_id, target_languages)
+
+def long_transcription_response(audio_bytes, language, target_languages):
+    """Stream the transcription of a long recording as NDJSON (see stream_long_transcription)"""
+    if not long_audio_transcriber:
+        return JSONResponse(
+            status_code=400,
+            content={
+                "success": False, 
+                "error": "Whisper service is not enabled. Set USE_WHISPER=true in .env file."
+            }
+        )
+    return StreamingResponse(
+        stream_long_transcription(audio_bytes, language, target_languages),
+        media_type="application/x-ndjson"
+    )
+
+async def stream_long_transcription(audio_bytes, language, target_languages):
+    """
+    Transcribe a long recording in parallel segments and yield NDJSON lines:
+    - {"type": "segment", ...} for each segment, in order, as soon as it is stitched
+    - {"type": "segment_translation", ...} for each segment and target language, as soon as it is translated
+    - {"type": "result", ...} with the whole text and translations at the end
+    """
+    lines = asyncio.Queue()
+    translation_tasks = {target_lang: [] for target_lang in target_languages}
+    failed_translations = {target_lang: 0 for target_lang in target_languages}
+    
+    async def translate_segment_into(index, text, detected_language, target_lang):
+        line = {"type": "segment_translation", "segment": index, "target_language": target_lang}
+        try:
+            # Segments are translated concurrently, so they do not share a session context
+            translated_text, provider = await translate_text(text, detected_language, target_lang, None)
+        except Exception as e:
+            # One failed segment must not end the stream: report it and keep going
+            failed_translations[target_lang] += 1
+            await lines.put({**line, "translated_text": "", "provider": None, "error": str(e)})
+            return ""
+        await lines.put({**line, "translated_text": translated_text, "provider": provider})
+        return translated_text
+    
+    async def produce():
+        segments = []
+        try:
+            async for segment in long_audio_transcriber.transcribe(audio_bytes, language):
+                segments.append(segment)
+                await lines.put({"type": "segment", **segment})
+                if segment["text"]:
+                    for target_lang in target_languages:
+                        translation_tasks[target_lang].append(asyncio.create_task(translate_segment_into(
+                            segment["segment"], segment["text"], segment["detected_language"], target_lang
+                        )))
+            
+            translations = {}
+            for target_lang, tasks in translation_tasks.items():
+                translations[target_lang] = join_segments(await asyncio.gather(*tasks), target_lang)
+            languages = Counter(
+                segment["detected_language"] for segment in segments
+                if segment["text"] and segment["detected_language"] not in ("auto", "unknown")
+            )
+            await lines.put({
+                "type": "result",
+                "success": True,
+                "text": " ".join(segment["text"] for segment in segments if segment["text"]),
+                "translated_text": translations[target_languages[0]],
+                "translations": translations,
+                "detected_language": languages.most_common(1)[0][0] if languages else language,
+                "segments": len(segments),
+                "failed_segments": sum(1 for segment in segments if "error" in segment),
+                "failed_translations": failed_translations
+            })
+        except Exception as e:
+            await lines.put({"type": "result", "success": False, "error": str(e)})
+        finally:
+            for tasks in translation_tasks.values():
+                for task in tasks:
+                    task.cancel()
+            await lines.put(None)
+    
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            line = await lines.get()
+            if line is None:
+                break
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+    finally:
+        # The client went away: stop transcribing and translating
+        producer.cancel()
+
+def batch_jobs_unavailable():
+    """Response for batch job requests when batch jobs cannot run, or None"""
+    if batch_job_manager is None:
+        error = "Whisper service is not enabled. Set USE_WHISPER=true in .env file."
+    elif batch_job_manager.store is None:
+        error = "Batch jobs are disabled. Set BATCH_DIR to enable them."
+    else:
+        return None
+    return JSONResponse(status_code=400, content={"success": False, "error": error})
+
+@router.post("/batch_jobs", response_model=dict)
+async def create_batch_job(request: BatchJobRequest):
+    """Queue a batch job for recordings on the server (listed paths and/or a directory)"""
+    unavailable = batch_jobs_unavailable()
+    if unavailable:
+        return unavailable
+    try:
+        files = await asyncio.to_thread(
+            batch_job_manager.resolve_inputs, request.paths, request.directory, request.recursive, request.pattern
+        )
+        job = await batch_job_manager.submit(
+            files, request.language,
+            parse_target_languages(request.target_languages, [DEFAULT_TARGET_LANGUAGE]), request.priority
+        )
+    except BatchJobError as e:
+        return JSONResponse(status_code=400, content={"success": False, "error": str(e)})
+    return JSONResponse(status_code=202, content={"success": True, "job": job})
+
+@router.post("/batch_jobs_upload", response_model=dict)
+async def create_batch_job_upload(request: Request):
+    """
+    Queue a batch job for uploaded recordings.
+    Accepts a multipart/form-data upload with the recordings in repeated "files"
+    fields and optional fields "language", "target_languages" and "priority".
+    """
+    unavailable = batch_jobs_unavailable()
+    if unavailable:
+        return unavailable
+    job_id = batch_job_manager.new_job_id()
+    try:
+        form = await request.form(max_files=BATCH_MAX_FILES)
+        uploads = [upload for upload in form.getlist("files") if not isinstance(upload, str)]
+        if not uploads:
+            return JSONResponse(
+                status_code=400,
+                content={"success": False, "error": "Missing recordings in fields 'files'"}
+            )
+        files = []
+        for position, upload in enumerate(uploads):
+            files.append(await batch_job_manager.save_upload(job_id, position, upload))
+        job = await batch_job_manager.submit(
+            files, form.get("language", "auto"),
+            parse_target_languages(form.get("target_languages", ""), [DEFAULT_TARGET_LANGUAGE]),
+            int(form.get("priority", 0)), job_id=job_id
+        )
+    except Exception as e:
+        # Nothing is queued: remove what was stored of the uploads
+        await batch_job_manager.discard_uploads(job_id)
+        return JSONResponse(status_code=400, content={"success": False, "error": str(e)})
+    return JSONResponse(status_code=202, content={"success": True, "job": job})
+
+@router.get("/batch_jobs", response_model=dict)
+async def list_batch_jobs(limit: int = 100):
+    """List the most recent batch jobs with their progress"""
+    unavailable = batch_jobs_unavailable()
+    if unavailable:
+        return unavailable
+    return {"success": True, "jobs": await batch_job_manager.list_jobs(max(1, min(limit, 1000)))}
+
+@router.get("/batch_jobs/{job_id}", response_model=dict)
+async def get_batch_job(job_id: str):
+    """Report a batch job's progress, recording by recording"""
+    unavailable = batch_jobs_unavailable()
+    if unavailable:
+        return unavailable
+    job = await batch_job_manager.get_job(job_id, with_files=True)
+    if job is None:
+        return JSONResponse(status_code=404, content={"success": False, "error": "Unknown batch job"})
+    return {"success": True, "job": job}
+
+@router.get("/batch_jobs/{job_id}/results")
+async def get_batch_job_results(job_id: str, follow: bool = False):
+    """
+    Stream a batch job's results as JSONL. With follow=true, new lines are
+    streamed as they are produced until the job is finished.
+    """
+    unavailable = batch_jobs_unavailable()
+    if unavailable:
+        return unavailable
+    if await batch_job_manager.get_job(job_id) is None:
+        return JSONResponse(status_code=404, content={"success": False, "error": "Unknown batch job"})
+    return StreamingResponse(batch_job_manager.read_results(job_id, follow), media_type="application/x-ndjson")
+
+@router.post("/batch_jobs/{job_id}/cancel", response_model=dict)
+async def cancel_batch_job(job_id: str):
+    """Cancel a queued or running batch job; finished recordings keep their results"""
+    unavailable = batch_jobs_unavailable()
+    if unavailable:
+        return unavailable
+    if not await batch_job_manager.cancel(job_id):
+        return JSONResponse(status_code=404, content={"success": False, "error": "No queued or running batch job with this ID"})
+    return {"success": True, "job": await batch_job_manager.get_job(job_id)}
+
+async def transcribe_and_translate(audio_data, language, session_id="", target_languages=None):
+    """
+    Transcribe audio with Whisper and translate the text into each target language
+    
+    Parameters:
+    - audio_data: Raw audio bytes or base64 encoded audio data
+    - language: Language code of the audio (or "auto")
+    - session_id: Optional session ID (from a WebSocket "session" frame) to share its translation context
+    - target_languages: Languages to translate to, concurrently (German if not given)
+    """
+    target_languages = target_languages or [DEFAULT_TARGET_LANGUAGE]
     if not whisper_stt_service:
         return JSONResponse(
             status_code=400,
@@ -243,33 +901,120 @@ async def transcribe_audio(request: AudioToTextRequest):
         )
     
     try:
-        # Always translate to German
-        target_lang = "de"
-        
+        # Only a client's own session provides Whisper prompt context
+        has_session = session_store.is_valid_session_id(session_id)
         result = await whisper_stt_service.transcribe_audio(
-            request.audio_data, request.language
+            audio_data, language, session_id=session_id if has_session else None
         )
         
         text = result.get("text", "")
-        detected_language = result.get("detected_language", request.language)
+        detected_language = result.get("detected_language", language)
         
-        # Translate to German using contextual translation if available
-        if groq_service and len(text.split()) > 2:
-            # Use a generic session ID for REST API calls
-            translated_text = await groq_service.translate(
-                text, detected_language, target_lang, session_id="api_session"
-            )
-        else:
-            translated_text = await stt_service.recognize(text, detected_language, target_lang)
+        # Translate into every target language at once, using contextual translation if available
+        # Without a valid session ID, REST calls share a generic session
+        results = await asyncio.gather(*(
+            translate_text(text, detected_language, target_lang, session_id if has_session else "api_session")
+            for target_lang in target_languages
+        ))
         
         return {
             "success": True, 
             "text": text, 
-            "translated_text": translated_text,
+            "translated_text": results[0][0],
+            "translations": {target_lang: result[0] for target_lang, result in zip(target_languages, results)},
+            "providers": {target_lang: result[1] for target_lang, result in zip(target_languages, results)},
             "detected_language": detected_language
         }
+    except ServiceBusyError as e:
+        # Shed under load: the client should retry later
+        headers = {"Retry-After": str(max(1, round(e.retry_after)))} if e.retry_after else None
+        return JSONResponse(
+            status_code=503,
+            content={"success": False, "error": str(e), "retry_after": e.retry_after},
+            headers=headers
+        )
+    except TranslationError as e:
+        # Every translation backend failed
+        return JSONResponse(
+            status_code=502,
+            content={"success": False, "error": str(e)}
+        )
     except Exception as e:
         return JSONResponse(
             status_code=500,
             content={"success": False, "error": str(e)}
-        )
\ No newline at end of file
+        )
+
+@router.get("/stats", response_model=dict)
+async def get_stats():
+    """Endpoint to report runtime statistics of the shared subsystems"""
+    return {
+        "http_pool": http_pool.stats(),
+        "translation_cache": translation_cache.stats() if translation_cache is not None else None,
+        "coalescing": {
+            "translation": groq_service.coalescer.stats() if groq_service else None,
+            "transcription": whisper_stt_service.coalescer.stats() if whisper_stt_service else None
+        },
+        "batching": groq_service.batcher.stats() if groq_service else None,
+        "fallback_translation": stt_service.provider.stats(),
+        "speculative_translation": speculative_translator.stats(),
+        "translation_router": translation_router.stats(),
+        "language_id": stt_service.language_identifier.stats(),
+        "audio_preprocessing": whisper_stt_service.audio_preprocessor.stats() if whisper_stt_service else None,
+        "long_audio": long_audio_transcriber.stats() if long_audio_transcriber else None,
+        "batch_jobs": batch_job_manager.stats() if batch_job_manager else None,
+        "rate_limiter": rate_limiter.stats(),
+        "streaming_stt": streaming_stt_engine.stats() if streaming_stt_engine else None,
+        "rooms": room_registry.stats(),
+        "sessions": {
+            "active_connections": len(active_connections),
+            **session_store.stats()
+        }
+    }
+
+def collect_runtime_metrics():
+    """Expose the counters of the shared subsystems on /metrics"""
+    pool = http_pool.stats()
+    yield ("http_pool_connections", "gauge", "Connections of the shared HTTP pool", [
+        ({"state": "idle"}, pool["idle_connections"]),
+        ({"state": "in_use"}, pool["in_use_connections"])
+    ])
+    yield ("http_pool_connections_total", "counter", "Connections created or reused by the shared HTTP pool", [
+        ({"event": "created"}, pool["connections_created"]),
+        ({"event": "reused"}, pool["connections_reused"])
+    ])
+    
+    if translation_cache is not None:
+        cache = translation_cache.stats()
+        yield ("translation_cache_lookups_total", "counter", "Translation cache lookups by result", [
+            ({"result": "hit"}, cache["hits"] - cache["disk_hits"] - cache["shared_hits"]),
+            ({"result": "shared_hit"}, cache["shared_hits"]),
+            ({"result": "disk_hit"}, cache["disk_hits"]),
+            ({"result": "miss"}, cache["misses"])
+        ])
+        yield ("translation_cache_entries", "gauge", "Entries in the in-memory translation cache", [
+            ({}, cache["entries"])
+        ])
+    
+    coalescers = {"translation": groq_service, "transcription": whisper_stt_service}
+    yield ("coalesced_requests_total", "counter", "Requests that joined an identical in-flight request", [
+        ({"kind": kind}, service.coalescer.stats()["deduplicated"])
+        for kind, service in coalescers.items() if service
+    ])
+    
+    limiter = rate_limiter.stats()
+    yield ("upstream_in_flight", "gauge", "Groq requests in flight", [({}, limiter["in_flight"])])
+    yield ("upstream_waiting", "gauge", "Groq requests waiting for the rate limiter", [({}, limiter["waiting"])])
+    yield ("upstream_events_total", "counter", "Rate limiter events", [
+        ({"event": event}, limiter[event]) for event in ("throttled", "retries", "shed")
+    ])
+    
+    yield ("websocket_connections", "gauge", "Open WebSocket connections", [({}, len(active_connections))])
+    yield ("room_listeners", "gauge", "Listeners connected to rooms", [({}, room_registry.stats()["listeners"])])
+    if streaming_stt_engine:
+        streaming = streaming_stt_engine.stats()
+        yield ("streaming_sessions", "gauge", "Active streaming transcription sessions", [
+            ({}, streaming["active_sessions"])
+        ])
+
+metrics.register_collector(collect_runtime_metrics)
@@ -0,0 +1,289 @@
+import os
+import json
+import struct
+import time
+import asyncio
+from dotenv import load_dotenv
+from fastapi import WebSocketDisconnect
+from services.metrics import (
+    metrics, new_trace_id, language_label, action_label, stage_duration, message_duration, messages_in_flight, frames_sent
+)
+
+# Load environment variables
+load_dotenv()
+WS_MAX_PENDING = int(os.getenv("WS_MAX_PENDING", 16))  # Messages in flight per connection
+
+def decode_binary_frame(data):
+    """
+    Decode a binary WebSocket frame carrying raw audio.
+    
+    Frame layout:
+    - 2 bytes: big-endian length N of the JSON header
+    - N bytes: UTF-8 JSON header, e.g. {"action": "process_audio", "language": "en"}
+    - remaining bytes: raw audio payload
+    
+    Returns:
+    - The header as a message dict, with the audio under "audio_bytes" as a
+      zero-copy memoryview into the received frame
+    """
+    if len(data) < 2:
+        raise ValueError("Binary frame too short")
+    (header_length,) = struct.unpack_from(">H", data, 0)
+    if len(data) < 2 + header_length:
+        raise ValueError("Binary frame header is truncated")
+    
+    view = memoryview(data)
+    message = json.loads(bytes(view[2:2 + header_length]).decode("utf-8")) if header_length else {}
+    if not isinstance(message, dict):
+        raise ValueError("Binary frame header must be a JSON object")
+    message["audio_bytes"] = view[2 + header_length:]
+    return message
+
+class PipelineJob:
+    """A single received message moving through the pipeline"""
+
+    __slots__ = (
+        "seq", "message", "utterance_key", "utterance_id", "order_key", "is_incremental", "task", "trace_id",
+        "received_at", "pipeline", "held", "follower", "unsent", "finished", "released"
+    )
+
+    def __init__(self, pipeline, seq, message, utterance_key, is_incremental, trace_id=None):
+        self.pipeline = pipeline
+        self.seq = seq
+        self.message = message
+        self.utterance_key = utterance_key
+        self.utterance_id = message.get("utterance_id") if message else None
+        # Received messages are sent in order per utterance_id, or per connection without one;
+        # pushed frames (no message) are not ordered against received messages
+        if message is None:
+            self.order_key = None
+        elif self.utterance_id is not None:
+            self.order_key = ("utterance", self.utterance_id)
+        else:
+            self.order_key = ("connection",)
+        self.is_incremental = is_incremental
+        self.task = None
+        self.trace_id = trace_id or new_trace_id()
+        self.received_at = time.perf_counter()
+        # Frames held back until the previous job with the same order key has finished
+        self.held = None
+        self.follower = None
+        # Frames queued but not yet sent; the job's slot is released once it is finished and all are sent
+        self.unsent = 0
+        self.finished = False
+        self.released = False
+
+    async def emit(self, frame):
+        """
+        Queue a frame for sending, tagged with the job's sequence number, utterance ID
+        and trace ID. Frames are sent as soon as the frames of the previous message of
+        the same utterance (or of the connection, for messages without an utterance_id)
+        have been queued.
+        """
+        frame["seq"] = self.seq
+        if self.utterance_id is not None:
+            frame["utterance_id"] = self.utterance_id
+        frame["trace_id"] = self.trace_id
+        self.unsent += 1
+        if self.held is not None:
+            self.held.append(frame)
+        else:
+            self.pipeline._outgoing.put_nowait((self, frame))
+
+class ConnectionPipeline:
+    """
+    Per-connection WebSocket pipeline.
+    Receiving, processing (transcription/translation) and sending run as separate
+    concurrent stages, so one slow upstream call does not stall later messages.
+    Every frame carries the sequence number of its message (and its utterance_id,
+    if given). Frames of messages with the same utterance_id are sent in the order
+    the messages were received, as are frames of messages without one, so clients
+    that do not track utterances still get their replies in order; different
+    utterances do not wait for each other. An incremental update is cancelled once
+    a newer update for the same utterance arrives.
+    """
+
+    def __init__(self, websocket, handler, max_pending=WS_MAX_PENDING, on_send=None):
+        """
+        Parameters:
+        - websocket: The accepted WebSocket connection
+        - handler: Coroutine function handler(message, emit) processing one message
+        - max_pending: Maximum number of messages being processed or waiting to be sent
+        - on_send: Optional function called with every frame in send order (e.g. to broadcast it)
+        """
+        self.websocket = websocket
+        self.handler = handler
+        self.on_send = on_send
+
+        # Bounds the number of jobs between the receive and send stages (backpressure)
+        self._slots = asyncio.Semaphore(max_pending)
+        # (job, frame) pairs ready to be sent, consumed by the send stage
+        self._outgoing = asyncio.Queue()
+        # Latest incremental job per utterance, for cancelling superseded updates
+        self._latest_incremental = {}
+        # Latest job per order key, whose frames must go out before the next job's
+        self._latest_in_order = {}
+        # Jobs still being processed, cancelled when the connection closes
+        self._active = set()
+        self._next_seq = 0
+
+        # Counters
+        self.received = 0
+        self.superseded = 0
+
+    async def run(self):
+        """Run the pipeline until the client disconnects or a stage fails"""
+        receiver = asyncio.create_task(self._receive_loop())
+        sender = asyncio.create_task(self._send_loop())
+        try:
+            done, pending = await asyncio.wait(
+                {receiver, sender}, return_when=asyncio.FIRST_COMPLETED
+            )
+            # Surface the exception of the stage that stopped (e.g. WebSocketDisconnect)
+            for task in done:
+                task.result()
+        finally:
+            for task in (receiver, sender):
+                task.cancel()
+            for job in list(self._active):
+                job.task.cancel()
+            await asyncio.gather(receiver, sender, return_exceptions=True)
+
+    async def _receive_loop(self):
+        """Receive stage: read frames, number them and start processing"""
+        while True:
+            frame = await self.websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            
+            # Binary frames carry raw audio, text frames carry JSON messages
+            start = time.perf_counter()
+            if frame.get("bytes") is not None:
+                message = decode_binary_frame(frame["bytes"])
+                frame_kind = "binary_frame"
+            else:
+                message = json.loads(frame["text"])
+                frame_kind = "json_frame"
+            if metrics.enabled:
+                stage_duration.observe(
+                    time.perf_counter() - start, "decode", frame_kind, language_label(message.get("language"))
+                )
+            await self.submit(message)
+
+    async def submit(self, message):
+        """Number a received message and start processing it"""
+        # Wait for a free slot so a flood of messages cannot grow memory unbounded
+        await self._slots.acquire()
+
+        self.received += 1
+        is_incremental = bool(message.get("is_incremental", False))
+        utterance_key = (message.get("action"), message.get("utterance_id"))
+
+        # Clients may pass their own trace ID to correlate frames with their logs
+        trace_id = message.get("trace_id")
+        if not isinstance(trace_id, str) or len(trace_id) > 64:
+            trace_id = None
+        
+        job = PipelineJob(self, self._next_seq, message, utterance_key, is_incremental, trace_id)
+        self._next_seq += 1
+
+        # Hold the job's frames until the previous job with the same order key has finished
+        previous_job = self._latest_in_order.get(job.order_key)
+        if previous_job is not None and (not previous_job.finished or previous_job.held is not None):
+            job.held = []
+            previous_job.follower = job
+        self._latest_in_order[job.order_key] = job
+        messages_in_flight.inc(action_label(utterance_key[0]))
+
+        # Any newer message for the same utterance supersedes a pending incremental update
+        previous = self._latest_incremental.pop(utterance_key, None)
+        if previous is not None and previous.task and not previous.task.done():
+            previous.task.cancel()
+            self.superseded += 1
+        if is_incremental:
+            self._latest_incremental[utterance_key] = job
+
+        job.task = asyncio.create_task(self._process(job))
+        job.task.add_done_callback(lambda task, job=job: self._finish(job))
+        self._active.add(job)
+        return job
+
+    async def push(self, frame):
+        """
+        Send a frame that is not a reply to a received message (e.g. a streaming
+        transcription result). Such frames are not bounded by max_pending; their
+        producer is expected to bound its own work.
+        """
+        # Pushed frames do not take a slot: they are produced by work that may itself be
+        # waited for by a job holding one (e.g. stream_end waiting for the last segment)
+        job = PipelineJob(self, self._next_seq, None, None, False, frame.pop("trace_id", None))
+        self._next_seq += 1
+        job.finished = job.released = True
+        await job.emit(frame)
+
+    async def _process(self, job):
+        """Processing stage: run the handler for one message"""
+        try:
+            await self.handler(job.message, job.emit)
+        except Exception as e:
+            await job.emit({
+                "type": "error",
+                "message": str(e)
+            })
+
+    def _finish(self, job):
+        """Mark a job as finished (also when it was cancelled before it started)"""
+        self._active.discard(job)
+        action = action_label(job.utterance_key[0])
+        messages_in_flight.dec(action)
+        if metrics.enabled:
+            message_duration.observe(time.perf_counter() - job.received_at, action)
+        if self._latest_incremental.get(job.utterance_key) is job:
+            del self._latest_incremental[job.utterance_key]
+        # Superseded updates simply end here without sending anything
+        job.finished = True
+        if job.held is None:
+            self._release_follower(job)
+        self._release_slot(job)
+
+    def _release_follower(self, job):
+        """Once all frames of a finished job are queued, let the next job with its order key send"""
+        if job.order_key is not None and self._latest_in_order.get(job.order_key) is job:
+            del self._latest_in_order[job.order_key]
+        follower = job.follower
+        if follower is None:
+            return
+        job.follower = None
+        held, follower.held = follower.held, None
+        for frame in held:
+            self._outgoing.put_nowait((follower, frame))
+        if follower.finished:
+            self._release_follower(follower)
+
+    def _release_slot(self, job):
+        if job.finished and not job.unsent and not job.released:
+            job.released = True
+            self._slots.release()
+
+    async def _send_loop(self):
+        """Send stage: forward frames as they become ready"""
+        while True:
+            job, frame = await self._outgoing.get()
+            try:
+                if self.on_send is not None:
+                    self.on_send(frame)
+                with metrics.timer(stage_duration, "send", "websocket", "none"):
+                    await self.websocket.send_json(frame)
+                frames_sent.inc(frame.get("type"))
+            finally:
+                job.unsent -= 1
+                self._release_slot(job)
+
+    def stats(self):
+        """Return pipeline statistics for this connection"""
+        return {
+            "received": self.received,
+            "superseded": self.superseded,
+            "in_progress": len(self._active),
+            "queued": self._outgoing.qsize()
+        }
@@ -0,0 +1,472 @@
+import io
+import os
+import time
+import wave
+import shutil
+import subprocess
+import asyncio
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+from services.metrics import metrics, language_label, stage_duration
+
+# Load environment variables
+load_dotenv()
+AUDIO_PREPROCESS_ENABLED = os.getenv("AUDIO_PREPROCESS_ENABLED", "true").lower() == "true"
+AUDIO_PREPROCESS_WORKERS = int(os.getenv("AUDIO_PREPROCESS_WORKERS", 2))  # Worker processes for transcoding
+AUDIO_SPLIT_WORKERS = int(os.getenv("AUDIO_SPLIT_WORKERS", 1))  # Separate worker processes for cutting long recordings
+AUDIO_PREPROCESS_QUEUE = int(os.getenv("AUDIO_PREPROCESS_QUEUE", 4))  # Waiting clips per worker before uploads skip preprocessing
+AUDIO_PREPROCESS_MIN_BYTES = int(os.getenv("AUDIO_PREPROCESS_MIN_BYTES", 8192))  # Smaller clips are uploaded as they are
+AUDIO_PREPROCESS_BITRATE = os.getenv("AUDIO_PREPROCESS_BITRATE", "24k")  # Opus bitrate
+AUDIO_SAMPLE_RATE = int(os.getenv("AUDIO_SAMPLE_RATE", 16000))
+AUDIO_SILENCE_THRESHOLD_DB = float(os.getenv("AUDIO_SILENCE_THRESHOLD_DB", -45))  # dBFS below which audio counts as silence
+AUDIO_SILENCE_PADDING_MS = int(os.getenv("AUDIO_SILENCE_PADDING_MS", 200))  # Silence kept around the speech
+
+# ffmpeg demuxer names by container
+AUDIO_CONTAINERS = {
+    "webm": "matroska",
+    "ogg": "ogg",
+    "wav": "wav",
+    "mp3": "mp3",
+    "mp4": "mp4",
+    "flac": "flac",
+}
+
+audio_bytes_total = metrics.counter(
+    "audio_preprocess_bytes_total",
+    "Audio bytes before (in) and after (out) preprocessing",
+    ("direction",)
+)
+
+def detect_audio_format(audio_bytes, default="webm"):
+    """Detect the container of an audio clip from its magic bytes"""
+    head = bytes(audio_bytes[:12])
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "webm"
+    if head.startswith(b"OggS"):
+        return "ogg"
+    if head.startswith(b"RIFF") and head[8:12] == b"WAVE":
+        return "wav"
+    if head.startswith(b"fLaC"):
+        return "flac"
+    if head[4:8] == b"ftyp":
+        return "mp4"
+    if head.startswith(b"ID3") or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return "mp3"
+    return default
+
+def transcode_audio(audio_bytes, source_format, target_format, sample_rate, bitrate, silence_threshold, padding_ms):
+    """
+    Decode, downmix, resample, trim and re-encode one clip (runs in a worker process).
+
+    Returns:
+    - Tuple of (encoded bytes, empty if the clip is only silence; duration in ms; seconds spent per stage)
+    """
+    from pydub import AudioSegment
+    from pydub.silence import detect_leading_silence
+
+    timings = {}
+    start = time.perf_counter()
+    segment = AudioSegment.from_file(io.BytesIO(audio_bytes), format=AUDIO_CONTAINERS.get(source_format))
+    timings["audio_decode"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    segment = segment.set_channels(1).set_frame_rate(sample_rate).set_sample_width(2)
+    timings["audio_resample"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    leading = detect_leading_silence(segment, silence_threshold=silence_threshold)
+    trailing = detect_leading_silence(segment.reverse(), silence_threshold=silence_threshold)
+    if leading >= len(segment):
+        timings["audio_trim"] = time.perf_counter() - start
+        return b"", 0, timings
+    segment = segment[max(0, leading - padding_ms):len(segment) - max(0, trailing - padding_ms)]
+    timings["audio_trim"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    encoded = encode_audio(segment, target_format, bitrate)
+    timings["audio_encode"] = time.perf_counter() - start
+
+    return encoded, len(segment), timings
+
+def encode_audio(segment, target_format, bitrate):
+    """Encode a pydub AudioSegment as Opus in Ogg, or as WAV"""
+    buffer = io.BytesIO()
+    if target_format == "ogg":
+        segment.export(buffer, format="ogg", codec="libopus", bitrate=bitrate, parameters=["-application", "voip"])
+    else:
+        segment.export(buffer, format="wav")
+    return buffer.getvalue()
+
+def plan_cuts(loud, total_ms, frame_ms, segment_ms, max_segment_ms, overlap_ms, min_pause_ms):
+    """
+    Place the cuts of a long recording from the loudness of its frames.
+    Cuts are placed in the pause closest to segment_ms after the previous cut, or hard at
+    max_segment_ms when there is none; segments without any sound are left out.
+
+    Returns:
+    - List of (start ms, end ms) in recording order, overlapping their neighbours by overlap_ms
+    """
+    # Runs of quiet frames are the pauses
+    pause_midpoints = []
+    run_start = None
+    for index, is_loud in enumerate(loud + [True]):
+        if not is_loud and run_start is None:
+            run_start = index
+        elif is_loud and run_start is not None:
+            if (index - run_start) * frame_ms >= min_pause_ms:
+                pause_midpoints.append((run_start + index) * frame_ms // 2)
+            run_start = None
+
+    cuts = [0]
+    while total_ms - cuts[-1] > max_segment_ms:
+        target = cuts[-1] + segment_ms
+        window = [cut for cut in pause_midpoints if cuts[-1] + segment_ms // 2 < cut <= cuts[-1] + max_segment_ms]
+        cuts.append(min(window, key=lambda cut: abs(cut - target)) if window else cuts[-1] + max_segment_ms)
+    cuts.append(total_ms)
+
+    segments = []
+    for start_ms, end_ms in zip(cuts, cuts[1:]):
+        if not any(loud[start_ms // frame_ms:max(start_ms // frame_ms + 1, end_ms // frame_ms)]):
+            continue
+        # Overlap the neighbours so words cut at a hard boundary are heard whole in one of them
+        segments.append((max(0, start_ms - overlap_ms), min(total_ms, end_ms + overlap_ms)))
+    return segments
+
+def split_audio(audio_bytes, source_format, target_format, sample_rate, bitrate, segment_ms, max_segment_ms,
+                overlap_ms, silence_threshold, min_pause_ms, frame_ms=50):
+    """
+    Decode a long recording and cut it at pauses into overlapping segments (runs in a worker process).
+    See plan_cuts for where the cuts are placed.
+
+    Returns:
+    - List of (start ms, end ms, encoded bytes) in recording order
+    """
+    from pydub import AudioSegment
+
+    recording = AudioSegment.from_file(io.BytesIO(audio_bytes), format=AUDIO_CONTAINERS.get(source_format))
+    recording = recording.set_channels(1).set_frame_rate(sample_rate).set_sample_width(2)
+    total_ms = len(recording)
+
+    # Loudness per frame, computed once
+    threshold_rms = recording.max_possible_amplitude * 10 ** (silence_threshold / 20)
+    loud = [recording[start:start + frame_ms].rms > threshold_rms for start in range(0, total_ms, frame_ms)]
+    return [
+        (start_ms, end_ms, encode_audio(recording[start_ms:end_ms], target_format, bitrate))
+        for start_ms, end_ms in plan_cuts(loud, total_ms, frame_ms, segment_ms, max_segment_ms, overlap_ms, min_pause_ms)
+    ]
+
+def read_pcm(path, sample_rate, start_ms=0, end_ms=None, chunk_ms=1000):
+    """
+    Decode (part of) a recording on disk to mono 16-bit PCM chunk by chunk, without
+    holding the whole recording in memory (runs in a worker process). ffmpeg decodes
+    any container; without it only PCM WAV can be read, with the wave module.
+
+    Yields:
+    - Chunks of raw PCM at sample_rate
+    """
+    if shutil.which("ffmpeg") is None:
+        yield from read_wav_pcm(path, sample_rate, start_ms, end_ms, chunk_ms)
+        return
+
+    command = ["ffmpeg", "-nostdin", "-v", "error", "-ss", f"{start_ms / 1000:.3f}"]
+    if end_ms is not None:
+        command += ["-t", f"{(end_ms - start_ms) / 1000:.3f}"]
+    command += ["-i", str(path), "-ac", "1", "-ar", str(sample_rate), "-f", "s16le", "pipe:1"]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        while True:
+            chunk = process.stdout.read(sample_rate * 2 * chunk_ms // 1000)
+            if not chunk:
+                break
+            yield chunk
+        error = process.stderr.read().decode(errors="replace").strip()
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg could not decode the recording: {error}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+def read_wav_pcm(path, sample_rate, start_ms=0, end_ms=None, chunk_ms=1000):
+    """Read (part of) a PCM WAV file as mono 16-bit PCM at sample_rate, chunk by chunk"""
+    from pydub.utils import audioop
+
+    with wave.open(str(path), "rb") as recording:
+        channels, width, rate = recording.getnchannels(), recording.getsampwidth(), recording.getframerate()
+        if channels > 2:
+            raise ValueError(f"WAV files with {channels} channels need ffmpeg")
+        recording.setpos(min(recording.getnframes(), start_ms * rate // 1000))
+        remaining = None if end_ms is None else (end_ms - start_ms) * rate // 1000
+        state = None
+        while remaining is None or remaining > 0:
+            frames = rate * chunk_ms // 1000 if remaining is None else min(rate * chunk_ms // 1000, remaining)
+            data = recording.readframes(frames)
+            if not data:
+                break
+            if remaining is not None:
+                remaining -= frames
+            if width == 1:
+                data = audioop.bias(data, 1, -128)  # 8-bit WAV is unsigned
+            if width != 2:
+                data = audioop.lin2lin(data, width, 2)
+            if channels == 2:
+                data = audioop.tomono(data, 2, 0.5, 0.5)
+            if rate != sample_rate:
+                data, state = audioop.ratecv(data, 2, 1, rate, sample_rate, state)
+            yield data
+
+def find_cuts(path, sample_rate, segment_ms, max_segment_ms, overlap_ms, silence_threshold, min_pause_ms, frame_ms=50):
+    """
+    Find where to cut a long recording on disk, streaming it through the decoder once
+    (runs in a worker process). See plan_cuts for where the cuts are placed.
+
+    Returns:
+    - List of (start ms, end ms) in recording order
+    """
+    from pydub.utils import audioop
+
+    threshold_rms = 2 ** 15 * 10 ** (silence_threshold / 20)
+    frame_bytes = sample_rate * 2 * frame_ms // 1000
+    loud = []
+    total_bytes = 0
+    pending = b""
+    for chunk in read_pcm(path, sample_rate):
+        total_bytes += len(chunk)
+        pending += chunk
+        whole = len(pending) - len(pending) % frame_bytes
+        loud.extend(
+            audioop.rms(pending[offset:offset + frame_bytes], 2) > threshold_rms
+            for offset in range(0, whole, frame_bytes)
+        )
+        pending = pending[whole:]
+    if len(pending) >= 2:
+        loud.append(audioop.rms(pending[:len(pending) - len(pending) % 2], 2) > threshold_rms)
+    total_ms = total_bytes * 1000 // (sample_rate * 2)
+    return plan_cuts(loud, total_ms, frame_ms, segment_ms, max_segment_ms, overlap_ms, min_pause_ms)
+
+def extract_segment(path, target_format, sample_rate, bitrate, start_ms, end_ms):
+    """Decode one segment of a recording on disk and encode it for upload (runs in a worker process)"""
+    from pydub import AudioSegment
+
+    pcm = b"".join(read_pcm(path, sample_rate, start_ms, end_ms))
+    return encode_audio(AudioSegment(data=pcm, sample_width=2, frame_rate=sample_rate, channels=1), target_format, bitrate)
+
+def read_head(path, size=12):
+    """Read the first bytes of a file, to detect its container"""
+    with open(path, "rb") as recording:
+        return recording.read(size)
+
+class AudioPreprocessor:
+    """
+    Normalizes uploads before they go to Whisper: detects the real container,
+    downmixes to mono, resamples to 16 kHz, trims leading/trailing silence and
+    re-encodes to Opus. The CPU work runs in a bounded process pool, so it never
+    blocks the event loop; when the pool is saturated, clips are uploaded as they are.
+    Long recordings are cut in a separate pool, so they never hold up live clips.
+    Without ffmpeg only WAV input (e.g. streaming segments) can be processed,
+    and it is kept as WAV.
+    """
+
+    def __init__(self, enabled=AUDIO_PREPROCESS_ENABLED, workers=AUDIO_PREPROCESS_WORKERS,
+                 queue_size=AUDIO_PREPROCESS_QUEUE, min_bytes=AUDIO_PREPROCESS_MIN_BYTES,
+                 split_workers=AUDIO_SPLIT_WORKERS):
+        self.enabled = enabled and workers > 0
+        self.workers = workers
+        self.split_workers = split_workers
+        self.min_bytes = min_bytes
+        self.has_ffmpeg = shutil.which("ffmpeg") is not None
+        self.target_format = "ogg" if self.has_ffmpeg else "wav"
+        self._executor = None
+        self._split_executor = None
+        # Clips being processed or waiting for a worker
+        self._slots = asyncio.Semaphore(max(1, workers * queue_size))
+        # Long recordings being cut or segments being extracted
+        self._split_slots = asyncio.Semaphore(max(1, split_workers))
+
+        # Counters
+        self.processed = 0
+        self.silent = 0
+        self.skipped = 0
+        self.skipped_busy = 0
+        self.errors = 0
+        self.split_recordings = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.stage_seconds = {}
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = self._new_pool(self.workers)
+        return self._executor
+
+    def _get_split_executor(self):
+        if self._split_executor is None:
+            self._split_executor = self._new_pool(self.split_workers)
+        return self._split_executor
+
+    @staticmethod
+    def _new_pool(workers):
+        # Spawned workers do not inherit the event loop or the app's threads
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+    async def _run_split(self, function, *args, **options):
+        # Long recordings are not live traffic: wait for a worker instead of skipping
+        async with self._split_slots:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._get_split_executor(), functools.partial(function, *args, **options)
+            )
+
+    def can_split(self, audio_format):
+        """Check whether recordings in this container can be cut here"""
+        return self.split_workers > 0 and (self.has_ffmpeg or audio_format == "wav")
+
+    def accepts(self, audio_bytes, audio_format):
+        """Check whether a clip can and should be preprocessed"""
+        if not self.enabled or len(audio_bytes) < self.min_bytes:
+            return False
+        return self.has_ffmpeg or audio_format == "wav"
+
+    async def process(self, audio_bytes, audio_format="webm", language=None):
+        """
+        Normalize one clip for upload.
+
+        Parameters:
+        - audio_bytes: The audio as sent by the client
+        - audio_format: The format the client claimed; the detected container takes precedence
+        - language: Language code, used as metrics label
+
+        Returns:
+        - Tuple of (audio bytes, audio format); the bytes are empty if the clip is only silence.
+          The original clip (with its detected format) is returned if preprocessing is skipped or fails.
+        """
+        audio_format = detect_audio_format(audio_bytes, audio_format)
+        if not self.accepts(audio_bytes, audio_format):
+            self.skipped += 1
+            return audio_bytes, audio_format
+        if self._slots.locked():
+            # All workers and queue slots are taken; uploading as-is beats waiting
+            self.skipped_busy += 1
+            return audio_bytes, audio_format
+
+        async with self._slots:
+            try:
+                processed_bytes, duration_ms, timings = await asyncio.get_running_loop().run_in_executor(
+                    self._get_executor(),
+                    transcode_audio,
+                    bytes(audio_bytes),
+                    audio_format,
+                    self.target_format,
+                    AUDIO_SAMPLE_RATE,
+                    AUDIO_PREPROCESS_BITRATE,
+                    AUDIO_SILENCE_THRESHOLD_DB,
+                    AUDIO_SILENCE_PADDING_MS
+                )
+            except Exception as e:
+                self.errors += 1
+                print(f"WARNING: Audio preprocessing failed, uploading the original clip: {str(e)}")
+                return audio_bytes, audio_format
+
+        for stage, seconds in timings.items():
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+            if metrics.enabled:
+                stage_duration.observe(seconds, stage, "ffmpeg" if self.has_ffmpeg else "pydub", language_label(language))
+
+        if not processed_bytes:
+            self.silent += 1
+            self._count_bytes(len(audio_bytes), 0)
+            return b"", self.target_format
+
+        # Keep the original if re-encoding did not make it smaller
+        if len(processed_bytes) >= len(audio_bytes):
+            self._count_bytes(len(audio_bytes), len(audio_bytes))
+            return audio_bytes, audio_format
+
+        self.processed += 1
+        self._count_bytes(len(audio_bytes), len(processed_bytes))
+        return processed_bytes, self.target_format
+
+    async def split(self, audio_bytes, audio_format="webm", **options):
+        """
+        Cut a long recording into overlapping segments at pauses (see split_audio).
+
+        Parameters:
+        - options: segment_ms, max_segment_ms, overlap_ms, silence_threshold and min_pause_ms
+
+        Returns:
+        - Tuple of (list of (start ms, end ms, bytes), format of the segments), or (None, detected format)
+          if the recording cannot be decoded here (no ffmpeg and not WAV)
+        """
+        audio_format = detect_audio_format(audio_bytes, audio_format)
+        if not self.can_split(audio_format):
+            return None, audio_format
+
+        segments = await self._run_split(
+            split_audio, bytes(audio_bytes), audio_format, self.target_format,
+            AUDIO_SAMPLE_RATE, AUDIO_PREPROCESS_BITRATE, **options
+        )
+        self.split_recordings += 1
+        return segments, self.target_format
+
+    async def split_file(self, path, audio_format="webm", **options):
+        """
+        Find the segments of a long recording on disk without loading it into memory;
+        each segment is then decoded on its own with extract.
+
+        Parameters:
+        - options: segment_ms, max_segment_ms, overlap_ms, silence_threshold and min_pause_ms
+
+        Returns:
+        - Tuple of (list of (start ms, end ms), format extract returns), or (None, detected format)
+          if the recording cannot be decoded here (no ffmpeg and not WAV)
+        """
+        audio_format = detect_audio_format(await asyncio.to_thread(read_head, path), audio_format)
+        if not self.can_split(audio_format):
+            return None, audio_format
+
+        cuts = await self._run_split(find_cuts, str(path), AUDIO_SAMPLE_RATE, **options)
+        self.split_recordings += 1
+        return cuts, self.target_format
+
+    async def extract(self, path, start_ms, end_ms):
+        """Decode and encode one segment found by split_file"""
+        return await self._run_split(
+            extract_segment, str(path), self.target_format, AUDIO_SAMPLE_RATE, AUDIO_PREPROCESS_BITRATE, start_ms, end_ms
+        )
+
+    def _count_bytes(self, bytes_in, bytes_out):
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+        audio_bytes_total.inc("in", amount=bytes_in)
+        audio_bytes_total.inc("out", amount=bytes_out)
+
+    async def close(self):
+        executors = [executor for executor in (self._executor, self._split_executor) if executor is not None]
+        self._executor = self._split_executor = None
+        # Wait for the workers to exit, so none is left behind as an orphan
+        for executor in executors:
+            await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "target_format": self.target_format,
+            "workers": self.workers,
+            "split_workers": self.split_workers,
+            "processed": self.processed,
+            "silent": self.silent,
+            "skipped": self.skipped,
+            "skipped_busy": self.skipped_busy,
+            "errors": self.errors,
+            "split_recordings": self.split_recordings,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "bytes_saved": self.bytes_in - self.bytes_out,
+            "stage_seconds": {stage: round(seconds, 3) for stage, seconds in self.stage_seconds.items()}
+        }
+
+# Shared preprocessor used by the Whisper service
+audio_preprocessor = AudioPreprocessor()
@@ -0,0 +1,779 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import threading
+from pathlib import Path
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where a single worker process is assumed
+    fcntl = None
+from collections import Counter
+from dotenv import load_dotenv
+from services.text_utils import is_error_translation, join_segments
+
+# Load environment variables
+load_dotenv()
+BATCH_DIR = os.getenv("BATCH_DIR", "")  # Job database, uploaded recordings and results; empty (the default) disables batch jobs
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", 2))  # Recordings processed at once
+BATCH_INPUT_DIRS = os.getenv("BATCH_INPUT_DIRS", "")  # Comma-separated server directories jobs may read; empty allows uploads only
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", 1000))  # Recordings per job
+BATCH_MAX_FILE_BYTES = int(os.getenv("BATCH_MAX_FILE_BYTES", 500 * 1024 * 1024))  # Size limit of one recording
+
+# Recording file extensions and the container format they are sent as
+AUDIO_EXTENSIONS = {
+    ".wav": "wav",
+    ".mp3": "mp3",
+    ".m4a": "mp4",
+    ".mp4": "mp4",
+    ".ogg": "ogg",
+    ".opus": "ogg",
+    ".webm": "webm",
+    ".flac": "flac",
+}
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Seconds between checks for new results while following a running job
+RESULTS_POLL_SECONDS = 0.5
+# Seconds between checks for jobs submitted through other worker processes
+QUEUE_POLL_SECONDS = 5
+
+FINISHED_JOB_STATUSES = ("completed", "cancelled")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    language TEXT NOT NULL,
+    target_languages TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS files (
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    name TEXT NOT NULL,
+    uploaded INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    PRIMARY KEY (job_id, position)
+);
+CREATE INDEX IF NOT EXISTS files_by_status ON files (status);
+CREATE TABLE IF NOT EXISTS segments (
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    segment INTEGER NOT NULL,
+    start_ms INTEGER,
+    end_ms INTEGER,
+    text TEXT NOT NULL,
+    detected_language TEXT,
+    translations TEXT NOT NULL,
+    error TEXT,
+    translation_errors TEXT,
+    PRIMARY KEY (job_id, position, segment)
+);
+"""
+
+# Columns added to existing databases, with their definitions
+SEGMENT_COLUMNS = {"translation_errors": "TEXT"}
+
+class BatchJobError(Exception):
+    """Raised when a batch job cannot be submitted"""
+    pass
+
+class BatchJobStore:
+    """
+    SQLite record of the batch jobs, their recordings and every finished segment.
+    Progress is committed segment by segment, so a restart resumes each
+    recording at its first unfinished segment.
+    """
+
+    def __init__(self, db_path):
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+            # Databases created by an earlier version lack newer columns
+            existing = {row["name"] for row in self._db.execute("PRAGMA table_info(segments)")}
+            for column, definition in SEGMENT_COLUMNS.items():
+                if column not in existing:
+                    self._db.execute(f"ALTER TABLE segments ADD COLUMN {column} {definition}")
+            self._db.commit()
+
+    def create_job(self, job_id, files, language, target_languages, priority):
+        """
+        Parameters:
+        - files: List of (path, name, uploaded) in processing order; uploaded copies are deleted once processed
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, status, priority, language, target_languages, created_at) "
+                "VALUES (?, 'queued', ?, ?, ?, ?)",
+                (job_id, priority, language, json.dumps(target_languages), now)
+            )
+            self._db.executemany(
+                "INSERT INTO files (job_id, position, path, name, uploaded, status) VALUES (?, ?, ?, ?, ?, 'pending')",
+                [(job_id, position, path, name, int(uploaded)) for position, (path, name, uploaded) in enumerate(files)]
+            )
+            self._db.commit()
+
+    def requeue_interrupted(self):
+        """Put recordings that were being processed when the server stopped back in the queue"""
+        with self._lock:
+            count = self._db.execute("UPDATE files SET status = 'pending' WHERE status = 'running'").rowcount
+            self._db.commit()
+        return count
+
+    def claim_file(self):
+        """
+        Take the next pending recording: highest job priority first, then oldest job, then file order.
+
+        Returns:
+        - Dict with the recording and its job's settings, or None if nothing is pending
+        """
+        with self._lock:
+            # Claim atomically, also against other worker processes sharing the database
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT f.job_id, f.position, f.path, f.name, f.uploaded, j.language, j.target_languages "
+                    "FROM files f JOIN jobs j ON j.id = f.job_id "
+                    "WHERE f.status = 'pending' AND j.status IN ('queued', 'running') "
+                    "ORDER BY j.priority DESC, j.created_at, f.position LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE files SET status = 'running' WHERE job_id = ? AND position = ?",
+                        (row["job_id"], row["position"])
+                    )
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'running' WHERE id = ? AND status = 'queued'", (row["job_id"],)
+                    )
+                self._db.commit()
+            except sqlite3.Error:
+                self._db.rollback()
+                raise
+        if row is None:
+            return None
+        file = dict(row)
+        file["target_languages"] = json.loads(file["target_languages"])
+        return file
+
+    def completed_segments(self, job_id, position):
+        """Return the finished segments of a recording in order"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT segment, start_ms, end_ms, text, detected_language, translations, error, translation_errors "
+                "FROM segments "
+                "WHERE job_id = ? AND position = ? ORDER BY segment",
+                (job_id, position)
+            ).fetchall()
+        return [self._segment_from_row(row) for row in rows]
+
+    @staticmethod
+    def _segment_from_row(row):
+        segment = dict(row)
+        segment["translations"] = json.loads(segment["translations"])
+        if segment["error"] is None:
+            del segment["error"]
+        if segment["translation_errors"] is None:
+            del segment["translation_errors"]
+        else:
+            segment["translation_errors"] = json.loads(segment["translation_errors"])
+        return segment
+
+    def job_status(self, job_id):
+        with self._lock:
+            row = self._db.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row["status"] if row else None
+
+    def save_segment(self, job_id, position, segment):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO segments "
+                "(job_id, position, segment, start_ms, end_ms, text, detected_language, translations, error, "
+                "translation_errors) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, position, segment["segment"], segment["start_ms"], segment["end_ms"], segment["text"],
+                 segment["detected_language"], json.dumps(segment["translations"], ensure_ascii=False),
+                 segment.get("error"),
+                 json.dumps(segment["translation_errors"], ensure_ascii=False)
+                 if segment.get("translation_errors") else None)
+            )
+            self._db.commit()
+
+    def finish_file(self, job_id, position, status, error=None):
+        """
+        Record the outcome of a recording ("done", "failed" or "cancelled").
+
+        Returns:
+        - True if it was the job's last recording and the job is now completed
+        """
+        with self._lock:
+            self._db.execute(
+                "UPDATE files SET status = ?, error = ? WHERE job_id = ? AND position = ? AND status = 'running'",
+                (status, error, job_id, position)
+            )
+            (remaining,) = self._db.execute(
+                "SELECT COUNT(*) FROM files WHERE job_id = ? AND status IN ('pending', 'running')", (job_id,)
+            ).fetchone()
+            completed = False
+            if not remaining:
+                completed = self._db.execute(
+                    "UPDATE jobs SET status = 'completed', finished_at = ? WHERE id = ? AND status = 'running'",
+                    (time.time(), job_id)
+                ).rowcount == 1
+            self._db.commit()
+        return completed
+
+    def cancel_job(self, job_id):
+        """
+        Cancel a job: its pending recordings are skipped, running ones are stopped by the caller.
+
+        Returns:
+        - True if the job was cancelled, False if it does not exist or already finished
+        """
+        with self._lock:
+            cancelled = self._db.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status IN ('queued', 'running')",
+                (time.time(), job_id)
+            ).rowcount == 1
+            if cancelled:
+                self._db.execute(
+                    "UPDATE files SET status = 'cancelled' WHERE job_id = ? AND status = 'pending'", (job_id,)
+                )
+            self._db.commit()
+        return cancelled
+
+    def uploaded_paths(self, job_id, statuses):
+        """Paths of a job's uploaded copies in the given file statuses"""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT path FROM files WHERE job_id = ? AND uploaded = 1 AND status IN ({','.join('?' * len(statuses))})",
+                (job_id, *statuses)
+            ).fetchall()
+        return [row["path"] for row in rows]
+
+    def get_job(self, job_id, with_files=False):
+        """Return a job with its progress, or None if it does not exist"""
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            counts = dict(self._db.execute(
+                "SELECT status, COUNT(*) FROM files WHERE job_id = ? GROUP BY status", (job_id,)
+            ).fetchall())
+            (segments,) = self._db.execute("SELECT COUNT(*) FROM segments WHERE job_id = ?", (job_id,)).fetchone()
+            files = None
+            if with_files:
+                files = [dict(file) for file in self._db.execute(
+                    "SELECT f.position, f.name, f.status, f.error, "
+                    "(SELECT COUNT(*) FROM segments s WHERE s.job_id = f.job_id AND s.position = f.position) AS segments "
+                    "FROM files f WHERE f.job_id = ? ORDER BY f.position",
+                    (job_id,)
+                ).fetchall()]
+        job = self._job_from_row(row, counts)
+        job["segments_done"] = segments
+        if files is not None:
+            job["file_list"] = files
+        return job
+
+    def list_jobs(self, limit=100):
+        """Return the most recent jobs with their progress"""
+        with self._lock:
+            rows = self._db.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+            counts = {}
+            for job_id, status, count in self._db.execute(
+                "SELECT job_id, status, COUNT(*) FROM files WHERE job_id IN "
+                "(SELECT id FROM jobs ORDER BY created_at DESC LIMIT ?) GROUP BY job_id, status",
+                (limit,)
+            ).fetchall():
+                counts.setdefault(job_id, {})[status] = count
+        return [self._job_from_row(row, counts.get(row["id"], {})) for row in rows]
+
+    @staticmethod
+    def _job_from_row(row, counts):
+        return {
+            "job_id": row["id"],
+            "status": row["status"],
+            "priority": row["priority"],
+            "language": row["language"],
+            "target_languages": json.loads(row["target_languages"]),
+            "created_at": row["created_at"],
+            "finished_at": row["finished_at"],
+            "files": {
+                "total": sum(counts.values()),
+                **{status: counts.get(status, 0) for status in ("pending", "running", "done", "failed", "cancelled")}
+            }
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+class BatchJobManager:
+    """
+    Bulk transcription and translation of recordings (e.g. archives of lectures).
+    Jobs are kept in SQLite and processed by a pool of workers, one recording
+    per worker, highest priority first. Recordings are transcribed in parallel
+    segments by the long audio transcriber and every segment is translated into
+    the job's target languages; all upstream calls go through the shared rate
+    limiter as background requests, so bulk work only uses the capacity live
+    traffic leaves over. Results are appended to one JSONL file per job as they
+    are produced, and progress survives restarts.
+    With several application worker processes, all accept jobs but only the
+    one holding the lock file runs the batch workers.
+    """
+
+    def __init__(self, transcriber, translate, batch_dir=BATCH_DIR, workers=BATCH_WORKERS,
+                 input_dirs=BATCH_INPUT_DIRS):
+        """
+        Parameters:
+        - transcriber: The LongAudioTranscriber used for the recordings
+        - translate: Coroutine function translate(text, source_lang, target_lang) returning the translation
+        - batch_dir: Directory of the job database, uploaded recordings and results (empty disables batch jobs)
+        - workers: Number of recordings processed at once
+        - input_dirs: Comma-separated server directories jobs may read recordings from
+        """
+        self.transcriber = transcriber
+        self.translate = translate
+        self.batch_dir = Path(batch_dir) if batch_dir else None
+        self.workers = max(1, workers)
+        self.input_dirs = [Path(path.strip()).expanduser().resolve() for path in input_dirs.split(",") if path.strip()]
+        self.store = None
+
+        self._workers = []
+        self._lock_file = None
+        # Task processing each recording, by (job ID, position), for cancelling a job
+        self._processing = {}
+        self._closing = False
+        # Wakes idle workers when a job is submitted; the generation tells them whether they missed one
+        self._wakeup = asyncio.Event()
+        self._generation = 0
+        self._results_lock = threading.Lock()
+
+        # Counters
+        self.jobs_submitted = 0
+        self.files_done = 0
+        self.files_failed = 0
+        self.segments_done = 0
+        self.resumed_files = 0
+
+    @property
+    def enabled(self):
+        return self.batch_dir is not None
+
+    async def start(self):
+        """Open the job database and start the workers (called on application startup)"""
+        if not self.enabled or self.store is not None:
+            return
+        try:
+            for directory in (self.batch_dir, self.batch_dir / "uploads", self.batch_dir / "results"):
+                directory.mkdir(parents=True, exist_ok=True)
+            self.store = await asyncio.to_thread(BatchJobStore, str(self.batch_dir / "jobs.db"))
+        except (OSError, sqlite3.Error) as e:
+            print(f"WARNING: Could not open the batch job database in '{self.batch_dir}': {e}. Batch jobs are disabled.")
+            self.batch_dir = None
+            return
+
+        if not self._acquire_worker_lock():
+            # Another process runs the workers; this one only accepts jobs and serves results
+            return
+        self.resumed_files = await asyncio.to_thread(self.store.requeue_interrupted)
+        self._closing = False
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def _acquire_worker_lock(self):
+        """Become the process running the workers, unless another process already is"""
+        if fcntl is None:
+            return True
+        lock_file = open(self.batch_dir / "workers.lock", "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    async def close(self):
+        """Stop the workers (called on shutdown); interrupted recordings resume on the next start"""
+        self._closing = True
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+        if self.store is not None:
+            await asyncio.to_thread(self.store.close)
+            self.store = None
+
+    def _require_store(self):
+        if self.store is None:
+            raise BatchJobError("Batch jobs are disabled. Set BATCH_DIR to enable them.")
+
+    @staticmethod
+    def new_job_id():
+        return f"job_{uuid.uuid4().hex}"
+
+    def upload_path(self, job_id, position, filename):
+        """Where an uploaded recording of a job is stored until it is processed"""
+        suffix = Path(filename or "").suffix.lower()
+        return self.batch_dir / "uploads" / job_id / f"{position:05d}{suffix if suffix in AUDIO_EXTENSIONS else ''}"
+
+    def results_path(self, job_id):
+        return self.batch_dir / "results" / f"{job_id}.jsonl"
+
+    async def save_upload(self, job_id, position, upload):
+        """
+        Store an uploaded recording (an UploadFile) on disk, chunk by chunk.
+
+        Returns:
+        - Tuple of (path, name, uploaded) for submit
+
+        Raises:
+        - BatchJobError: If the recording exceeds BATCH_MAX_FILE_BYTES
+        """
+        self._require_store()
+        path = self.upload_path(job_id, position, upload.filename)
+        await asyncio.to_thread(path.parent.mkdir, parents=True, exist_ok=True)
+        size = 0
+        with open(path, "wb") as output:
+            while True:
+                chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > BATCH_MAX_FILE_BYTES:
+                    output.close()
+                    await self.discard_uploads(job_id)
+                    raise BatchJobError(f"'{upload.filename}' exceeds {BATCH_MAX_FILE_BYTES} bytes")
+                await asyncio.to_thread(output.write, chunk)
+        return str(path), Path(upload.filename or "").name or f"upload_{position}", True
+
+    async def discard_uploads(self, job_id):
+        """Delete the uploads of a job that was not submitted"""
+        directory = self.batch_dir / "uploads" / job_id
+        await asyncio.to_thread(self._remove_paths, list(directory.glob("*")) + [directory])
+
+    @staticmethod
+    def _remove_paths(paths):
+        for path in paths:
+            try:
+                os.rmdir(path) if os.path.isdir(path) else os.remove(path)
+            except OSError:
+                pass
+
+    def resolve_inputs(self, paths=(), directory=None, recursive=False, pattern="*"):
+        """
+        Find recordings on the server (in BATCH_INPUT_DIRS) for a job.
+
+        Parameters:
+        - paths: Recording paths, relative to the first input directory or absolute
+        - directory: A directory whose recordings (by extension) are added in name order
+        - recursive: Whether to include the directory's subdirectories
+        - pattern: Glob pattern the recordings' names must match
+
+        Returns:
+        - List of (path, name, uploaded) for submit
+
+        Raises:
+        - BatchJobError: If server paths are disabled, a path is outside the input directories or nothing was found
+        """
+        if not self.input_dirs:
+            raise BatchJobError("Reading recordings on the server is disabled. Set BATCH_INPUT_DIRS to allow it.")
+
+        found = []
+        if directory:
+            base = self._resolve_input(directory)
+            if not base.is_dir():
+                raise BatchJobError(f"'{directory}' is not a directory")
+            candidates = base.rglob(pattern or "*") if recursive else base.glob(pattern or "*")
+            found.extend(sorted(
+                path for path in candidates if path.suffix.lower() in AUDIO_EXTENSIONS and path.is_file()
+            ))
+        for value in paths:
+            path = self._resolve_input(value)
+            if not path.is_file():
+                raise BatchJobError(f"'{value}' is not a file")
+            found.append(path)
+
+        files = []
+        for path in dict.fromkeys(found):
+            root = next(root for root in self.input_dirs if path.is_relative_to(root))
+            files.append((str(path), str(path.relative_to(root)), False))
+        if not files:
+            raise BatchJobError("No recordings found")
+        return files
+
+    def _resolve_input(self, value):
+        path = Path(value).expanduser()
+        if not path.is_absolute():
+            path = self.input_dirs[0] / path
+        path = path.resolve()
+        if not any(path.is_relative_to(root) for root in self.input_dirs):
+            raise BatchJobError(f"'{value}' is outside the directories batch jobs may read")
+        return path
+
+    async def submit(self, files, language="auto", target_languages=("de",), priority=0, job_id=None):
+        """
+        Queue a job.
+
+        Parameters:
+        - files: List of (path, name, uploaded) from save_upload or resolve_inputs
+        - language: Language code of the recordings (or "auto")
+        - target_languages: Languages every segment is translated into
+        - priority: Jobs with a higher priority are processed first
+
+        Returns:
+        - The job with its progress
+
+        Raises:
+        - BatchJobError: If batch jobs are disabled or the job has too many recordings
+        """
+        self._require_store()
+        if not files:
+            raise BatchJobError("No recordings given")
+        if len(files) > BATCH_MAX_FILES:
+            raise BatchJobError(f"A job may contain at most {BATCH_MAX_FILES} recordings")
+        job_id = job_id or self.new_job_id()
+        await asyncio.to_thread(
+            self.store.create_job, job_id, files, language or "auto", list(target_languages), int(priority)
+        )
+        self.jobs_submitted += 1
+        self._generation += 1
+        self._wakeup.set()
+        return await self.get_job(job_id)
+
+    async def get_job(self, job_id, with_files=False):
+        self._require_store()
+        return await asyncio.to_thread(self.store.get_job, job_id, with_files)
+
+    async def list_jobs(self, limit=100):
+        self._require_store()
+        return await asyncio.to_thread(self.store.list_jobs, limit)
+
+    async def cancel(self, job_id):
+        """
+        Cancel a queued or running job.
+
+        Returns:
+        - True if the job was cancelled
+        """
+        self._require_store()
+        if not await asyncio.to_thread(self.store.cancel_job, job_id):
+            return False
+        for (running_job, _), task in list(self._processing.items()):
+            if running_job == job_id:
+                task.cancel()
+        await asyncio.to_thread(self._append_results, job_id, [{"type": "job_result", "job_id": job_id, "status": "cancelled"}])
+        uploads = await asyncio.to_thread(self.store.uploaded_paths, job_id, ("cancelled",))
+        await asyncio.to_thread(self._remove_paths, uploads + [self.batch_dir / "uploads" / job_id])
+        return True
+
+    async def read_results(self, job_id, follow=False):
+        """
+        Yield the job's results file in complete lines; with follow, keep yielding new
+        lines as they are written until the job is finished
+        """
+        self._require_store()
+        offset = 0
+        finished = False
+        while True:
+            chunk = await asyncio.to_thread(self._read_lines, self.results_path(job_id), offset)
+            if chunk:
+                offset += len(chunk)
+                yield chunk
+                continue
+            if finished or not follow:
+                return
+            job = await self.get_job(job_id)
+            # Read once more after the job finished, for the lines written just before
+            finished = job is None or job["status"] in FINISHED_JOB_STATUSES
+            if not finished:
+                await asyncio.sleep(RESULTS_POLL_SECONDS)
+
+    @staticmethod
+    def _read_lines(path, offset):
+        try:
+            with open(path, "rb") as results:
+                results.seek(offset)
+                data = results.read()
+        except FileNotFoundError:
+            return b""
+        # A line being written is left for the next read
+        return data[:data.rfind(b"\n") + 1]
+
+    def _append_results(self, job_id, lines):
+        data = "".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines)
+        with self._results_lock:
+            with open(self.results_path(job_id), "a", encoding="utf-8") as results:
+                results.write(data)
+
+    async def _worker(self):
+        """Process pending recordings one at a time until shutdown"""
+        while True:
+            generation = self._generation
+            try:
+                file = await asyncio.to_thread(self.store.claim_file)
+            except sqlite3.Error as e:
+                print(f"WARNING: Could not read the batch job queue: {e}")
+                file = None
+            if file is None:
+                if self._generation == generation:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), QUEUE_POLL_SECONDS)
+                    except asyncio.TimeoutError:
+                        pass
+                continue
+
+            key = (file["job_id"], file["position"])
+            task = asyncio.create_task(self._process_file(file))
+            self._processing[key] = task
+            try:
+                status, error = await task
+            except asyncio.CancelledError:
+                if self._closing:
+                    # Left "running" in the database, so it resumes on the next start
+                    task.cancel()
+                    raise
+                status, error = "cancelled", None
+            except Exception as e:
+                status, error = "failed", str(e)
+            finally:
+                self._processing.pop(key, None)
+            await self._finish_file(file, status, error)
+
+    async def _finish_file(self, file, status, error):
+        if status == "done":
+            self.files_done += 1
+        elif status == "failed":
+            self.files_failed += 1
+            await asyncio.to_thread(self._append_results, file["job_id"], [{
+                "type": "file_result", "file": file["name"], "position": file["position"],
+                "success": False, "error": error
+            }])
+        completed = await asyncio.to_thread(self.store.finish_file, file["job_id"], file["position"], status, error)
+        if file["uploaded"]:
+            await asyncio.to_thread(self._remove_paths, [file["path"]])
+        if completed:
+            await asyncio.to_thread(self._remove_paths, [self.batch_dir / "uploads" / file["job_id"]])
+            job = await self.get_job(file["job_id"])
+            await asyncio.to_thread(self._append_results, file["job_id"], [{
+                "type": "job_result", "job_id": file["job_id"], "status": "completed",
+                "files": job["files"]["total"], "failed_files": job["files"]["failed"]
+            }])
+
+    async def _process_file(self, file):
+        """
+        Transcribe and translate one recording, resuming after its finished segments.
+
+        Returns:
+        - Tuple of (file status, error message or None)
+        """
+        job_id, position, name = file["job_id"], file["position"], file["name"]
+        target_languages = file["target_languages"]
+        path = Path(file["path"])
+        try:
+            size = await asyncio.to_thread(lambda: path.stat().st_size)
+        except OSError as e:
+            return "failed", f"Cannot read the recording: {e.strerror}"
+        if size > BATCH_MAX_FILE_BYTES:
+            return "failed", f"The recording exceeds {BATCH_MAX_FILE_BYTES} bytes"
+
+        done = await asyncio.to_thread(self.store.completed_segments, job_id, position)
+        async for segment in self.transcriber.transcribe_file(
+            path, file["language"], AUDIO_EXTENSIONS.get(path.suffix.lower(), "webm"),
+            skip_segments=len(done), previous_text=done[-1]["text"] if done else "", background=True
+        ):
+            translations, translation_errors = {}, {}
+            if segment["text"]:
+                results = await asyncio.gather(*(
+                    self._translate(segment["text"], segment["detected_language"], target_lang)
+                    for target_lang in target_languages
+                ))
+                for target_lang, (translated_text, error) in zip(target_languages, results):
+                    translations[target_lang] = translated_text
+                    if error:
+                        translation_errors[target_lang] = error
+            await asyncio.to_thread(self._append_results, job_id, [
+                {"type": "segment", "file": name, "position": position, **segment}
+            ] + [
+                {"type": "segment_translation", "file": name, "position": position, "segment": segment["segment"],
+                 "target_language": target_lang, "translated_text": translated_text,
+                 **({"error": translation_errors[target_lang]} if target_lang in translation_errors else {})}
+                for target_lang, translated_text in translations.items()
+            ])
+            segment = {**segment, "translations": translations}
+            if translation_errors:
+                segment["translation_errors"] = translation_errors
+            await asyncio.to_thread(self.store.save_segment, job_id, position, segment)
+            done.append(segment)
+            self.segments_done += 1
+            # The job may have been cancelled through another worker process
+            if await asyncio.to_thread(self.store.job_status, job_id) == "cancelled":
+                return "cancelled", None
+
+        languages = Counter(
+            segment["detected_language"] for segment in done
+            if segment["text"] and segment["detected_language"] not in ("auto", "unknown")
+        )
+        translations = {
+            target_lang: join_segments(
+                (segment["translations"].get(target_lang, "") for segment in done), target_lang
+            )
+            for target_lang in target_languages
+        }
+        await asyncio.to_thread(self._append_results, job_id, [{
+            "type": "file_result",
+            "file": name,
+            "position": position,
+            "success": True,
+            "text": " ".join(segment["text"] for segment in done if segment["text"]),
+            "translations": translations,
+            "detected_language": languages.most_common(1)[0][0] if languages else file["language"],
+            "segments": len(done),
+            "failed_segments": sum(1 for segment in done if "error" in segment),
+            "failed_translations": {
+                target_lang: sum(1 for segment in done if target_lang in segment.get("translation_errors", {}))
+                for target_lang in target_languages
+            }
+        }])
+        return "done", None
+
+    async def _translate(self, text, source_lang, target_lang):
+        """
+        Translate one segment; a failure only affects this segment and language.
+
+        Returns:
+        - Tuple of (translation, or "" if it failed; error message or None)
+        """
+        try:
+            translated_text = await self.translate(text, source_lang, target_lang)
+        except Exception as e:
+            return "", str(e)
+        if is_error_translation(translated_text):
+            return "", translated_text
+        return translated_text, None
+
+    def stats(self):
+        return {
+            "enabled": self.store is not None,
+            "workers": len(self._workers),
+            "processing": len(self._processing),
+            "jobs_submitted": self.jobs_submitted,
+            "files_done": self.files_done,
+            "files_failed": self.files_failed,
+            "segments_done": self.segments_done,
+            "resumed_files": self.resumed_files
+        }
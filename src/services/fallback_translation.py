@@ -0,0 +1,201 @@
+import os
+import re
+import asyncio
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from services.http_client import http_pool
+from services.text_utils import join_segments
+
+# Load environment variables
+load_dotenv()
+FALLBACK_TRANSLATION_PROVIDER = os.getenv("FALLBACK_TRANSLATION_PROVIDER", "googletrans").lower()  # "googletrans" or "google_web"
+FALLBACK_TRANSLATE_URL = os.getenv("FALLBACK_TRANSLATE_URL", "https://translate.googleapis.com/translate_a/single")
+FALLBACK_MAX_CHUNK_CHARS = int(os.getenv("FALLBACK_MAX_CHUNK_CHARS", 1000))  # Longer texts are sent in several requests
+FALLBACK_TRANSLATION_THREADS = int(os.getenv("FALLBACK_TRANSLATION_THREADS", 4))  # Threads for blocking providers
+STT_TIMEOUT = int(os.getenv("STT_TIMEOUT", 7))
+
+# Sentences with their trailing punctuation and whitespace
+SENTENCE = re.compile(r".+?(?:[.!?؟。！？]+\s*|$)", re.DOTALL)
+
+def split_text(text, max_chars):
+    """
+    Split a text into chunks of at most max_chars characters, at sentence ends
+    where possible, then at spaces, and only as a last resort inside a word.
+    """
+    pieces = []
+    for sentence in SENTENCE.findall(text):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars + 1)
+            if cut > 0:
+                # The piece keeps its space, so words stay apart when pieces are merged below
+                pieces.append(sentence[:cut + 1])
+                sentence = sentence[cut + 1:].lstrip()
+            else:
+                pieces.append(sentence[:max_chars])
+                sentence = sentence[max_chars:]
+        if sentence:
+            pieces.append(sentence)
+
+    chunks = []
+    for piece in pieces:
+        if chunks and len(chunks[-1]) + len(piece) <= max_chars:
+            chunks[-1] += piece
+        else:
+            chunks.append(piece)
+    return [chunk.strip() for chunk in chunks if chunk.strip()]
+
+class FallbackTranslationProvider(ABC):
+    """
+    Interface of the basic (non-LLM) translation providers used for single
+    words, short incremental updates and when Groq is disabled.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    async def translate(self, text, source_lang, target_lang):
+        """
+        Translate text, detecting the source language if it is "auto".
+
+        Returns:
+        - Tuple of (translated text, detected source language)
+
+        Raises any error of the underlying service.
+        """
+
+    async def close(self):
+        """Release the provider's resources (called on shutdown)"""
+
+    def stats(self):
+        return {"provider": self.name}
+
+class GoogleWebTranslationProvider(FallbackTranslationProvider):
+    """
+    Translates through Google's public web translation endpoint with native
+    async HTTP over the shared connection pool. One request both detects the
+    source language and translates, and no threads are involved, so the
+    fallback path scales with concurrency instead of thread count.
+    The text is sent in the form body of a POST, never in the URL, and long
+    texts are split into chunks of at most FALLBACK_MAX_CHUNK_CHARS characters
+    that are translated concurrently.
+    """
+
+    name = "google_web"
+
+    def __init__(self, http_client=None, url=FALLBACK_TRANSLATE_URL, timeout=STT_TIMEOUT,
+                 max_chunk_chars=FALLBACK_MAX_CHUNK_CHARS):
+        self.http_client = http_client or http_pool
+        self.url = url
+        self.timeout = timeout
+        self.max_chunk_chars = max_chunk_chars
+
+        # Counters
+        self.requests = 0
+        self.errors = 0
+        self.chunked_texts = 0
+
+    async def translate(self, text, source_lang, target_lang):
+        chunks = split_text(text, self.max_chunk_chars) if len(text) > self.max_chunk_chars else [text]
+        if len(chunks) == 1:
+            return await self._translate_chunk(chunks[0], source_lang, target_lang)
+
+        self.chunked_texts += 1
+        results = await asyncio.gather(*(
+            self._translate_chunk(chunk, source_lang, target_lang) for chunk in chunks
+        ))
+        return join_segments([translated for translated, _ in results], target_lang), results[0][1]
+
+    async def _translate_chunk(self, text, source_lang, target_lang):
+        self.requests += 1
+        params = {
+            "client": "gtx",
+            "sl": source_lang or "auto",
+            "tl": target_lang,
+            "dt": "t"
+        }
+        session = await self.http_client.get_session()
+        async with session.post(
+            self.url,
+            params=params,
+            data={"q": text},
+            timeout=self.http_client.timeout(total=self.timeout)
+        ) as response:
+            if response.status != 200:
+                self.errors += 1
+                raise RuntimeError(f"{response.status} - {(await response.text())[:100]}")
+            # Response layout: [[[translated, original, ...], ...], None, detected_language, ...]
+            data = await response.json(content_type=None)
+
+        translated_text = "".join(segment[0] for segment in data[0] or [] if segment and segment[0])
+        detected_lang = data[2] if len(data) > 2 and isinstance(data[2], str) else source_lang
+        return translated_text, detected_lang
+
+    def stats(self):
+        return {
+            "provider": self.name,
+            "requests": self.requests,
+            "errors": self.errors,
+            "chunked_texts": self.chunked_texts,
+            "max_chunk_chars": self.max_chunk_chars
+        }
+
+class GoogletransProvider(FallbackTranslationProvider):
+    """
+    Wraps the blocking googletrans Translator. Calls run on a small dedicated
+    executor, so they cannot use up the default thread pool that other
+    to_thread work (e.g. the SQLite cache tier) relies on. Language detection
+    comes from the translate call itself, without a separate detect round trip.
+    """
+
+    name = "googletrans"
+
+    def __init__(self, translator=None, max_workers=FALLBACK_TRANSLATION_THREADS):
+        if translator is None:
+            from googletrans import Translator
+            translator = Translator()
+        self.translator = translator
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="googletrans")
+
+        # Counters
+        self.requests = 0
+        self.pending = 0
+
+    async def translate(self, text, source_lang, target_lang):
+        self.requests += 1
+        self.pending += 1
+        try:
+            translation = await asyncio.get_running_loop().run_in_executor(
+                self._executor,
+                lambda: self.translator.translate(text, dest=target_lang, src=source_lang or "auto")
+            )
+        finally:
+            self.pending -= 1
+        return translation.text, getattr(translation, "src", source_lang)
+
+    async def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        return {
+            "provider": self.name,
+            "requests": self.requests,
+            "pending": self.pending,
+            "max_workers": self.max_workers
+        }
+
+def create_fallback_provider(kind=FALLBACK_TRANSLATION_PROVIDER):
+    """
+    Create the fallback translation provider selected by FALLBACK_TRANSLATION_PROVIDER.
+    googletrans stays the default; google_web calls an undocumented endpoint
+    that Google may change or throttle at any time, so using it is opt-in.
+    """
+    if kind == "google_web":
+        return GoogleWebTranslationProvider()
+    if kind != "googletrans":
+        print(f"WARNING: Unknown FALLBACK_TRANSLATION_PROVIDER '{kind}', using googletrans")
+    return GoogletransProvider()
+
+# Shared provider instance used by the basic translation service
+fallback_provider = create_fallback_provider()
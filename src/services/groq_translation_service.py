@@ -1,12 +1,63 @@
 import os
-import aiohttp
 import json
 import re
 from dotenv import load_dotenv
+from services.http_client import http_pool
+from services.translation_cache import TranslationCache, translation_cache
+from services.request_coalescer import RequestCoalescer
+from services.translation_batcher import TranslationBatcher
+from services.rate_limiter import ServiceBusyError, rate_limiter as shared_rate_limiter
+from services.session_store import session_store as shared_session_store
+from services.language_id import language_identifier as shared_language_identifier
+from services.quranic_matcher import quranic_matcher as shared_quranic_matcher
 
 # Load environment variables
 load_dotenv()
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
+GROQ_API_BASE_URL = os.getenv("GROQ_API_BASE_URL", "https://api.groq.com/openai/v1")  # Point at a local stand-in for benchmarks
+TRANSLATION_CONTEXT_TOKENS = int(os.getenv("TRANSLATION_CONTEXT_TOKENS", 200))  # Token budget of previous exchanges sent as context (0 = none)
+TRANSLATION_CONTEXT_MAX_EXCHANGES = int(os.getenv("TRANSLATION_CONTEXT_MAX_EXCHANGES", 3))
+PROMPT_TEMPLATE_LIMIT = 256  # Prompt variants kept precomputed
+
+SYSTEM_PROMPT = """You are a skilled translator with expertise in linguistic nuances and cultural context. 
+Follow these guidelines:
+1. Provide a contextual, natural-sounding translation that captures the full meaning
+2. Consider cultural nuances and implicit context when translating
+3. Aim for a translation that sounds natural to native speakers
+4. Preserve the original tone and intended message
+5. Do NOT add any prefixes like "Translation:" or "Here's the translation:"
+6. Return only the final translation text, nothing more
+7. Previous exchanges, if given, are context only: do NOT translate them again"""
+
+# Specialized instructions for Quranic text
+QURANIC_GUIDELINES = """
+8. IMPORTANT: This appears to be Quranic text or Islamic religious content. For this content:
+   - Maintain ABSOLUTE FIDELITY to the original text's theological meaning
+   - DO NOT add interpretations, explanations, or embellishments to Quranic content
+   - Preserve the EXACT theological meaning without alteration
+   - ALL divine addresses MUST be explicitly preserved (e.g., "O Prophet", "O Mankind")
+   - NEVER omit any form of address in your translation - this is CRITICAL
+   - The relationship between Allah (the speaker) and the addressee is sacred and MUST be maintained
+   - Include appropriate honorifics such as "Friede sei mit ihm" for prophets
+   - Imperatives like "قل" ("Say") are divine commands and must be preserved as "Sprich:" in German
+   - Unlike regular text, Quranic verses must be translated with utmost precision"""
+
+BATCH_SYSTEM_PROMPT = """You are a skilled translator with expertise in linguistic nuances and cultural context. 
+Follow these guidelines:
+1. Translate each numbered text on its own into a contextual, natural-sounding translation
+2. Preserve the original tone and intended message of each text
+3. Answer with exactly one line per text, starting with its number in square brackets, e.g. "[1] ..."
+4. Do NOT merge, split, skip or reorder the texts
+5. Return only the numbered translations, nothing more"""
+
+CONTEXT_HEADER = "Previous exchanges to provide context:"
+
+def estimate_tokens(text):
+    """
+    Cheap local token estimate: about four UTF-8 bytes per token, which also
+    counts the multi-byte scripts (Arabic, Devanagari, CJK) as more expensive.
+    """
+    return len(text.encode("utf-8")) // 4 + 1
 
 class GroqTranslationService:
     """
@@ -15,16 +66,43 @@ class GroqTranslationService:
     word-by-word translation services.
     """
     
-    def __init__(self):
+    def __init__(self, http_client=None, cache=None, session_store=None, rate_limiter=None, language_identifier=None,
+                 quranic_matcher=None):
+        # Shared connection pool for all Groq requests
+        self.http_client = http_client or http_pool
+        
+        # Shared limiter keeping all Groq requests within the API's rate limits
+        self.rate_limiter = rate_limiter or shared_rate_limiter
+        
+        # Shared translation result cache (None disables caching)
+        self.cache = cache if cache is not None else translation_cache
+        
+        # Coalesces identical in-flight translation requests
+        self.coalescer = RequestCoalescer()
+        
+        # Local language identification, so prompts name the source language instead of "auto"
+        self.language_identifier = language_identifier or shared_language_identifier
+        
+        # Glossary automaton for Quranic detection and divine address extraction (loaded once)
+        self.quranic_matcher = quranic_matcher or shared_quranic_matcher
+        
+        # Combines short translations arriving together into one request
+        self.batcher = TranslationBatcher(self)
+        
         # API configuration
         self.api_key = GROQ_API_KEY
-        self.api_url = "https://api.groq.com/openai/v1/chat/completions"
+        self.api_url = f"{GROQ_API_BASE_URL.rstrip('/')}/chat/completions"
         
         # Default to Llama 3 70B for best context-aware translations
         self.model = "mistral-saba-24b"
         
-        # Store translation history for better context in ongoing conversations
-        self.translation_history = {}
+        # Bounded, expiring store of translation history for context in ongoing conversations
+        self.session_store = session_store or shared_session_store
+        
+        # Token budget of the history sent as context, and the precomputed prompt variants
+        self.context_tokens = TRANSLATION_CONTEXT_TOKENS
+        self.context_exchanges = TRANSLATION_CONTEXT_MAX_EXCHANGES
+        self.prompt_templates = {}
         
         # Language names for better prompting
         self.language_names = {
@@ -47,41 +125,13 @@ class GroqTranslationService:
             "Übersetzung:", "Deutsche Übersetzung:", "Die Übersetzung lautet:", "Hier ist die Übersetzung:",
         ]
         
-        # Regular expression to identify potential Quranic verses
-        self.quran_patterns = [
-            r'سورة\s+[\u0600-\u06FF]+',  # Surah mentions in Arabic
-            r'بسم\s+الله\s+الرحمن\s+الرحيم',  # Bismillah
-            r'قال\s+الله\s+تعالى',  # "Allah said" or similar phrases
-            r'قوله\s+تعالى',  # "His saying" referring to Allah
-            r'آية',  # Verse/Ayah
-        ]
-        
-        # Dictionary of Quranic address forms with their German translations
-        self.quranic_addresses = {
-            "يا أيها النبي": "O Prophet (Friede sei mit ihm)",
-            "يا محمد": "O Muhammad (Friede sei mit ihm)",
-            "يا أيها الناس": "O ihr Menschen",
-            "يا أيها الذين آمنوا": "O ihr, die glauben",
-            "يا عباد": "O Meine Diener",
-            "يا عبادي": "O Meine Diener",
-            "يا بني آدم": "O Kinder Adams",
-            "يا أيها الرسول": "O Gesandter (Friede sei mit ihm)",
-            "يا أيها المدثر": "O du Zugedeckter (Friede sei mit ihm)",
-            "يا أيها المزمل": "O du Eingehüllter (Friede sei mit ihm)",
-            "قل": "Sprich",
-            "يا جبريل": "O Gabriel",
-            "يا عيسى": "O Jesus (Friede sei mit ihm)",
-            "يا موسى": "O Moses (Friede sei mit ihm)",
-            "يا نوح": "O Noah (Friede sei mit ihm)",
-            "يا إبراهيم": "O Abraham (Friede sei mit ihm)",
-            "يا داوود": "O David (Friede sei mit ihm)",
-            "يا سليمان": "O Solomon (Friede sei mit ihm)",
-            "يا يحيى": "O Johannes (Friede sei mit ihm)",
-            "يا زكريا": "O Zacharias (Friede sei mit ihm)"
-        }
+        # All prefixes in one alternation (longest first), compiled once
+        self.prefix_regex = re.compile(
+            r'^(?:' + '|'.join(re.escape(prefix) for prefix in sorted(self.prefixes_to_remove, key=len, reverse=True)) + r')\s*'
+        )
         
-        # Combine patterns
-        self.quran_regex = re.compile('|'.join(self.quran_patterns))
+        # Characters of a streamed translation held back until prefixes can be stripped
+        self.stream_holdback = max(len(prefix) for prefix in self.prefixes_to_remove) + 2
         
         if not self.api_key:
             print("WARNING: GROQ_API_KEY not found in environment variables. Translation service will not work correctly.")
@@ -93,212 +143,453 @@ class GroqTranslationService:
             translated_text = translated_text[1:-1]
         
         # Remove any known prefixes
-        for prefix in self.prefixes_to_remove:
-            if translated_text.startswith(prefix):
-                translated_text = translated_text[len(prefix):].lstrip()
+        translated_text = self.strip_prefixes(translated_text)
         
         # Remove extra whitespace and clean up
         translated_text = translated_text.strip()
         
         return translated_text
     
+    def strip_prefixes(self, text):
+        """Remove known prefixes like "Translation:" from the start of the text"""
+        while True:
+            match = self.prefix_regex.match(text)
+            if not match or not match.end():
+                return text
+            text = text[match.end():]
+    
     def is_likely_quranic(self, text, source_lang):
         """Check if the text is likely to be a Quranic verse"""
         if source_lang != "ar" and source_lang != "ar-sa":
             return False
-            
-        # Check against our patterns
-        if self.quran_regex.search(text):
-            return True
-            
-        # Additional heuristics for identifying Quranic text including various forms of address
-        address_patterns = [
-            "يا أيها النبي",  # O Prophet
-            "يا محمد",        # O Muhammad
-            "يا أيها الناس",  # O mankind/people
-            "يا أيها الذين",  # O you who (believe)
-            "يا عباد",        # O servants
-            "يا بني آدم",     # O children of Adam
-            "يا أيها الرسول", # O Messenger
-            "يا جبريل",       # O Gabriel/Jibreel
-            "قل",             # Say (command form often used by Allah to address the Prophet)
-            "يا عيسى",        # O Jesus
-            "يا موسى",        # O Moses
-            "يا نوح",         # O Noah
-            "يا إبراهيم"      # O Abraham
-        ]
-        
-        for pattern in address_patterns:
-            if pattern in text:
-                return True
-                
-        if "قرآن" in text or "آيات" in text or "سورة" in text:
-            return True
-            
-        return False
+        return self.quranic_matcher.is_quranic(text)
     
     def find_addresses_in_text(self, text):
         """Find all Quranic addresses in the given text and return a list of found addresses"""
-        found_addresses = []
+        return self.quranic_matcher.find_addresses(text)
+    
+    async def remember_translation(self, session_id, text, translated_text, target_lang=None):
+        """Store an exchange in the session history of its target language, used as context for later translations"""
+        if not session_id:
+            return
+        await self.session_store.add_exchange(session_id, text, translated_text, language=target_lang)
+    
+    def prompt_template(self, is_quranic, source_lang, target_lang):
+        """
+        Return the precomputed (system prompt, instruction) pair of a prompt variant.
+        The system prompt only depends on is_quranic, so it forms a stable prefix
+        that upstream prompt caching can reuse across requests and sessions.
+        """
+        key = (is_quranic, source_lang, target_lang)
+        template = self.prompt_templates.get(key)
+        if template is not None:
+            return template
         
-        for address in self.quranic_addresses.keys():
-            if address in text:
-                found_addresses.append((address, self.quranic_addresses[address]))
-                
-        return found_addresses
+        # Get language names for better prompting
+        source_lang_name = self.language_names.get(source_lang, source_lang)
+        target_lang_name = self.language_names.get(target_lang, target_lang)
+        
+        system_prompt = SYSTEM_PROMPT + QURANIC_GUIDELINES if is_quranic else SYSTEM_PROMPT
+        
+        # Craft prompt for contextual translation
+        if source_lang == "auto":
+            instruction = f"Translate the following text into {target_lang_name}, providing a contextual, natural-sounding translation:"
+        else:
+            instruction = f"Translate the following {source_lang_name} text into {target_lang_name}, providing a contextual, natural-sounding translation:"
+        
+        template = (system_prompt, instruction)
+        # Language codes come from clients, so only a bounded number of variants is kept
+        if len(self.prompt_templates) < PROMPT_TEMPLATE_LIMIT:
+            self.prompt_templates[key] = template
+        return template
     
-    async def translate(self, text, source_lang="auto", target_lang="de", session_id=None):
+    def build_context(self, history):
         """
-        Translate text with contextual understanding using Groq's LLM.
+        Build the context block from a session's history (oldest first), keeping
+        the most recent exchanges that fit into the context token budget.
+        """
+        exchanges = []
+        used_tokens = estimate_tokens(CONTEXT_HEADER)
+        for record in reversed(history[-self.context_exchanges:] if self.context_exchanges > 0 else []):
+            exchange = f"Original: {record.original}\nTranslation: {record.translation}"
+            exchange_tokens = estimate_tokens(exchange)
+            if used_tokens + exchange_tokens > self.context_tokens:
+                break
+            exchanges.append(exchange)
+            used_tokens += exchange_tokens
+        
+        if not exchanges:
+            return ""
+        exchanges.append(CONTEXT_HEADER)
+        return "\n".join(reversed(exchanges))
+    
+    async def load_context(self, session_id, target_lang=None):
+        """Return the context block for a session's next translation into target_lang ("" without history)"""
+        if not session_id or self.context_tokens <= 0 or self.context_exchanges <= 0:
+            return ""
+        history = await self.session_store.get_history(session_id, self.context_exchanges, language=target_lang)
+        return self.build_context(history)
+    
+    def build_prompts(self, text, source_lang, target_lang, is_quranic, found_addresses, context=""):
+        """
+        Build the system and user prompts for a translation request.
+        Everything that varies per request (context, addresses, text) goes into
+        the user prompt after the cached template parts.
+        """
+        system_prompt, instruction = self.prompt_template(is_quranic, source_lang, target_lang)
+        
+        parts = [context] if context else []
+        
+        # Create specific instructions about the addresses found
+        if found_addresses:
+            parts.append(
+                "The text contains the following divine addresses that MUST be preserved exactly in the translation:\n" +
+                "\n".join(f"- \"{arabic}\" must be translated as \"{german}\"" for arabic, german in found_addresses)
+            )
+        
+        parts.append(instruction)
+        parts.append(text)
+        return system_prompt, "\n\n".join(parts)
+    
+    def build_batch_prompts(self, texts, source_lang, target_lang):
+        """Build the system and user prompts translating several numbered texts in one request"""
+        source_lang_name = self.language_names.get(source_lang, source_lang)
+        target_lang_name = self.language_names.get(target_lang, target_lang)
+        
+        numbered_texts = "\n".join(f"[{index}] {text}" for index, text in enumerate(texts, 1))
+        if source_lang == "auto":
+            user_prompt = f"""Translate each of the following texts into {target_lang_name}:
+
+{numbered_texts}"""
+        else:
+            user_prompt = f"""Translate each of the following {source_lang_name} texts into {target_lang_name}:
+
+{numbered_texts}"""
+        
+        return BATCH_SYSTEM_PROMPT, user_prompt
+    
+    def apply_address_check(self, translated_text, found_addresses):
+        """Ensure the divine addresses found in the source text are preserved in the translation"""
+        for arabic, german in found_addresses:
+            # Check if the German translation contains the appropriate form of address
+            if " ".join(german.split(' ')[0:2]) not in translated_text and german.split(' ')[0] not in translated_text:
+                # If not found, try to correct by prepending it
+                # This is a fallback in case the model still omits the address
+                translated_text = f"{german}: {translated_text}"
+        return translated_text
+    
+    def scan_quranic(self, text, source_lang, target_lang):
+        """
+        Check whether a text is likely Quranic and find the divine addresses its translation must keep.
+        
+        Returns:
+        - Tuple of (is_quranic, list of (address, German translation) to check in the translation)
+        """
+        if source_lang not in ("ar", "ar-sa"):
+            return False, []
+        # One pass finds both the markers and the addresses
+        is_quranic, found_addresses = self.quranic_matcher.scan(text)
+        # The glossary gives the German forms of the addresses
+        if not is_quranic or source_lang != "ar" or target_lang != "de":
+            found_addresses = []
+        return is_quranic, found_addresses
+    
+    def check_addresses(self, text, source_lang, target_lang, translated_text):
+        """Apply the divine address check of Groq translations to a translation made by another backend"""
+        source_lang = self.language_identifier.resolve(text, source_lang, target_lang)
+        _, found_addresses = self.scan_quranic(text, source_lang, target_lang)
+        if found_addresses:
+            translated_text = self.apply_address_check(translated_text, found_addresses)
+        return translated_text
+    
+    async def _prepare_translation(self, text, source_lang, target_lang, session_id=None, batchable=False):
+        """
+        Run the checks shared by translate and translate_stream.
         
         Parameters:
-        - text: The text to translate
-        - source_lang: Source language code (or "auto" for auto-detection)
-        - target_lang: Target language code
-        - session_id: Optional session ID to maintain context across translations
+        - session_id: Session whose history is loaded as the translation's context
+        - batchable: Whether a short plain text goes to the micro-batcher, which sends no context
         
         Returns:
-        - Contextually translated text
+        - Tuple of (early result or None, is_quranic, found_addresses, context, cache_key, cached translation or None)
         """
         if not text or text.strip() == "":
-            return ""
+            return "", False, [], "", None, None
             
         # Check if API key is configured
         if not self.api_key:
-            return "Error: GROQ_API_KEY not configured. Please set it in the .env file."
+            return "Error: GROQ_API_KEY not configured. Please set it in the .env file.", False, [], "", None, None
             
-        # If languages are the same, return original text
+        # If languages are the same, return original text (a local guess never matches the target)
         if source_lang != "auto" and source_lang == target_lang:
-            return text
+            return text, False, [], "", None, None
         
-        # Get language names for better prompting
-        source_lang_name = self.language_names.get(source_lang, source_lang)
-        target_lang_name = self.language_names.get(target_lang, target_lang)
+        # Check if this might be Quranic text and find any specific addresses in it
+        is_quranic, found_addresses = self.scan_quranic(text, source_lang, target_lang)
         
-        # Retrieve conversation history if available
-        history = ""
-        if session_id and session_id in self.translation_history:
-            # Get last 3 exchanges for context
-            recent_exchanges = self.translation_history[session_id][-3:]
-            if recent_exchanges:
-                history = "Previous exchanges to provide context:\n"
-                for ex in recent_exchanges:
-                    history += f"Original: {ex['original']}\nTranslation: {ex['translation']}\n\n"
+        # The context is part of the prompt, so it is part of the cache (and coalescing) key:
+        # a translation made with one session's history is never served to another session
+        context = ""
+        if not (batchable and not is_quranic and self.batcher.accepts(text)):
+            context = await self.load_context(session_id, target_lang)
         
-        # Check if this might be Quranic text
-        is_quranic = self.is_likely_quranic(text, source_lang)
+        # Serve repeated phrases from the cache instead of a full LLM round trip
+        cache_key = TranslationCache.make_key(
+            text, source_lang, target_lang, "quranic" if is_quranic else "plain", context
+        )
+        cached_translation = None
+        if self.cache is not None:
+            cached_translation = await self.cache.get(cache_key)
         
-        # Find any specific addresses in the text
-        found_addresses = self.find_addresses_in_text(text) if is_quranic and source_lang == "ar" else []
+        return None, is_quranic, found_addresses, context, cache_key, cached_translation
+    
+    async def translate(self, text, source_lang="auto", target_lang="de", session_id=None, remember=True,
+                        background=False):
+        """
+        Translate text with contextual understanding using Groq's LLM.
         
-        # Create specific instructions about the addresses found
-        address_instructions = ""
+        Parameters:
+        - text: The text to translate
+        - source_lang: Source language code (or "auto" for auto-detection)
+        - target_lang: Target language code
+        - session_id: Optional session ID to maintain context across translations
+        - remember: Whether to add the exchange to the session history (False for partial texts)
+        - background: Whether this is bulk work (batch jobs) that yields to live requests
+        
+        Returns:
+        - Contextually translated text
+        
+        Raises:
+        - ServiceBusyError if the request was shed because the API is rate limited
+        """
+        # Identify the source language locally (also enables the Quranic checks for detected Arabic)
+        source_lang = self.language_identifier.resolve(text, source_lang, target_lang)
+        early_result, is_quranic, found_addresses, context, cache_key, cached_translation = \
+            await self._prepare_translation(text, source_lang, target_lang, session_id, batchable=not background)
+        if early_result is not None:
+            return early_result
+        
+        if cached_translation is not None:
+            if remember:
+                await self.remember_translation(session_id, text, cached_translation, target_lang)
+            return cached_translation
+        
+        # Identical requests already in flight share one upstream call
+        async def fetch_translation():
+            # Batches are sent with live priority, so bulk work sends its texts alone
+            if not is_quranic and not background and self.batcher.accepts(text):
+                # Short plain texts may share one request with others arriving at the same time
+                translated_text, success = await self.batcher.translate(text, source_lang, target_lang)
+            else:
+                system_prompt, user_prompt = self.build_prompts(
+                    text, source_lang, target_lang, is_quranic, found_addresses, context=context
+                )
+                translated_text, success = await self._request_translation(
+                    system_prompt, user_prompt, found_addresses, session_id, background
+                )
+            if success and self.cache is not None and translated_text:
+                await self.cache.set(cache_key, translated_text)
+            return translated_text, success
+        
+        # Live requests never wait for an identical background request
+        translated_text, success = await self.coalescer.run(
+            ("background", cache_key) if background else cache_key, fetch_translation
+        )
+        
+        # Store in history if session_id provided
+        if success and remember:
+            await self.remember_translation(session_id, text, translated_text, target_lang)
+        
+        return translated_text
+    
+    async def translate_stream(self, text, source_lang="auto", target_lang="de", session_id=None, on_delta=None,
+                               remember=True):
+        """
+        Translate text like translate(), but stream the translation as it is generated.
+        
+        Parameters:
+        - text: The text to translate
+        - source_lang: Source language code (or "auto" for auto-detection)
+        - target_lang: Target language code
+        - session_id: Optional session ID to maintain context across translations
+        - on_delta: Coroutine function called with each newly visible piece of the translation
+        - remember: Whether to add the exchange to the session history (False for partial texts)
+        
+        Returns:
+        - The final, cleaned translation (prefixes stripped and divine addresses checked)
+        
+        Raises:
+        - ServiceBusyError if the request was shed because the API is rate limited
+        """
+        # Identify the source language locally (also enables the Quranic checks for detected Arabic)
+        source_lang = self.language_identifier.resolve(text, source_lang, target_lang)
+        early_result, is_quranic, found_addresses, context, cache_key, cached_translation = \
+            await self._prepare_translation(text, source_lang, target_lang, session_id)
+        if early_result is not None:
+            return early_result
+        
+        if cached_translation is not None:
+            if on_delta:
+                await on_delta(cached_translation)
+            if remember:
+                await self.remember_translation(session_id, text, cached_translation, target_lang)
+            return cached_translation
+        
+        system_prompt, user_prompt = self.build_prompts(
+            text, source_lang, target_lang, is_quranic, found_addresses, context=context
+        )
+        
+        raw_text = ""
+        emitted_text = ""
+        
+        async def stream_translation():
+            nonlocal raw_text, emitted_text
+            session = await self.http_client.get_session()
+            async with session.post(
+                self.api_url,
+                headers=self._headers(),
+                json=self._build_payload(system_prompt, user_prompt, stream=True),
+                timeout=self.http_client.timeout(total=30)
+            ) as response:
+                self.rate_limiter.check_response("chat", response)
+                if response.status != 200:
+                    error_details = await self._error_details(response)
+                    return f"Translation error: {response.status} - {error_details}"
+                
+                # Read the server-sent events of the chat-completions stream
+                async for line in response.content:
+                    line = line.decode("utf-8").strip()
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    
+                    chunk = json.loads(data)
+                    delta = chunk.get('choices', [{}])[0].get('delta', {}).get('content') or ""
+                    if not delta:
+                        continue
+                    raw_text += delta
+                    
+                    # Hold back the start of the text until any prefix like "Translation:" can be stripped
+                    if len(raw_text) < self.stream_holdback:
+                        continue
+                    visible_text = self.clean_stream_head(raw_text)
+                    if on_delta and visible_text.startswith(emitted_text) and len(visible_text) > len(emitted_text):
+                        await on_delta(visible_text[len(emitted_text):])
+                        emitted_text = visible_text
+            return None
+        
+        try:
+            error = await self.rate_limiter.run("chat", session_id, stream_translation)
+        except ServiceBusyError:
+            raise
+        except Exception as e:
+            return f"Translation error: {str(e)}"
+        if error:
+            return error
+        
+        # The final text gets the same cleanup and address check as a non-streamed translation
+        translated_text = self.clean_translation(raw_text.strip())
         if found_addresses:
-            address_instructions = "\nThe text contains the following divine addresses that MUST be preserved exactly in the translation:\n"
-            for arabic, german in found_addresses:
-                address_instructions += f"- \"{arabic}\" must be translated as \"{german}\"\n"
+            translated_text = self.apply_address_check(translated_text, found_addresses)
         
-        # Define the base system prompt
-        system_prompt = """You are a skilled translator with expertise in linguistic nuances and cultural context. 
-Follow these guidelines:
-1. Provide a contextual, natural-sounding translation that captures the full meaning
-2. Consider cultural nuances and implicit context when translating
-3. Aim for a translation that sounds natural to native speakers
-4. Preserve the original tone and intended message
-5. Do NOT add any prefixes like "Translation:" or "Here's the translation:"
-6. Return only the final translation text, nothing more"""
-
-        # Add specialized instructions for Quranic text
-        if is_quranic:
-            system_prompt += f"""
-7. IMPORTANT: This appears to be Quranic text or Islamic religious content. For this content:
-   - Maintain ABSOLUTE FIDELITY to the original text's theological meaning
-   - DO NOT add interpretations, explanations, or embellishments to Quranic content
-   - Preserve the EXACT theological meaning without alteration
-   - ALL divine addresses MUST be explicitly preserved (e.g., "O Prophet", "O Mankind")
-   - NEVER omit any form of address in your translation - this is CRITICAL
-   - The relationship between Allah (the speaker) and the addressee is sacred and MUST be maintained
-   - Include appropriate honorifics such as "Friede sei mit ihm" for prophets
-   - Imperatives like "قل" ("Say") are divine commands and must be preserved as "Sprich:" in German
-   - Unlike regular text, Quranic verses must be translated with utmost precision{address_instructions}"""
+        if translated_text:
+            if on_delta and translated_text.startswith(emitted_text) and len(translated_text) > len(emitted_text):
+                await on_delta(translated_text[len(emitted_text):])
+            if self.cache is not None:
+                await self.cache.set(cache_key, translated_text)
+            if remember:
+                await self.remember_translation(session_id, text, translated_text, target_lang)
         
-        # Craft prompt for contextual translation
-        if source_lang == "auto":
-            user_prompt = f"""Translate the following text into {target_lang_name}, providing a contextual, natural-sounding translation:
-
-{text}"""
-        else:
-            user_prompt = f"""Translate the following {source_lang_name} text into {target_lang_name}, providing a contextual, natural-sounding translation:
-
-{text}"""
-
+        return translated_text
+    
+    def clean_stream_head(self, partial_text):
+        """
+        Clean the start of a partially streamed translation.
+        Unlike clean_translation, trailing quotes and whitespace are held back
+        because more text may still follow.
+        """
+        text = partial_text.lstrip()
+        if text.startswith('"'):
+            text = text[1:]
+        text = self.strip_prefixes(text)
+        return text.rstrip().rstrip('"')
+    
+    def _build_payload(self, system_prompt, user_prompt, stream=False):
+        """Build the chat-completions request payload"""
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "temperature": 0.1,  # Lower temperature for more precise translations
+            "max_tokens": 1024
+        }
+        if stream:
+            payload["stream"] = True
+        return payload
+    
+    def _headers(self):
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+    
+    async def _error_details(self, response):
+        """Extract a short error message from a failed API response"""
+        error_text = await response.text()
         try:
-            # Prepare request payload
-            payload = {
-                "model": self.model,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                "temperature": 0.1,  # Lower temperature for more precise translations
-                "max_tokens": 1024
-            }
-            
-            # Set up headers
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            # Make API call using aiohttp for async operation
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.api_url, 
-                    headers=headers, 
-                    json=payload,
-                    timeout=30
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        translated_text = result.get('choices', [{}])[0].get('message', {}).get('content', '').strip()
-                        
-                        # Clean up the response
-                        translated_text = self.clean_translation(translated_text)
-                        
-                        # Post-process to ensure addresses are preserved
-                        if found_addresses and is_quranic:
-                            for arabic, german in found_addresses:
-                                # Check if the German translation contains the appropriate form of address
-                                if german.split(' ')[0:2] not in translated_text and german.split(' ')[0] not in translated_text:
-                                    # If not found, try to correct by prepending it
-                                    # This is a fallback in case the model still omits the address
-                                    translated_text = f"{german}: {translated_text}"
-                            
-                        # Store in history if session_id provided
-                        if session_id:
-                            if session_id not in self.translation_history:
-                                self.translation_history[session_id] = []
-                            
-                            self.translation_history[session_id].append({
-                                "original": text,
-                                "translation": translated_text
-                            })
-                            
-                            # Limit history size
-                            if len(self.translation_history[session_id]) > 10:
-                                self.translation_history[session_id].pop(0)
-                        
-                        return translated_text
-                    else:
-                        error_text = await response.text()
-                        error_details = "Unknown error"
-                        try:
-                            error_json = json.loads(error_text)
-                            error_details = error_json.get('error', {}).get('message', error_text[:100])
-                        except:
-                            error_details = error_text[:100]
-                        
-                        return f"Translation error: {response.status} - {error_details}"
-                        
+            error_json = json.loads(error_text)
+            return error_json.get('error', {}).get('message', error_text[:100])
+        except:
+            return error_text[:100]
+    
+    async def _request_translation(self, system_prompt, user_prompt, found_addresses, session_id=None, background=False):
+        """
+        Send one chat-completion request to Groq (through the shared rate limiter)
+        and post-process the result.
+        
+        Returns:
+        - Tuple of (translated text or error message, success flag)
+        
+        Raises:
+        - ServiceBusyError if the request was shed because the API is rate limited
+        """
+        try:
+            return await self.rate_limiter.run(
+                "chat", session_id,
+                lambda: self._send_translation_request(system_prompt, user_prompt, found_addresses),
+                background=background
+            )
+        except ServiceBusyError:
+            raise
         except Exception as e:
-            return f"Translation error: {str(e)}"
\ No newline at end of file
+            return f"Translation error: {str(e)}", False
+    
+    async def _send_translation_request(self, system_prompt, user_prompt, found_addresses):
+        # Make API call over the shared connection pool
+        session = await self.http_client.get_session()
+        async with session.post(
+            self.api_url, 
+            headers=self._headers(), 
+            json=self._build_payload(system_prompt, user_prompt),
+            timeout=self.http_client.timeout(total=30)
+        ) as response:
+            self.rate_limiter.check_response("chat", response)
+            if response.status == 200:
+                result = await response.json()
+                translated_text = result.get('choices', [{}])[0].get('message', {}).get('content', '').strip()
+                
+                # Clean up the response
+                translated_text = self.clean_translation(translated_text)
+                
+                # Post-process to ensure addresses are preserved
+                if found_addresses:
+                    translated_text = self.apply_address_check(translated_text, found_addresses)
+                    
+                return translated_text, True
+            else:
+                error_details = await self._error_details(response)
+                return f"Translation error: {response.status} - {error_details}", False
@@ -0,0 +1,120 @@
+import os
+import aiohttp
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", 100))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", 20))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", 60))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", 300))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 30))
+
+class HTTPClientPool:
+    """
+    Application-wide pooled HTTP client shared by all services that talk to Groq.
+    Keeps TLS connections to api.groq.com alive between requests so an utterance
+    does not pay a fresh TCP+TLS handshake.
+    """
+
+    def __init__(self, limit=HTTP_POOL_LIMIT, limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+                 keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT, dns_cache_ttl=HTTP_DNS_CACHE_TTL,
+                 connect_timeout=HTTP_CONNECT_TIMEOUT, read_timeout=HTTP_READ_TIMEOUT):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+        self._session = None
+        self._connector = None
+
+        # Counters used to prove connections are reused under load
+        self.requests_started = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+
+    def _build_trace_config(self):
+        """Hook into aiohttp's tracing to count new vs. reused connections"""
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, ctx, params):
+            self.requests_started += 1
+
+        async def on_connection_create_end(session, ctx, params):
+            self.connections_created += 1
+
+        async def on_connection_reuseconn(session, ctx, params):
+            self.connections_reused += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace_config
+
+    async def start(self):
+        """Create the shared session (called on application startup)"""
+        if self._session and not self._session.closed:
+            return
+
+        self._connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.dns_cache_ttl,
+            use_dns_cache=True
+        )
+        self._session = aiohttp.ClientSession(
+            connector=self._connector,
+            timeout=self.timeout(),
+            trace_configs=[self._build_trace_config()]
+        )
+
+    async def close(self):
+        """Close the shared session and all pooled connections (called on shutdown)"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._connector = None
+
+    async def get_session(self):
+        """
+        Return the shared session, creating it lazily if the app startup hook
+        has not run (e.g. when a service is used from a script).
+        """
+        if not self._session or self._session.closed:
+            await self.start()
+        return self._session
+
+    def timeout(self, total=None):
+        """Build a ClientTimeout with the pool's separate connect and read timeouts"""
+        return aiohttp.ClientTimeout(
+            total=total,
+            connect=self.connect_timeout,
+            sock_read=self.read_timeout
+        )
+
+    def stats(self):
+        """Return connection pool statistics"""
+        idle = 0
+        in_use = 0
+        if self._connector and not self._connector.closed:
+            # aiohttp keeps idle keep-alive connections in _conns and busy ones in _acquired
+            idle = sum(len(conns) for conns in getattr(self._connector, "_conns", {}).values())
+            in_use = len(getattr(self._connector, "_acquired", ()))
+
+        return {
+            "open_connections": idle + in_use,
+            "idle_connections": idle,
+            "in_use_connections": in_use,
+            "requests": self.requests_started,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "limit": self.limit,
+            "limit_per_host": self.limit_per_host
+        }
+
+# Shared pool instance used by all Groq-backed services
+http_pool = HTTPClientPool()
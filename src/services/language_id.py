@@ -0,0 +1,262 @@
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+LANGUAGE_ID_ENABLED = os.getenv("LANGUAGE_ID_ENABLED", "true").lower() == "true"
+LANGUAGE_ID_MIN_CONFIDENCE = float(os.getenv("LANGUAGE_ID_MIN_CONFIDENCE", 0.7))  # Below this, upstream detection is used
+LANGUAGE_ID_MIN_LETTERS = int(os.getenv("LANGUAGE_ID_MIN_LETTERS", 12))  # Shorter texts are left to upstream detection
+
+# Source languages that are resolved locally instead of being sent upstream
+UNKNOWN_LANGUAGES = {"", "auto", "unknown"}
+
+# Unicode blocks of the scripts used by the supported languages
+SCRIPT_RANGES = [
+    ("arabic", 0x0600, 0x06FF),
+    ("arabic", 0x0750, 0x077F),
+    ("arabic", 0xFB50, 0xFDFF),
+    ("arabic", 0xFE70, 0xFEFF),
+    ("devanagari", 0x0900, 0x097F),
+    ("bengali", 0x0980, 0x09FF),
+    ("cyrillic", 0x0400, 0x04FF),
+    ("kana", 0x3040, 0x30FF),
+    ("han", 0x4E00, 0x9FFF),
+    ("han", 0x3400, 0x4DBF),
+    ("latin", 0x0041, 0x005A),
+    ("latin", 0x0061, 0x007A),
+    ("latin", 0x00C0, 0x024F),
+]
+
+# Scripts used by a single supported language
+SCRIPT_LANGUAGES = {
+    "devanagari": "hi",
+    "bengali": "bn",
+    "cyrillic": "ru",
+    "kana": "ja",
+}
+
+# Letters that only Urdu (not Arabic) uses, and the reverse
+URDU_LETTERS = set("ٹڈڑںےۓہھیگچپژک")
+ARABIC_LETTERS = set("ةيىأإكؤئ")
+
+# Most frequent character trigrams of the Latin-script languages, in rank order
+# ("_" marks a word boundary)
+TRIGRAM_PROFILES = {
+    "en": [
+        "_th", "the", "he_", "_an", "and", "nd_", "ing", "ng_", "_of", "of_",
+        "_to", "to_", "ion", "ed_", "_in", "in_", "er_", "is_", "_is", "hat",
+        "tha", "at_", "re_", "ent", "you", "_yo", "ou_", "_it", "it_", "for",
+        "_fo", "or_", "es_", "on_", "_wh", "ter", "_be", "her", "ll_", "ve_",
+        "was", "_wa", "ly_", "are", "_ar", "thi", "his", "wit", "ith", "_ha",
+    ],
+    "de": [
+        "en_", "er_", "_de", "der", "ie_", "ich", "ch_", "die", "_di", "ein",
+        "_ei", "sch", "und", "_un", "nd_", "cht", "ine", "in_", "den", "ten",
+        "gen", "te_", "es_", "_da", "das", "ist", "_is", "st_", "nic", "_ni",
+        "auf", "_au", "ber", "ung", "ng_", "mit", "_mi", "_si", "sie", "wir",
+        "_wi", "_ge", "hen", "ne_", "nen", "ei_", "_zu", "zu_", "ach", "uch",
+    ],
+    "es": [
+        "_de", "de_", "os_", "_la", "la_", "el_", "_el", "es_", "que", "_qu",
+        "ue_", "_en", "en_", "as_", "ent", "ado", "do_", "ión", "ón_", "con",
+        "_co", "_lo", "los", "_se", "par", "_pa", "ara", "ra_", "por", "_po",
+        "or_", "una", "_un", "est", "nte", "te_", "ien", "_es", "cia", "mos",
+        "ar_", "_no", "no_", "_y_", "_su", "_me", "_ha", "ero", "_mu", "ada",
+    ],
+    "fr": [
+        "_de", "de_", "es_", "_le", "le_", "ent", "nt_", "_la", "la_", "les",
+        "_et", "et_", "ion", "on_", "_qu", "que", "ue_", "_pa", "ous", "_vo",
+        "vou", "_no", "nou", "re_", "ne_", "_ne", "est", "_es", "_un", "une",
+        "des", "_d'", "ait", "ais", "our", "_po", "pou", "men", "ans", "_da",
+        "dan", "qui", "tio", "eur", "_ce", "ce_", "_je", "je_", "_l'", "pas",
+    ],
+}
+
+# Frequent short words of the Latin-script languages
+COMMON_WORDS = {
+    "en": {"the", "and", "is", "are", "you", "to", "of", "in", "it", "that", "what", "how",
+           "where", "this", "my", "your", "we", "have", "do", "not", "with", "for", "thank", "please"},
+    "de": {"der", "die", "das", "und", "ist", "ich", "du", "sie", "wir", "nicht", "wie", "wo",
+           "was", "ein", "eine", "mit", "für", "auf", "ja", "nein", "danke", "bitte", "geht", "es"},
+    "es": {"el", "la", "los", "las", "y", "es", "que", "de", "en", "un", "una", "por", "para",
+           "cómo", "dónde", "qué", "yo", "tú", "no", "sí", "gracias", "hola", "está", "con"},
+    "fr": {"le", "la", "les", "et", "est", "que", "de", "des", "un", "une", "je", "tu", "vous",
+           "nous", "pas", "pour", "avec", "où", "comment", "merci", "bonjour", "oui", "non", "ce"},
+}
+
+# Letters that single out one Latin-script language
+LATIN_MARKERS = {
+    "de": set("äöüß"),
+    "es": set("ñ¿¡áíóú"),
+    "fr": set("çèêëàâîïôûœù"),
+}
+
+class LanguageIdentifier:
+    """
+    Fast in-process language identification for the supported languages.
+    The script of the text decides most languages on its own; Arabic and Urdu
+    are told apart by their distinctive letters, and the Latin-script
+    languages by character trigram profiles. Takes microseconds, so it runs
+    before any upstream call and saves a remote detection round trip.
+    """
+
+    def __init__(self, min_confidence=LANGUAGE_ID_MIN_CONFIDENCE, min_letters=LANGUAGE_ID_MIN_LETTERS,
+                 enabled=LANGUAGE_ID_ENABLED):
+        self.min_confidence = min_confidence
+        self.min_letters = min_letters
+        self.enabled = enabled
+
+        # Rank-weighted trigram profiles: the most frequent trigram scores highest
+        self.profiles = {
+            language: {trigram: 1.0 - rank / (2 * len(trigrams)) for rank, trigram in enumerate(trigrams)}
+            for language, trigrams in TRIGRAM_PROFILES.items()
+        }
+
+        # Counters
+        self.identified = 0
+        self.low_confidence = 0
+        self.too_short = 0
+        self.same_as_target = 0
+
+    @staticmethod
+    def script_of(char):
+        """Return the script of a character, or None for digits, punctuation and other scripts"""
+        code = ord(char)
+        if code < 0x80:
+            return "latin" if char.isalpha() else None
+        for script, start, end in SCRIPT_RANGES:
+            if start <= code <= end:
+                return script
+        return None
+
+    def identify(self, text):
+        """
+        Identify the language of a text.
+
+        Parameters:
+        - text: The text to identify
+
+        Returns:
+        - Tuple of (language code or None, confidence between 0 and 1)
+        """
+        script_counts = {}
+        for char in text:
+            script = self.script_of(char)
+            if script:
+                script_counts[script] = script_counts.get(script, 0) + 1
+
+        letters = sum(script_counts.values())
+        if not letters:
+            return None, 0.0
+
+        script, count = max(script_counts.items(), key=lambda item: item[1])
+        share = count / letters
+
+        if script in ("han", "kana"):
+            # Japanese mixes kanji with kana; Han characters alone mean Chinese
+            cjk = script_counts.get("han", 0) + script_counts.get("kana", 0)
+            if script_counts.get("kana"):
+                language, confidence = "ja", cjk / letters
+            else:
+                language, confidence = "zh", share * 0.9
+        elif script in SCRIPT_LANGUAGES:
+            language = SCRIPT_LANGUAGES[script]
+            confidence = share
+        elif script == "arabic":
+            language, confidence = self._identify_arabic(text)
+            confidence *= share
+        else:
+            language, confidence = self._identify_latin(text)
+            confidence *= share
+
+        # Very short texts are less reliable
+        if letters < 4:
+            confidence *= 0.5
+        return language, round(confidence, 3)
+
+    def _identify_arabic(self, text):
+        """Tell Arabic and Urdu apart by the letters only one of them uses"""
+        urdu = sum(1 for char in text if char in URDU_LETTERS)
+        arabic = sum(1 for char in text if char in ARABIC_LETTERS)
+        if urdu == arabic:
+            # Without distinctive letters, assume the more common language
+            return "ar", 0.6
+        if urdu > arabic:
+            return "ur", min(1.0, 0.6 + 0.4 * (urdu - arabic) / (urdu + arabic) + 0.05 * urdu)
+        return "ar", min(1.0, 0.6 + 0.4 * (arabic - urdu) / (urdu + arabic) + 0.05 * arabic)
+
+    def _identify_latin(self, text):
+        """Score the Latin-script languages by trigram profile and marker letters"""
+        words = "".join(char if char.isalpha() or char == "'" else " " for char in text.lower()).split()
+        normalized = "_" + "_".join(words) + "_"
+        trigrams = [normalized[index:index + 3] for index in range(len(normalized) - 2)]
+        if not trigrams:
+            return "en", 0.0
+
+        scores = {}
+        for language, profile in self.profiles.items():
+            score = sum(profile.get(trigram, 0.0) for trigram in trigrams)
+            score += 1.5 * sum(1 for word in words if word in COMMON_WORDS[language])
+            score += 2.0 * sum(1 for char in normalized if char in LATIN_MARKERS.get(language, ()))
+            scores[language] = score
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        (best, best_score), (_, second_score) = ranked[0], ranked[1]
+        if best_score <= 0:
+            return "en", 0.0
+
+        # Confidence grows with the lead over the runner-up and with how much of the text matched
+        margin = (best_score - second_score) / best_score
+        coverage = min(1.0, best_score / len(trigrams) * 2)
+        return best, min(1.0, 0.5 * margin + 0.5 * coverage + 0.2 * margin * coverage)
+
+    def resolve(self, text, source_lang, target_lang=None):
+        """
+        Replace an unknown source language with the locally identified one.
+        Short texts are left to the upstream service, as they are easily
+        mistaken (e.g. "Die hard" for German), and so is a text identified as
+        the target language: callers return a text in the target language
+        untranslated, which must not happen on a local guess alone.
+
+        Parameters:
+        - text: The text to translate
+        - source_lang: Source language code ("auto" or "unknown" if not known)
+        - target_lang: Optional target language code of the translation
+
+        Returns:
+        - The identified language code if the text is long enough and the
+          identification confident, otherwise "auto" (so the upstream service
+          detects it); a known source_lang is returned unchanged
+        """
+        if not self.enabled or (source_lang or "").lower() not in UNKNOWN_LANGUAGES:
+            return source_lang
+
+        if sum(1 for char in text if self.script_of(char)) < self.min_letters:
+            self.too_short += 1
+            return "auto"
+
+        language, confidence = self.identify(text)
+        if language is None or confidence < self.min_confidence:
+            self.low_confidence += 1
+            return "auto"
+
+        if target_lang and language == target_lang.lower().split("-")[0]:
+            self.same_as_target += 1
+            return "auto"
+
+        self.identified += 1
+        return language
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "min_confidence": self.min_confidence,
+            "min_letters": self.min_letters,
+            "identified": self.identified,
+            "low_confidence": self.low_confidence,
+            "too_short": self.too_short,
+            "same_as_target": self.same_as_target
+        }
+
+# Shared identifier used by the translation services
+language_identifier = LanguageIdentifier()
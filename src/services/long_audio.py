@@ -0,0 +1,203 @@
+import os
+import re
+import asyncio
+import functools
+from pathlib import Path
+from dotenv import load_dotenv
+from services.rate_limiter import ServiceBusyError
+from services.audio_preprocessor import audio_preprocessor as shared_audio_preprocessor
+
+# Load environment variables
+load_dotenv()
+LONG_AUDIO_SEGMENT_MS = int(os.getenv("LONG_AUDIO_SEGMENT_MS", 30000))  # Preferred segment length
+LONG_AUDIO_MAX_SEGMENT_MS = int(os.getenv("LONG_AUDIO_MAX_SEGMENT_MS", 45000))  # Hard cut when no pause is found
+LONG_AUDIO_OVERLAP_MS = int(os.getenv("LONG_AUDIO_OVERLAP_MS", 1500))  # Audio shared with each neighbouring segment
+LONG_AUDIO_PARALLELISM = int(os.getenv("LONG_AUDIO_PARALLELISM", 4))  # Segments transcribed at once per recording
+LONG_AUDIO_SILENCE_DB = float(os.getenv("LONG_AUDIO_SILENCE_DB", -40))  # dBFS below which audio counts as a pause
+LONG_AUDIO_MIN_PAUSE_MS = int(os.getenv("LONG_AUDIO_MIN_PAUSE_MS", 300))  # Shortest pause a cut is placed in
+
+# Where and how recordings are cut (see audio_preprocessor.plan_cuts)
+SPLIT_OPTIONS = {
+    "segment_ms": LONG_AUDIO_SEGMENT_MS,
+    "max_segment_ms": LONG_AUDIO_MAX_SEGMENT_MS,
+    "overlap_ms": LONG_AUDIO_OVERLAP_MS,
+    "silence_threshold": LONG_AUDIO_SILENCE_DB,
+    "min_pause_ms": LONG_AUDIO_MIN_PAUSE_MS
+}
+
+# Recordings on disk that cannot be cut here are uploaded whole, up to Whisper's upload limit
+UNSPLIT_MAX_BYTES = 25 * 1024 * 1024
+
+# Words per second assumed when sizing the overlap search (fast speech)
+OVERLAP_WORDS_PER_SECOND = 4
+# Leading words of a segment that may be fragments of a word cut at its start
+OVERLAP_SLACK_WORDS = 2
+
+WORD_CHARACTERS = re.compile(r"[^\w]+", re.UNICODE)
+
+def normalize_word(word):
+    """Compare words without case and punctuation"""
+    return WORD_CHARACTERS.sub("", word).casefold()
+
+def count_repeated_words(previous_words, words, max_words, slack=OVERLAP_SLACK_WORDS):
+    """
+    Count the leading words of a segment that repeat the end of the previous one.
+    The longest run of at most max_words words that ends the previous segment and
+    starts the new one (after up to slack fragment words) is taken as the overlap.
+
+    Returns:
+    - Number of leading words to drop from the new segment
+    """
+    previous = [normalize_word(word) for word in previous_words[-max_words:]]
+    current = [normalize_word(word) for word in words[:max_words + slack]]
+    for length in range(min(len(previous), len(current)), 0, -1):
+        tail = previous[-length:]
+        for offset in range(0, min(slack, len(current) - length) + 1):
+            if current[offset:offset + length] == tail:
+                return offset + length
+    return 0
+
+class LongAudioTranscriber:
+    """
+    Transcribes long recordings in parallel: the recording is cut at pauses
+    into overlapping segments (in the audio preprocessor's split pool), the
+    segments are transcribed concurrently with bounded parallelism, and the
+    texts are stitched back together in order with the words heard twice in
+    the overlaps removed. Wall-clock time therefore shrinks with parallelism
+    instead of growing with the recording's length.
+    """
+
+    def __init__(self, whisper_service, audio_preprocessor=None, parallelism=LONG_AUDIO_PARALLELISM):
+        self.whisper_service = whisper_service
+        self.audio_preprocessor = audio_preprocessor or shared_audio_preprocessor
+        self.parallelism = max(1, parallelism)
+        self.max_overlap_words = 2 * LONG_AUDIO_OVERLAP_MS * OVERLAP_WORDS_PER_SECOND // 1000 + OVERLAP_SLACK_WORDS
+
+        # Counters
+        self.recordings = 0
+        self.segments = 0
+        self.failed_segments = 0
+        self.deduplicated_words = 0
+
+    async def _transcribe_segment(self, slots, load, language, audio_format, preprocess, background):
+        async with slots:
+            # Segments are loaded only once they get a slot, so few are held in memory at once
+            audio_bytes = await load()
+            try:
+                return await self.whisper_service.transcribe_audio(
+                    audio_bytes, language, audio_format=audio_format, preprocess=preprocess, background=background
+                )
+            except ServiceBusyError as e:
+                return {"text": f"Transcription error: {str(e)}", "detected_language": "unknown"}
+
+    async def transcribe(self, audio_bytes, language="auto", audio_format="webm", skip_segments=0, previous_text="",
+                         background=False):
+        """
+        Transcribe a long recording.
+
+        Parameters:
+        - audio_bytes: The whole recording
+        - language: Language code of the audio (or "auto")
+        - audio_format: The format the client claimed; the detected container takes precedence
+        - skip_segments: Number of leading segments already transcribed (when resuming); the
+                         recording is split the same way each time, so they are skipped
+        - previous_text: Stitched text of the last skipped segment, to remove its overlap
+        - background: Whether this is bulk work (batch jobs) that yields to live requests
+
+        Yields:
+        - One dict per segment, in recording order, as soon as it and all segments before it are done:
+          segment, start_ms, end_ms, text (without the words repeated from the previous segment),
+          detected_language, and error if its transcription failed
+        """
+        self.recordings += 1
+        segments, segment_format = await self.audio_preprocessor.split(audio_bytes, audio_format, **SPLIT_OPTIONS)
+        preprocess = False
+        if segments is None:
+            # Cannot be decoded here: transcribe the recording as one segment, as before
+            segments, preprocess = [(0, None, audio_bytes)], True
+
+        async def load(index):
+            return segments[index][2]
+
+        cuts = [(start_ms, end_ms) for start_ms, end_ms, _ in segments]
+        async for result in self._transcribe_cuts(
+            cuts, load, language, segment_format, preprocess, skip_segments, previous_text, background
+        ):
+            yield result
+
+    async def transcribe_file(self, path, language="auto", audio_format="webm", skip_segments=0, previous_text="",
+                              background=False):
+        """
+        Transcribe a long recording on disk like transcribe, without reading it into memory:
+        the recording is streamed through the decoder to find the cuts, and each segment is
+        decoded from the file only when it is about to be transcribed.
+
+        Raises:
+        - ValueError: If the recording cannot be cut here and is too large to upload whole
+        """
+        self.recordings += 1
+        cuts, segment_format = await self.audio_preprocessor.split_file(path, audio_format, **SPLIT_OPTIONS)
+        preprocess = False
+        if cuts is None:
+            if await asyncio.to_thread(os.path.getsize, path) > UNSPLIT_MAX_BYTES:
+                raise ValueError(f"The {segment_format} recording is too large to transcribe without ffmpeg")
+            # Cannot be decoded here: transcribe the recording as one segment, as before
+            cuts, preprocess = [(0, None)], True
+
+        async def load(index):
+            if preprocess:
+                return await asyncio.to_thread(Path(path).read_bytes)
+            return await self.audio_preprocessor.extract(path, *cuts[index])
+
+        async for result in self._transcribe_cuts(
+            cuts, load, language, segment_format, preprocess, skip_segments, previous_text, background
+        ):
+            yield result
+
+    async def _transcribe_cuts(self, cuts, load, language, segment_format, preprocess, skip_segments, previous_text,
+                               background):
+        """Transcribe the segments at cuts (loaded by index with load) concurrently and yield them in order"""
+        slots = asyncio.Semaphore(self.parallelism)
+        tasks = [
+            asyncio.create_task(self._transcribe_segment(
+                slots, functools.partial(load, index), language, segment_format, preprocess, background
+            ))
+            for index in range(skip_segments, len(cuts))
+        ]
+        self.segments += len(tasks)
+
+        try:
+            previous_words = previous_text.split()
+            for index, ((start_ms, end_ms), task) in enumerate(zip(cuts[skip_segments:], tasks), skip_segments):
+                result = await task
+                text = result.get("text", "")
+                segment_result = {
+                    "segment": index,
+                    "start_ms": start_ms,
+                    "end_ms": end_ms,
+                    "detected_language": result.get("detected_language", language)
+                }
+
+                if text.startswith("API Error") or text.startswith("Transcription error"):
+                    self.failed_segments += 1
+                    previous_words = []
+                    yield {**segment_result, "text": "", "error": text}
+                    continue
+
+                words = text.split()
+                repeated = count_repeated_words(previous_words, words, self.max_overlap_words) if previous_words else 0
+                self.deduplicated_words += repeated
+                previous_words = words
+                yield {**segment_result, "text": " ".join(words[repeated:])}
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self):
+        return {
+            "parallelism": self.parallelism,
+            "recordings": self.recordings,
+            "segments": self.segments,
+            "failed_segments": self.failed_segments,
+            "deduplicated_words": self.deduplicated_words
+        }
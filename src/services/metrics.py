@@ -0,0 +1,198 @@
+import os
+import re
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_PREFIX = "voice_assistant_"
+
+# Latency buckets in seconds, from cache hits to slow upstream calls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+LANGUAGE_LABEL_PATTERN = re.compile(r"[a-z]{2,3}")
+# WebSocket actions used as label values, anything else is counted as "other"
+WEBSOCKET_ACTIONS = frozenset(("process_speech", "translate_text", "process_audio", "stream_audio", "stream_end"))
+
+def language_label(language):
+    """Bound the label values for client-supplied language codes"""
+    if not language or language == "auto":
+        return "auto"
+    language = language.split("-")[0].lower()
+    return language if LANGUAGE_LABEL_PATTERN.fullmatch(language) else "other"
+
+def action_label(action):
+    """Bound the label values for client-supplied WebSocket actions"""
+    return action if action in WEBSOCKET_ACTIONS else "other"
+
+def new_trace_id():
+    """Create a short random ID identifying one message or request in logs and frames"""
+    return os.urandom(8).hex()
+
+def _format_labels(labelnames, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self._values.items():
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+class Gauge(Counter):
+    """Value that can go up and down, e.g. requests in flight"""
+
+    kind = "gauge"
+
+    def dec(self, *labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+class Histogram:
+    """Latency histogram with fixed buckets and labels"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [per-bucket counts..., overflow count, sum]
+        self._values = {}
+
+    def observe(self, value, *labels):
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        entry[bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    def samples(self):
+        for labels, entry in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry):
+                cumulative += count
+                yield self.name + "_bucket", _format_labels(self.labelnames, labels, f'le="{bound}"'), cumulative
+            cumulative += entry[len(self.buckets)]
+            yield self.name + "_bucket", _format_labels(self.labelnames, labels, 'le="+Inf"'), cumulative
+            yield self.name + "_sum", _format_labels(self.labelnames, labels), entry[-1]
+            yield self.name + "_count", _format_labels(self.labelnames, labels), cumulative
+
+class MetricsRegistry:
+    """
+    Process-wide metrics in Prometheus text format.
+    Recording a sample is a dict lookup and a few additions, so instrumentation
+    can stay on in production. Values of other subsystems (cache, connection
+    pool, ...) are read from collector callbacks only when /metrics is scraped.
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self._metrics = []
+        self._collectors = []
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(METRICS_PREFIX + name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._register(Gauge(METRICS_PREFIX + name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(METRICS_PREFIX + name, help_text, labelnames, buckets))
+
+    def register_collector(self, collector):
+        """
+        Register a callable returning (name, kind, help, samples) tuples at scrape time,
+        where samples is a list of (labels dict, value)
+        """
+        self._collectors.append(collector)
+
+    @contextmanager
+    def timer(self, histogram, *labels):
+        """Observe the duration of the with-block in histogram"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            histogram.observe(time.perf_counter() - start, *labels)
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {value}")
+
+        for collector in self._collectors:
+            for name, kind, help_text, samples in collector():
+                name = METRICS_PREFIX + name
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    if value is None:
+                        continue
+                    lines.append(f"{name}{_format_labels(labels.keys(), labels.values())} {float(value)}")
+        return "\n".join(lines) + "\n"
+
+# Shared registry for the whole process
+metrics = MetricsRegistry()
+
+# Hot-path metrics of the speech pipeline
+stage_duration = metrics.histogram(
+    "stage_duration_seconds",
+    "Duration of one pipeline stage (decode, stt, translate, send)",
+    ("stage", "provider", "language")
+)
+message_duration = metrics.histogram(
+    "message_duration_seconds",
+    "Time from receiving a WebSocket message until its last frame was queued",
+    ("action",)
+)
+http_request_duration = metrics.histogram(
+    "http_request_duration_seconds",
+    "Duration of HTTP requests by route",
+    ("method", "route", "status")
+)
+messages_in_flight = metrics.gauge(
+    "messages_in_flight",
+    "WebSocket messages being processed",
+    ("action",)
+)
+http_requests_in_flight = metrics.gauge(
+    "http_requests_in_flight",
+    "HTTP requests being processed"
+)
+frames_sent = metrics.counter(
+    "websocket_frames_sent_total",
+    "WebSocket frames sent by type",
+    ("type",)
+)
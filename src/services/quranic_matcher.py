@@ -0,0 +1,157 @@
+import os
+import json
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+DEFAULT_GLOSSARY_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "quranic_glossary.json")
+QURANIC_GLOSSARY_PATH = os.getenv("QURANIC_GLOSSARY_PATH", DEFAULT_GLOSSARY_PATH)  # JSON file with markers and addresses
+
+# Diacritics (tashkeel, Quranic annotation marks) and tatweel are dropped,
+# and letter variants are folded onto one form before matching
+ARABIC_NORMALIZATION = {code: None for code in [
+    *range(0x0610, 0x061B),  # Honorific and Quranic signs
+    *range(0x064B, 0x0660),  # Harakat, tanwin, shadda, sukun
+    0x0670,                  # Superscript alef
+    *range(0x06D6, 0x06DD),  # Quranic annotation signs
+    *range(0x06DF, 0x06E9),
+    *range(0x06EA, 0x06EE),
+    0x0640,                  # Tatweel
+]}
+ARABIC_NORMALIZATION.update({
+    ord("أ"): "ا",
+    ord("إ"): "ا",
+    ord("آ"): "ا",
+    ord("ٱ"): "ا",
+    ord("ى"): "ي",
+    ord("ة"): "ه",
+})
+
+def normalize_arabic(text):
+    """Strip diacritics, fold alef/ya/ta marbuta variants and collapse whitespace"""
+    return " ".join(text.translate(ARABIC_NORMALIZATION).split())
+
+def is_word_char(char):
+    return char.isalnum() or char == "_"
+
+class PhraseMatcher:
+    """
+    Aho-Corasick automaton over a fixed set of phrases. Built once, it finds
+    every occurrence of every phrase in a single pass over the text, so the
+    cost per message depends on the text length, not on the number of phrases.
+    Phrases only match whole words: an occurrence inside a longer word is ignored.
+    """
+
+    def __init__(self, phrases):
+        self.phrases = list(phrases)
+        # Trie: one transition dict per node; outputs are (phrase index, length) of the phrases ending at the node
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+
+        for index, phrase in enumerate(self.phrases):
+            if not phrase:
+                continue
+            node = 0
+            for char in phrase:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                node = next_node
+            self._output[node].append((index, len(phrase)))
+
+        # Breadth-first construction of the failure links
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for char, next_node in self._goto[node].items():
+                queue.append(next_node)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_node] = self._goto[fail].get(char, 0)
+                self._output[next_node] = self._output[next_node] + self._output[self._fail[next_node]]
+
+    def find_all(self, text):
+        """Return the indices of all phrases that occur in text (each index once)"""
+        found = set()
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for end, char in enumerate(text, 1):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node] and (end == len(text) or not is_word_char(text[end])):
+                for index, length in output[node]:
+                    start = end - length
+                    if start == 0 or not is_word_char(text[start - 1]):
+                        found.add(index)
+        return found
+
+class QuranicMatcher:
+    """
+    Detects Quranic text and the divine addresses it contains with one
+    automaton over the normalized glossary, so diacritized and plain
+    spellings match alike and large glossaries cost no more per message.
+    """
+
+    def __init__(self, markers, addresses):
+        """
+        Parameters:
+        - markers: Phrases whose presence marks a text as likely Quranic
+        - addresses: Dictionary of Arabic address forms to their required German translations
+        """
+        self.markers = list(markers)
+        self.addresses = dict(addresses)
+
+        # One automaton for both kinds of phrases; indices below len(markers) are markers
+        address_keys = list(self.addresses)
+        self._address_keys = address_keys
+        self._matcher = PhraseMatcher(
+            [normalize_arabic(marker) for marker in self.markers] +
+            [normalize_arabic(address) for address in address_keys]
+        )
+
+    @classmethod
+    def from_file(cls, path=QURANIC_GLOSSARY_PATH):
+        """Load the glossary from a JSON file with "markers" (list) and "addresses" (object)"""
+        with open(path, encoding="utf-8") as glossary_file:
+            glossary = json.load(glossary_file)
+        return cls(glossary.get("markers", []), glossary.get("addresses", {}))
+
+    def scan(self, text):
+        """
+        Match the text against the glossary in one pass.
+
+        Returns:
+        - Tuple of (whether a Quranic marker was found, list of (address, German translation)
+          in glossary order)
+        """
+        found = self._matcher.find_all(normalize_arabic(text))
+        marker_count = len(self.markers)
+        has_marker = any(index < marker_count for index in found)
+        addresses = [
+            (self._address_keys[index - marker_count], self.addresses[self._address_keys[index - marker_count]])
+            for index in sorted(found) if index >= marker_count
+        ]
+        return has_marker, addresses
+
+    def is_quranic(self, text):
+        return self.scan(text)[0]
+
+    def find_addresses(self, text):
+        return self.scan(text)[1]
+
+def load_quranic_matcher(path=QURANIC_GLOSSARY_PATH):
+    """Load the shared matcher, falling back to an empty glossary if the file is unusable"""
+    try:
+        return QuranicMatcher.from_file(path)
+    except (OSError, ValueError) as e:
+        print(f"WARNING: Could not load the Quranic glossary from {path}: {str(e)}")
+        return QuranicMatcher([], {})
+
+# Shared matcher built once at startup
+quranic_matcher = load_quranic_matcher()
@@ -0,0 +1,368 @@
+import os
+import re
+import time
+import random
+import asyncio
+from collections import OrderedDict, deque
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+GROQ_MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", 16))  # Groq requests in flight at once
+GROQ_MAX_QUEUE = int(os.getenv("GROQ_MAX_QUEUE", 200))  # Requests waiting for a slot before new ones are shed
+GROQ_QUEUE_TIMEOUT = float(os.getenv("GROQ_QUEUE_TIMEOUT", 10))  # Seconds a request may wait for a slot
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", 3))  # Retries of rate-limited requests
+GROQ_RETRY_BASE_DELAY = float(os.getenv("GROQ_RETRY_BASE_DELAY", 0.5))
+GROQ_RETRY_MAX_DELAY = float(os.getenv("GROQ_RETRY_MAX_DELAY", 8))
+GROQ_CHAT_RPM = float(os.getenv("GROQ_CHAT_RPM", 0))  # Chat requests per minute, 0 for no client-side limit
+GROQ_AUDIO_RPM = float(os.getenv("GROQ_AUDIO_RPM", 0))  # Transcription requests per minute, 0 for no client-side limit
+GROQ_LIVE_RESERVE = int(os.getenv("GROQ_LIVE_RESERVE", 4))  # Concurrency slots background work (batch jobs) never takes
+GROQ_LIVE_RATE_SHARE = float(os.getenv("GROQ_LIVE_RATE_SHARE", 0.25))  # Share of each per-minute budget background work leaves unused
+GROQ_WORKERS = int(os.getenv("GROQ_WORKERS") or os.getenv("WEB_CONCURRENCY") or 1)  # Processes sharing the budgets above
+
+# Upstream statuses meaning "too much load, try again later"
+RETRYABLE_STATUSES = (429, 503)
+
+# Durations in rate-limit headers, e.g. "2m59.56s", "7.66s" or "120ms"
+DURATION_PART_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+DURATION_UNITS = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+
+class ServiceBusyError(Exception):
+    """Raised when a request is shed because the upstream API is saturated"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class UpstreamRateLimited(Exception):
+    """Raised by check_response for a rate-limited response that should be retried"""
+
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"Upstream returned {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+def parse_duration(value):
+    """Parse a rate-limit header duration ("1.5", "2m59.56s", "120ms") into seconds, or None"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PART_PATTERN.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+class TokenBucket:
+    """Request budget of one upstream endpoint"""
+
+    def __init__(self, per_minute):
+        # A zero rate means no client-side budget, only server-reported blocks apply
+        self.capacity = per_minute
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now, reserve=0.0):
+        """Seconds until a request may be sent, leaving the given share of the budget untouched"""
+        wait = max(0.0, self.blocked_until - now)
+        if self.capacity:
+            self._refill(now)
+            needed = 1 + self.capacity * reserve
+            if self.tokens < needed:
+                wait = max(wait, (needed - self.tokens) / self.rate)
+        return wait
+
+    def take(self, now):
+        if self.capacity:
+            self._refill(now)
+            self.tokens -= 1
+
+    def block(self, seconds):
+        """Send nothing for the next seconds (the server reported the limit as exhausted)"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+class RateLimiter:
+    """
+    Adaptive limiter shared by all Groq requests (chat completions and Whisper).
+    Limits the requests in flight and the request rate per endpoint, pauses an
+    endpoint when the rate-limit headers report its budget as exhausted, and
+    retries rate-limited requests with jittered exponential backoff.
+    Waiting requests are served round-robin per session, so one busy client
+    cannot starve the others. When the queue is full or a request waited too
+    long, it is shed with ServiceBusyError instead of piling up.
+    Background requests (bulk batch jobs) are only served when no live request
+    is waiting, never take the last live_reserve slots or the live_rate_share
+    of a per-minute budget, and wait as long as needed instead of being shed.
+    The limiter is per process: when several worker processes share one API
+    key, each gets an equal share of the concurrency and per-minute budgets.
+    """
+
+    def __init__(self, max_concurrency=GROQ_MAX_CONCURRENCY, max_queue=GROQ_MAX_QUEUE,
+                 queue_timeout=GROQ_QUEUE_TIMEOUT, max_retries=GROQ_MAX_RETRIES,
+                 base_delay=GROQ_RETRY_BASE_DELAY, max_delay=GROQ_RETRY_MAX_DELAY,
+                 rates=None, live_reserve=GROQ_LIVE_RESERVE, live_rate_share=GROQ_LIVE_RATE_SHARE,
+                 workers=GROQ_WORKERS):
+        """
+        Parameters:
+        - max_concurrency: Maximum requests in flight
+        - max_queue: Maximum requests waiting for a slot
+        - queue_timeout: Seconds a request may wait for a slot
+        - max_retries: Retries of a rate-limited request before it is shed
+        - base_delay, max_delay: Bounds of the exponential retry backoff in seconds
+        - rates: Requests per minute by endpoint kind ("chat", "audio"), 0 for no client-side limit
+        - live_reserve: Concurrency slots kept free of background requests
+        - live_rate_share: Share of each per-minute budget kept free of background requests
+        - workers: Number of worker processes sharing the budgets; each process uses its share
+        """
+        # Every worker has its own limiter, so all of them together stay within the budgets
+        self.workers = max(1, workers)
+        max_concurrency = max(1, max_concurrency // self.workers)
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.live_reserve = max(0, min(live_reserve, max_concurrency - 1))
+        self.live_rate_share = min(max(live_rate_share, 0.0), 0.9)
+
+        rates = rates or {"chat": GROQ_CHAT_RPM, "audio": GROQ_AUDIO_RPM}
+        self._buckets = {kind: TokenBucket(per_minute / self.workers) for kind, per_minute in rates.items()}
+
+        # session -> deque of (kind, future) waiting for a slot, in round-robin order
+        self._queues = OrderedDict()
+        self._waiting = 0
+        # (kind, future) of background requests waiting for a slot, in arrival order
+        self._background = deque()
+        self._in_flight = 0
+        self._timer = None
+
+        # Counters
+        self.requests = 0
+        self.queued = 0
+        self.throttled = 0
+        self.retries = 0
+        self.shed = 0
+        self.background_requests = 0
+
+    def _bucket(self, kind):
+        bucket = self._buckets.get(kind)
+        if bucket is None:
+            bucket = self._buckets[kind] = TokenBucket(0)
+        return bucket
+
+    async def run(self, kind, session_id, attempt, background=False):
+        """
+        Run a request under the limiter, retrying it while it is rate limited.
+
+        Parameters:
+        - kind: Upstream endpoint kind, e.g. "chat" or "audio"
+        - session_id: Session the request is made for (None for shared work)
+        - attempt: Coroutine function sending the request once; it passes the
+                   response to check_response, which raises UpstreamRateLimited
+        - background: Whether the request is bulk work that must not delay live traffic
+
+        Returns:
+        - The result of attempt
+        """
+        delay = None
+        for retry in range(self.max_retries + 1):
+            if background:
+                await self._acquire_background(kind)
+            else:
+                await self._acquire(kind, session_id)
+            try:
+                return await attempt()
+            except UpstreamRateLimited as e:
+                delay = self._backoff(retry, e.retry_after)
+            finally:
+                self._release()
+            if retry == self.max_retries:
+                break
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+        self.shed += 1
+        raise ServiceBusyError("The service is busy, please try again shortly", retry_after=delay)
+
+    def _backoff(self, retry, retry_after=None):
+        """Jittered exponential backoff, never shorter than the delay the server asked for"""
+        jitter = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+        return (retry_after or 0) + jitter
+
+    def check_response(self, kind, response):
+        """
+        Adapt to the rate-limit headers of a response.
+        Raises UpstreamRateLimited if the response should be retried later.
+        """
+        headers = response.headers
+        bucket = self._bucket(kind)
+        for budget in ("requests", "tokens"):
+            remaining = headers.get(f"x-ratelimit-remaining-{budget}")
+            reset = parse_duration(headers.get(f"x-ratelimit-reset-{budget}"))
+            if remaining is not None and reset and remaining.strip() == "0":
+                # Budget used up: hold back further requests until it resets
+                bucket.block(reset)
+
+        if response.status in RETRYABLE_STATUSES:
+            self.throttled += 1
+            retry_after = parse_duration(headers.get("retry-after"))
+            if retry_after:
+                bucket.block(retry_after)
+            raise UpstreamRateLimited(response.status, retry_after)
+
+    async def _acquire(self, kind, session_id):
+        """Wait for a slot, served fairly across sessions"""
+        self.requests += 1
+        if not self._queues and self._try_grant(kind):
+            return
+
+        if self._waiting >= self.max_queue:
+            self.shed += 1
+            raise ServiceBusyError("Too many requests are waiting, please try again shortly", retry_after=1)
+
+        self.queued += 1
+        session_key = session_id or ""
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(session_key, deque()).append((kind, future))
+        self._waiting += 1
+        self._dispatch()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # The slot was granted just as the caller gave up
+                self._release()
+            else:
+                future.cancel()
+                self._discard(session_key, future)
+            if isinstance(e, asyncio.TimeoutError):
+                self.shed += 1
+                raise ServiceBusyError("Timed out waiting for the service, please try again shortly",
+                                       retry_after=self.queue_timeout) from None
+            raise
+
+    async def _acquire_background(self, kind):
+        """Wait for a slot that no live request needs, without a timeout"""
+        self.requests += 1
+        self.background_requests += 1
+        if not self._queues and not self._background and self._try_grant(kind, background=True):
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        item = (kind, future)
+        self._background.append(item)
+        self._dispatch()
+        try:
+            await asyncio.shield(future)
+        except BaseException:
+            if future.done() and not future.cancelled():
+                self._release()
+            else:
+                future.cancel()
+                if item in self._background:
+                    self._background.remove(item)
+            raise
+
+    def _try_grant(self, kind, background=False):
+        limit = self.max_concurrency - (self.live_reserve if background else 0)
+        if self._in_flight >= limit:
+            return False
+        now = time.monotonic()
+        bucket = self._bucket(kind)
+        if bucket.delay(now, self.live_rate_share if background else 0.0) > 0:
+            return False
+        bucket.take(now)
+        self._in_flight += 1
+        return True
+
+    def _discard(self, session_key, future):
+        queue = self._queues.get(session_key)
+        if queue is None:
+            return
+        for item in queue:
+            if item[1] is future:
+                queue.remove(item)
+                self._waiting -= 1
+                break
+        if not queue:
+            del self._queues[session_key]
+
+    def _release(self):
+        self._in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Grant free slots to waiting requests, one session at a time"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        next_ready = None
+        while self._queues and self._in_flight < self.max_concurrency:
+            granted = False
+            for session_key in list(self._queues):
+                queue = self._queues[session_key]
+                kind, future = queue[0]
+                if not self._try_grant(kind):
+                    wait = self._bucket(kind).delay(time.monotonic())
+                    next_ready = wait if next_ready is None else min(next_ready, wait)
+                    continue
+                queue.popleft()
+                self._waiting -= 1
+                # Move the session to the back so the other sessions go first next time
+                del self._queues[session_key]
+                if queue:
+                    self._queues[session_key] = queue
+                future.set_result(None)
+                granted = True
+                break
+            if not granted:
+                break
+
+        # Background requests only get what live requests leave over
+        while self._background and not self._queues and self._in_flight < self.max_concurrency - self.live_reserve:
+            kind, future = self._background[0]
+            if not self._try_grant(kind, background=True):
+                wait = self._bucket(kind).delay(time.monotonic(), self.live_rate_share)
+                next_ready = wait if next_ready is None else min(next_ready, wait)
+                break
+            self._background.popleft()
+            future.set_result(None)
+
+        if (self._queues or self._background) and next_ready and self._in_flight < self.max_concurrency:
+            # All waiting requests are paused by their budget: try again once it refills
+            self._timer = asyncio.get_running_loop().call_later(next_ready, self._dispatch)
+
+    def stats(self):
+        """Return rate limiting statistics"""
+        now = time.monotonic()
+        return {
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "waiting_sessions": len(self._queues),
+            "max_concurrency": self.max_concurrency,
+            "workers": self.workers,
+            "per_minute": {kind: round(bucket.capacity, 2) for kind, bucket in self._buckets.items()},
+            "requests": self.requests,
+            "queued": self.queued,
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "shed": self.shed,
+            "background_requests": self.background_requests,
+            "background_waiting": len(self._background),
+            "live_reserve": self.live_reserve,
+            "paused_for": {kind: round(max(0.0, bucket.blocked_until - now), 3)
+                           for kind, bucket in self._buckets.items()}
+        }
+
+# Shared limiter for all Groq requests
+rate_limiter = RateLimiter()
@@ -0,0 +1,71 @@
+import asyncio
+
+class RequestCoalescer:
+    """
+    Single-flight layer for upstream requests.
+    Concurrent calls with the same key share one in-flight upstream request
+    instead of each sending a duplicate. The upstream request is cancelled
+    once every caller waiting for it has been cancelled.
+    """
+
+    def __init__(self):
+        # key -> task of the in-flight upstream request
+        self._inflight = {}
+        # task -> number of callers waiting for it
+        self._waiters = {}
+
+        # Counters
+        self.calls = 0
+        self.upstream_calls = 0
+        self.deduplicated = 0
+        self.cancelled = 0
+
+    async def run(self, key, request_factory):
+        """
+        Run the request for key, or join the identical request already in flight.
+
+        Parameters:
+        - key: Hashable key identifying identical requests
+        - request_factory: Zero-argument callable returning the coroutine to run
+
+        Returns:
+        - The result of the (shared) upstream request
+        """
+        self.calls += 1
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.deduplicated += 1
+        else:
+            self.upstream_calls += 1
+            task = asyncio.ensure_future(request_factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda finished, key=key: self._release(key, finished))
+
+        # Shield so one caller going away does not cancel the request for the others
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    # The last caller went away: nobody needs the result any more
+                    task.cancel()
+                    self._release(key, task)
+                    self.cancelled += 1
+
+    def _release(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def stats(self):
+        """Return coalescing statistics"""
+        return {
+            "calls": self.calls,
+            "upstream_calls": self.upstream_calls,
+            "deduplicated": self.deduplicated,
+            "cancelled": self.cancelled,
+            "in_flight": len(self._inflight)
+        }
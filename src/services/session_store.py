@@ -0,0 +1,101 @@
+import os
+import re
+import uuid
+from dotenv import load_dotenv
+from services.state_backend import state_backend
+
+# Load environment variables
+load_dotenv()
+SESSION_IDLE_TTL = int(os.getenv("SESSION_IDLE_TTL", 30 * 60))  # Seconds before an idle session is dropped
+SESSION_HISTORY_SIZE = int(os.getenv("SESSION_HISTORY_SIZE", 10))  # Exchanges kept per session
+SESSION_ID_PATTERN = re.compile(r"session_[0-9a-f]{32}")
+
+class HistoryRecord:
+    """One original/translation exchange in a session's history"""
+
+    __slots__ = ("original", "translation")
+
+    def __init__(self, original, translation):
+        self.original = original
+        self.translation = translation
+
+    def to_json(self):
+        return [self.original, self.translation]
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data[0], data[1])
+
+class SessionStore:
+    """
+    Bounded store for per-session translation history.
+    Sessions expire after SESSION_IDLE_TTL seconds without activity, and the
+    backend caps the total number of keys and memory. The backend is pluggable:
+    the in-memory default, or a Redis-compatible server shared by several workers.
+    """
+
+    def __init__(self, backend=None, history_size=SESSION_HISTORY_SIZE, idle_ttl=SESSION_IDLE_TTL):
+        self.backend = backend or state_backend
+        self.history_size = history_size
+        self.idle_ttl = idle_ttl
+
+    @staticmethod
+    def new_session_id():
+        """Create a session ID that is unique across processes and never reused"""
+        return f"session_{uuid.uuid4().hex}"
+
+    @staticmethod
+    def is_valid_session_id(session_id):
+        """Check that a client-supplied session ID has the format created by new_session_id"""
+        return bool(session_id) and SESSION_ID_PATTERN.fullmatch(session_id) is not None
+
+    def _history_key(self, session_id, language=None):
+        # Each target language has its own history, so context never mixes languages
+        return f"history:{session_id}:{language}" if language else f"history:{session_id}"
+
+    def _transcript_key(self, session_id):
+        return f"transcript:{session_id}"
+
+    async def add_exchange(self, session_id, original, translation, language=None):
+        """Append an exchange to the session's history (of one target language, if given)"""
+        record = HistoryRecord(original, translation)
+        await self.backend.push(
+            self._history_key(session_id, language),
+            record.to_json() if self.backend.serializes else record,
+            self.history_size,
+            ttl=self.idle_ttl
+        )
+
+    async def get_history(self, session_id, limit=None, language=None):
+        """Return the session's most recent exchanges (of one target language, if given) as HistoryRecords, oldest first"""
+        # Reading the history is activity too: it keeps the session alive for another idle period
+        records = await self.backend.range(self._history_key(session_id, language), limit, ttl=self.idle_ttl)
+        if self.backend.serializes:
+            return [HistoryRecord.from_json(record) for record in records]
+        return records
+
+    async def get_transcript_context(self, session_id):
+        """Return the session's recent transcription text, used as its Whisper prompt"""
+        return await self.backend.get(self._transcript_key(session_id), ttl=self.idle_ttl) or ""
+
+    async def set_transcript_context(self, session_id, text):
+        """Store the session's recent transcription text, used as its Whisper prompt"""
+        await self.backend.set(self._transcript_key(session_id), text, ttl=self.idle_ttl)
+
+    async def end_session(self, session_id, languages=()):
+        """Drop all state of a session (e.g. when its client disconnects), including the histories of the given languages"""
+        await self.backend.delete(self._history_key(session_id))
+        for language in languages:
+            await self.backend.delete(self._history_key(session_id, language))
+        await self.backend.delete(self._transcript_key(session_id))
+
+    def stats(self):
+        """Return session store statistics"""
+        return {
+            "idle_ttl": self.idle_ttl,
+            "history_size": self.history_size,
+            **self.backend.stats()
+        }
+
+# Shared session store used by the API and translation services
+session_store = SessionStore()
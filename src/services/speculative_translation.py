@@ -0,0 +1,275 @@
+import os
+import re
+import time
+import asyncio
+from collections import OrderedDict
+from dotenv import load_dotenv
+from services.text_utils import UNSPACED_LANGUAGES, is_error_translation, join_segments
+
+# Load environment variables
+load_dotenv()
+SPECULATIVE_TRANSLATION_ENABLED = os.getenv("SPECULATIVE_TRANSLATION_ENABLED", "true").lower() == "true"
+SPECULATIVE_MAX_UTTERANCES = int(os.getenv("SPECULATIVE_MAX_UTTERANCES", 1000))  # Open utterances tracked at once
+SPECULATIVE_UTTERANCE_TTL = int(os.getenv("SPECULATIVE_UTTERANCE_TTL", 60))  # Seconds an utterance without updates is kept
+
+# Sentence ends: the text before one is a stable unit that later hypotheses keep
+SEGMENT_BOUNDARY = re.compile(r"(?<=[.!?؟])\s+|(?<=[。！？])")
+SEGMENT_END = re.compile(r"[.!?؟。！？]$")
+
+def split_segments(text):
+    """Split a transcript into sentence segments"""
+    return [segment.strip() for segment in SEGMENT_BOUNDARY.split(text.strip()) if segment.strip()]
+
+def join_providers(providers):
+    """Name the backends that translated the parts of a text, e.g. groq or groq+google_web"""
+    names = []
+    for provider in providers:
+        if provider and provider not in names:
+            names.append(provider)
+    return "+".join(names)
+
+class Utterance:
+    """Speculative translations of one utterance's segments, keyed by (segment, source, target)"""
+
+    __slots__ = ("tasks", "updated_at")
+
+    def __init__(self):
+        self.tasks = {}
+        self.updated_at = time.monotonic()
+
+class SpeculativeTranslator:
+    """
+    Translates interim transcripts segment by segment while the speaker is
+    still talking. Sentences of a hypothesis are translated as soon as they
+    are complete; the unfinished sentence at its end is left for a later
+    hypothesis or the final transcript. A hypothesis without a complete sentence
+    yet (e.g. unpunctuated browser speech results) is translated as a whole,
+    without being kept. When a later hypothesis or the final transcript still contains
+    a sentence, its translation is reused instead of being requested again.
+    Work for sentences that a later hypothesis revised is cancelled.
+    """
+
+    def __init__(self, translate, translate_stream=None, enabled=SPECULATIVE_TRANSLATION_ENABLED,
+                 max_utterances=SPECULATIVE_MAX_UTTERANCES, utterance_ttl=SPECULATIVE_UTTERANCE_TTL):
+        """
+        Parameters:
+        - translate: Coroutine function translate(text, source_lang, target_lang, session_id, slo_ms=None) returning
+          a tuple of (translation, name of the backend that served it)
+        - translate_stream: Optional coroutine function translate_stream(text, source_lang, target_lang,
+          session_id, on_delta, slo_ms=None) streaming a translation and returning the same tuple; used for the
+          unspeculated tail of final transcripts
+        """
+        self.translate = translate
+        self.translate_stream = translate_stream
+        self.enabled = enabled
+        self.max_utterances = max_utterances
+        self.utterance_ttl = utterance_ttl
+        self._utterances = OrderedDict()
+
+        # Counters
+        self.started = 0
+        self.reused = 0
+        self.cancelled = 0
+        self.unused = 0
+        self.reused_chars = 0
+        self.wasted_chars = 0
+
+    def _get_utterance(self, key):
+        utterance = self._utterances.get(key)
+        if utterance is None:
+            self._expire()
+            utterance = Utterance()
+            self._utterances[key] = utterance
+        else:
+            self._utterances.move_to_end(key)
+        utterance.updated_at = time.monotonic()
+        return utterance
+
+    def _expire(self):
+        """Drop utterances that were abandoned, and the oldest ones beyond the limit"""
+        deadline = time.monotonic() - self.utterance_ttl
+        while self._utterances:
+            key, utterance = next(iter(self._utterances.items()))
+            if utterance.updated_at > deadline and len(self._utterances) < self.max_utterances:
+                break
+            del self._utterances[key]
+            self._discard_tasks(utterance.tasks)
+
+    def _discard_tasks(self, tasks):
+        """Count and cancel speculative translations that will not be used"""
+        for (segment, _, _), task in tasks.items():
+            self.wasted_chars += len(segment)
+            if task.done():
+                self.unused += 1
+                if not task.cancelled():
+                    task.exception()  # Mark a failure as retrieved
+            else:
+                task.cancel()
+                self.cancelled += 1
+        tasks.clear()
+
+    @staticmethod
+    def _reusable(task):
+        """A speculative translation can be reused unless it failed or was cancelled"""
+        if not task.done():
+            return True
+        if task.cancelled() or task.exception() is not None:
+            return False
+        return not is_error_translation(task.result()[0])
+
+    async def speculate(self, key, text, source_lang, target_lang, session_id=None, slo_ms=None):
+        """
+        Translate an interim transcript of an utterance.
+
+        Parameters:
+        - key: Identifies the utterance (e.g. session, action and utterance ID)
+        - text: The current hypothesis of the utterance's transcript
+        - slo_ms: Optional latency target, passed on to the translate functions
+
+        Returns:
+        - Tuple of (translation of the hypothesis' complete sentences, backends that served it);
+          the translation of the whole hypothesis while it has no complete sentence yet
+        """
+        utterance = self._get_utterance(key)
+        segments = split_segments(text)
+        if segments and not SEGMENT_END.search(segments[-1]):
+            # The speaker is still in the middle of the last sentence
+            segments.pop()
+        wanted = [(segment, source_lang, target_lang) for segment in segments]
+
+        # Sentences the new hypothesis revised were mis-speculated
+        stale = {spec: task for spec, task in utterance.tasks.items()
+                 if spec not in wanted or not self._reusable(task)}
+        for spec in stale:
+            del utterance.tasks[spec]
+        self._discard_tasks(stale)
+
+        tasks = []
+        for spec in wanted:
+            task = utterance.tasks.get(spec)
+            if task is None:
+                task = asyncio.create_task(self.translate(spec[0], source_lang, target_lang, session_id, slo_ms=slo_ms))
+                utterance.tasks[spec] = task
+                self.started += 1
+            tasks.append(task)
+
+        if not tasks:
+            if not text.strip():
+                return "", ""
+            # Nothing is stable yet; a later hypothesis will most likely revise this text
+            return await self.translate(text, source_lang, target_lang, session_id, slo_ms=slo_ms)
+
+        # Shielded, so a superseded interim update leaves the shared translations running
+        results = await asyncio.gather(*(asyncio.shield(task) for task in tasks))
+        for translation, provider in results:
+            if is_error_translation(translation):
+                return translation, provider
+        return (
+            join_segments([translation for translation, _ in results], target_lang),
+            join_providers(provider for _, provider in results)
+        )
+
+    async def finalize(self, key, text, source_lang, target_lang, session_id=None, on_delta=None, slo_ms=None):
+        """
+        Translate the final transcript of an utterance, reusing the speculative
+        translations of its leading sentences; the rest is translated in one request.
+
+        Parameters:
+        - on_delta: Optional coroutine function receiving the translation piece by piece
+
+        Returns:
+        - Tuple of (translation of the final transcript, backends that served it)
+        """
+        utterance = self._utterances.pop(key, None)
+        tasks = utterance.tasks if utterance else {}
+        segments = split_segments(text)
+
+        # Reuse the longest run of leading sentences that were speculated correctly
+        reused = []
+        for segment in segments:
+            task = tasks.get((segment, source_lang, target_lang))
+            if task is None or not self._reusable(task):
+                break
+            reused.append(task)
+            del tasks[(segment, source_lang, target_lang)]
+            self.reused += 1
+            self.reused_chars += len(segment)
+        self._discard_tasks(tasks)
+
+        tail = join_segments(segments[len(reused):], source_lang) if len(reused) < len(segments) else ""
+        if not reused:
+            # Nothing was speculated: translate the whole transcript as one text
+            tail = text
+
+        parts = []
+        providers = []
+        separator = "" if (target_lang or "").lower() in UNSPACED_LANGUAGES else " "
+
+        async def emit(piece):
+            if on_delta and piece:
+                await on_delta(separator + piece if parts and separator else piece)
+
+        try:
+            if on_delta and self.translate_stream is not None:
+                for task in reused:
+                    translation, provider = await task
+                    if is_error_translation(translation):
+                        return translation, provider
+                    await emit(translation)
+                    parts.append(translation)
+                    providers.append(provider)
+                if tail:
+                    first_delta = True
+
+                    async def on_tail_delta(delta):
+                        nonlocal first_delta
+                        if first_delta and parts and separator:
+                            delta = separator + delta.lstrip()
+                        first_delta = False
+                        await on_delta(delta)
+
+                    translation, provider = await self.translate_stream(
+                        tail, source_lang, target_lang, session_id, on_tail_delta, slo_ms=slo_ms
+                    )
+                    parts.append(translation)
+                    providers.append(provider)
+            else:
+                tail_task = asyncio.create_task(
+                    self.translate(tail, source_lang, target_lang, session_id, slo_ms=slo_ms)
+                ) if tail else None
+                try:
+                    results = await asyncio.gather(*reused)
+                    if tail_task is not None:
+                        results.append(await tail_task)
+                finally:
+                    if tail_task is not None:
+                        tail_task.cancel()
+                parts.extend(translation for translation, _ in results)
+                providers.extend(provider for _, provider in results)
+                if on_delta:
+                    await on_delta(join_segments(parts, target_lang))
+        finally:
+            for task in reused:
+                task.cancel()
+
+        for translation, provider in zip(parts, providers):
+            if is_error_translation(translation):
+                return translation, provider
+        return join_segments(parts, target_lang), join_providers(providers)
+
+    def discard(self, session_id):
+        """Cancel the speculative work of a closed connection's utterances"""
+        for key in [key for key in self._utterances if key[0] == session_id]:
+            self._discard_tasks(self._utterances.pop(key).tasks)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "open_utterances": len(self._utterances),
+            "started": self.started,
+            "reused": self.reused,
+            "cancelled": self.cancelled,
+            "unused": self.unused,
+            "reused_chars": self.reused_chars,
+            "wasted_chars": self.wasted_chars
+        }
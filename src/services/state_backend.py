@@ -0,0 +1,401 @@
+import os
+import sys
+import time
+import json
+import asyncio
+from collections import OrderedDict, deque
+from urllib.parse import urlparse
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory").lower()  # "memory" or "redis"
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+STATE_KEY_PREFIX = os.getenv("STATE_KEY_PREFIX", "voice_assistant:")
+STATE_MAX_KEYS = int(os.getenv("STATE_MAX_KEYS", 10000))
+STATE_MAX_BYTES = int(os.getenv("STATE_MAX_BYTES", 64 * 1024 * 1024))
+REDIS_POOL_SIZE = int(os.getenv("REDIS_POOL_SIZE", 4))  # Connections per worker process
+
+def _estimate_size(value):
+    """Rough memory footprint of a stored value"""
+    if isinstance(value, deque):
+        return sys.getsizeof(value) + sum(_estimate_size(item) for item in value)
+    if hasattr(value, "__slots__"):
+        return sys.getsizeof(value) + sum(
+            sys.getsizeof(getattr(value, slot, None)) for slot in value.__slots__
+        )
+    return sys.getsizeof(value)
+
+class InMemoryStateBackend:
+    """
+    Process-local state backend (the default).
+    Keys expire ttl seconds after they were last written, or read with a ttl
+    (the same as the Redis backend), and the least recently used keys are
+    evicted once the global key or memory cap is reached.
+    """
+
+    # Values are stored as Python objects, no serialization needed
+    serializes = False
+
+    def __init__(self, max_keys=STATE_MAX_KEYS, max_bytes=STATE_MAX_BYTES):
+        self.max_keys = max_keys
+        self.max_bytes = max_bytes
+
+        # key -> [value, ttl, expires_at, size], least recently used first
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+        # Counters
+        self.evictions = 0
+        self.expirations = 0
+
+    def _lookup(self, key, ttl=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        now = time.monotonic()
+        if entry[2] <= now:
+            self._remove(key)
+            self.expirations += 1
+            return None
+        # A read with a ttl keeps the key alive for another ttl seconds
+        if ttl:
+            entry[1] = ttl
+            entry[2] = now + ttl
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key, value, ttl):
+        if key in self._entries:
+            self._remove(key)
+        size = _estimate_size(value)
+        expires_at = time.monotonic() + ttl if ttl else float("inf")
+        self._entries[key] = [value, ttl, expires_at, size]
+        self._bytes += size
+        self._enforce_limits()
+
+    def _resize(self, key, entry):
+        size = _estimate_size(entry[0])
+        self._bytes += size - entry[3]
+        entry[3] = size
+        self._enforce_limits()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry[3]
+
+    def _enforce_limits(self):
+        # Drop idle keys first (they are at the front in LRU order), then evict by LRU
+        now = time.monotonic()
+        while self._entries:
+            oldest_key, oldest = next(iter(self._entries.items()))
+            if oldest[2] <= now:
+                self._remove(oldest_key)
+                self.expirations += 1
+            elif len(self._entries) > self.max_keys or self._bytes > self.max_bytes:
+                self._remove(oldest_key)
+                self.evictions += 1
+            else:
+                break
+
+    async def get(self, key, ttl=None):
+        """Return the value stored under key, or None; a ttl restarts the key's expiry"""
+        entry = self._lookup(key, ttl)
+        return entry[0] if entry else None
+
+    async def set(self, key, value, ttl=None):
+        """Store a value, expiring after ttl seconds unless it is written or read with a ttl again"""
+        self._store(key, value, ttl)
+
+    async def set_if_missing(self, key, value, ttl=None):
+        """Store a value unless the key exists; return whether it was stored"""
+        if self._lookup(key) is not None:
+            return False
+        self._store(key, value, ttl)
+        return True
+
+    async def delete(self, key):
+        """Remove a key"""
+        if key in self._entries:
+            self._remove(key)
+
+    async def push(self, key, value, max_len, ttl=None):
+        """Append to the list under key, keeping only its last max_len items"""
+        entry = self._lookup(key)
+        if entry is None or not isinstance(entry[0], deque):
+            self._store(key, deque([value], maxlen=max_len), ttl)
+            return
+        entry[0].append(value)
+        if ttl:
+            entry[1] = ttl
+            entry[2] = time.monotonic() + ttl
+        self._resize(key, entry)
+
+    async def range(self, key, count=None, ttl=None):
+        """Return the list under key (its last count items if given); a ttl restarts the key's expiry"""
+        entry = self._lookup(key, ttl)
+        if entry is None or not isinstance(entry[0], deque):
+            return []
+        items = list(entry[0])
+        return items[-count:] if count else items
+
+    async def close(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self):
+        return {
+            "backend": "memory",
+            "keys": len(self._entries),
+            "bytes": self._bytes,
+            "max_keys": self.max_keys,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+class RedisError(RuntimeError):
+    """Raised for an error reply from the Redis server"""
+
+# Commands that are safe to send again when a connection fails before their replies arrive;
+# writes such as RPUSH are not, as the server may already have applied them
+RETRYABLE_COMMANDS = {"GET", "LRANGE", "EXPIRE"}
+
+class RedisConnection:
+    """One RESP connection to the server, used by one command pipeline at a time"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @staticmethod
+    def _encode_command(args):
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    async def _read_reply(self):
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        prefix, payload = line[:1], line[1:-2]
+        if prefix == b"+":
+            return payload.decode("utf-8")
+        if prefix == b"-":
+            # Returned rather than raised, so the replies after it are still read
+            return RedisError(f"Redis error: {payload.decode('utf-8')}")
+        if prefix == b":":
+            return int(payload)
+        if prefix == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = await self.reader.readexactly(length + 2)
+            return data[:-2].decode("utf-8")
+        if prefix == b"*":
+            count = int(payload)
+            if count < 0:
+                return None
+            return [await self._read_reply() for _ in range(count)]
+        raise RuntimeError(f"Unexpected Redis reply: {line!r}")
+
+    async def send(self, commands):
+        """
+        Pipeline commands: write them all, then read all replies.
+
+        Raises:
+        - RedisError for an error reply, once all replies are read (the connection stays usable)
+        - Any other exception leaves unread replies behind; the connection must then be closed
+        """
+        self.writer.write(b"".join(self._encode_command(args) for args in commands))
+        await self.writer.drain()
+        replies = [await self._read_reply() for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+    @property
+    def is_closed(self):
+        """Whether the server closed the connection (e.g. an idle timeout) or it was closed here"""
+        return self.reader.at_eof() or self.writer.is_closing()
+
+    def close(self):
+        self.writer.close()
+
+class RedisStateBackend:
+    """
+    State backend for any Redis-compatible server, so several uvicorn workers
+    can share session state. Talks RESP directly over a small pool of asyncio
+    connections, so concurrent commands of one worker do not wait for each other.
+    Values are stored as JSON strings.
+    """
+
+    serializes = True
+
+    def __init__(self, url=REDIS_URL, key_prefix=STATE_KEY_PREFIX, pool_size=REDIS_POOL_SIZE):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.key_prefix = key_prefix
+        self.pool_size = pool_size
+
+        # Connections not in use; at most pool_size are open at once
+        self._idle = []
+        self._connections = set()
+        self._slots = asyncio.Semaphore(pool_size)
+
+        # Counters
+        self.commands = 0
+        self.errors = 0
+        self.reconnects = 0
+
+    async def _connect(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        connection = RedisConnection(reader, writer)
+        self._connections.add(connection)
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            try:
+                await connection.send(setup)
+            except BaseException:
+                # Never keep a connection that is not authenticated or on the wrong database
+                self._discard(connection)
+                raise
+        return connection
+
+    async def _acquire(self):
+        """Return an idle connection, or a new one if none is left or the idle ones were closed"""
+        while self._idle:
+            connection = self._idle.pop()
+            if not connection.is_closed:
+                return connection
+            self._discard(connection)
+            self.reconnects += 1
+        return await self._connect()
+
+    def _discard(self, connection):
+        self._connections.discard(connection)
+        connection.close()
+
+    async def execute(self, *commands):
+        """
+        Run one or more commands (tuples of arguments) as one pipeline and return their replies.
+        A pipeline of reads is sent again on a new connection if its connection fails;
+        one with writes is not, as the server may already have applied them.
+        """
+        async with self._slots:
+            self.commands += len(commands)
+            connection = await self._acquire()
+            try:
+                replies = await connection.send(commands)
+            except RedisError:
+                self.errors += 1
+                self._idle.append(connection)
+                raise
+            except (ConnectionError, OSError, asyncio.IncompleteReadError):
+                self.errors += 1
+                self._discard(connection)
+                if not all(args[0] in RETRYABLE_COMMANDS for args in commands):
+                    raise
+                self.reconnects += 1
+                connection = await self._connect()
+                try:
+                    replies = await connection.send(commands)
+                except RedisError:
+                    self.errors += 1
+                    self._idle.append(connection)
+                    raise
+                except BaseException:
+                    self._discard(connection)
+                    raise
+            except BaseException:
+                # Replies left unread (e.g. after a cancellation) would be taken as the
+                # replies to the next commands: the connection cannot be used again
+                self._discard(connection)
+                raise
+            self._idle.append(connection)
+            return replies
+
+    def _key(self, key):
+        return self.key_prefix + key
+
+    async def get(self, key, ttl=None):
+        full_key = self._key(key)
+        if ttl:
+            value, _ = await self.execute(("GET", full_key), ("EXPIRE", full_key, int(ttl)))
+        else:
+            (value,) = await self.execute(("GET", full_key))
+        return json.loads(value) if value is not None else None
+
+    async def set(self, key, value, ttl=None):
+        command = ["SET", self._key(key), json.dumps(value)]
+        if ttl:
+            command += ["EX", int(ttl)]
+        await self.execute(tuple(command))
+
+    async def set_if_missing(self, key, value, ttl=None):
+        command = ["SET", self._key(key), json.dumps(value), "NX"]
+        if ttl:
+            command += ["EX", int(ttl)]
+        (reply,) = await self.execute(tuple(command))
+        return reply == "OK"
+
+    async def delete(self, key):
+        await self.execute(("DEL", self._key(key)))
+
+    async def push(self, key, value, max_len, ttl=None):
+        full_key = self._key(key)
+        commands = [
+            ("RPUSH", full_key, json.dumps(value)),
+            ("LTRIM", full_key, -max_len, -1)
+        ]
+        if ttl:
+            commands.append(("EXPIRE", full_key, int(ttl)))
+        await self.execute(*commands)
+
+    async def range(self, key, count=None, ttl=None):
+        full_key = self._key(key)
+        start = -count if count else 0
+        if ttl:
+            items, _ = await self.execute(("LRANGE", full_key, start, -1), ("EXPIRE", full_key, int(ttl)))
+        else:
+            (items,) = await self.execute(("LRANGE", full_key, start, -1))
+        return [json.loads(item) for item in items or []]
+
+    async def close(self):
+        for connection in list(self._connections):
+            self._discard(connection)
+        self._idle.clear()
+
+    def stats(self):
+        return {
+            "backend": "redis",
+            "host": self.host,
+            "port": self.port,
+            "db": self.db,
+            "pool_size": self.pool_size,
+            "open_connections": len(self._connections),
+            "idle_connections": len(self._idle),
+            "commands": self.commands,
+            "errors": self.errors,
+            "reconnects": self.reconnects
+        }
+
+def create_state_backend(kind=STATE_BACKEND):
+    """Create the state backend selected by STATE_BACKEND"""
+    if kind == "redis":
+        return RedisStateBackend()
+    return InMemoryStateBackend()
+
+# Shared backend instance for all externalized state
+state_backend = create_state_backend()
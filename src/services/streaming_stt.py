@@ -0,0 +1,346 @@
+import os
+import io
+import wave
+import asyncio
+from collections import deque
+from dotenv import load_dotenv
+from pydub import AudioSegment
+from pydub.utils import get_encoder_name
+from services.rate_limiter import ServiceBusyError
+
+# Load environment variables
+load_dotenv()
+STREAM_SAMPLE_RATE = 16000  # Whisper works on 16 kHz mono audio
+VAD_FRAME_MS = int(os.getenv("VAD_FRAME_MS", 30))
+VAD_ENERGY_THRESHOLD_DBFS = float(os.getenv("VAD_ENERGY_THRESHOLD_DBFS", -42))
+VAD_SILENCE_MS = int(os.getenv("VAD_SILENCE_MS", 600))  # Silence that ends an utterance
+VAD_MIN_SPEECH_MS = int(os.getenv("VAD_MIN_SPEECH_MS", 250))  # Shorter segments are dropped as noise
+VAD_PADDING_MS = int(os.getenv("VAD_PADDING_MS", 200))  # Audio kept before speech starts
+STREAM_MAX_SEGMENT_MS = int(os.getenv("STREAM_MAX_SEGMENT_MS", 15000))
+
+SAMPLE_WIDTH = 2  # 16-bit PCM
+
+class EnergyVAD:
+    """Energy-based voice activity detector working on 16-bit mono PCM frames"""
+
+    def __init__(self, threshold_dbfs=VAD_ENERGY_THRESHOLD_DBFS, sample_rate=STREAM_SAMPLE_RATE):
+        self.threshold_dbfs = threshold_dbfs
+        self.sample_rate = sample_rate
+
+    def is_speech(self, frame):
+        """Return True if the frame's loudness is above the speech threshold"""
+        segment = AudioSegment(
+            data=bytes(frame), sample_width=SAMPLE_WIDTH, frame_rate=self.sample_rate, channels=1
+        )
+        return segment.dBFS > self.threshold_dbfs
+
+class StreamingSession:
+    """
+    Per-session streaming transcription state.
+    PCM audio is split into VAD frames; a ring buffer keeps the most recent
+    frames before speech starts, and a segment is closed and submitted for
+    transcription as soon as the speaker pauses or the segment gets too long.
+    Segments are transcribed concurrently, but their results are passed on in
+    segment order; follow-up work on a result (such as its translation) runs
+    concurrently with the results of later segments.
+    """
+
+    def __init__(self, engine, session_id, on_result, language="auto", input_format="webm",
+                 input_sample_rate=STREAM_SAMPLE_RATE, input_channels=1):
+        self.engine = engine
+        self.session_id = session_id
+        self.on_result = on_result
+        self.language = language
+        self.input_format = input_format
+        self.input_sample_rate = input_sample_rate
+        self.input_channels = input_channels
+
+        self.frame_bytes = STREAM_SAMPLE_RATE * VAD_FRAME_MS // 1000 * SAMPLE_WIDTH
+        # Ring buffer of the most recent non-speech frames (pre-roll for the next segment)
+        self._preroll = deque(maxlen=max(1, VAD_PADDING_MS // VAD_FRAME_MS))
+        self._pending = bytearray()  # PCM not yet forming a whole VAD frame
+        self._segment = bytearray()
+        self._in_speech = False
+        self._speech_frames = 0
+        self._silence_frames = 0
+        self._segment_start_ms = 0
+        self._position_ms = 0  # Stream position of the next VAD frame
+
+        self._decoder = None
+        self._decoder_reader = None
+        self._tasks = set()
+        self._segment_index = 0
+        # Finished results waiting for the results of earlier segments
+        self._results = {}
+        self._next_result = 0
+        self._releasing = False
+
+    async def feed(self, chunk):
+        """Add a chunk of audio received from the client"""
+        self.engine.bytes_received += len(chunk)
+
+        if self.input_format == "pcm_s16le":
+            self._feed_pcm(self._convert_pcm(chunk))
+            return
+
+        # Compressed streams (webm/ogg from MediaRecorder) are decoded by a long-running ffmpeg process
+        if self._decoder is None:
+            await self._start_decoder()
+        self._decoder.stdin.write(chunk)
+        await self._decoder.stdin.drain()
+
+    def _convert_pcm(self, chunk):
+        """Convert raw client PCM to 16 kHz mono if it was sent in another layout"""
+        if self.input_sample_rate == STREAM_SAMPLE_RATE and self.input_channels == 1:
+            return chunk
+        segment = AudioSegment(
+            data=bytes(chunk), sample_width=SAMPLE_WIDTH,
+            frame_rate=self.input_sample_rate, channels=self.input_channels
+        )
+        return segment.set_channels(1).set_frame_rate(STREAM_SAMPLE_RATE).raw_data
+
+    async def _start_decoder(self):
+        """Start ffmpeg decoding the compressed stream to 16 kHz mono PCM"""
+        self._decoder = await asyncio.create_subprocess_exec(
+            get_encoder_name(), "-hide_banner", "-loglevel", "error",
+            "-i", "pipe:0", "-f", "s16le", "-ac", "1", "-ar", str(STREAM_SAMPLE_RATE), "pipe:1",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        self._decoder_reader = asyncio.create_task(self._read_decoder())
+
+    async def _read_decoder(self):
+        while True:
+            pcm = await self._decoder.stdout.read(self.frame_bytes * 10)
+            if not pcm:
+                break
+            self._feed_pcm(pcm)
+
+    def _feed_pcm(self, pcm):
+        """Split PCM into VAD frames and run the segmentation state machine"""
+        self._pending += pcm
+        while len(self._pending) >= self.frame_bytes:
+            frame = bytes(self._pending[:self.frame_bytes])
+            del self._pending[:self.frame_bytes]
+            self._process_frame(frame)
+
+    def _process_frame(self, frame):
+        is_speech = self.engine.vad.is_speech(frame)
+
+        if not self._in_speech:
+            if is_speech:
+                # Speech starts: begin a segment including the buffered pre-roll
+                self._in_speech = True
+                self._segment_start_ms = self._position_ms - len(self._preroll) * VAD_FRAME_MS
+                for buffered in self._preroll:
+                    self._segment += buffered
+                self._preroll.clear()
+                self._segment += frame
+                self._speech_frames = 1
+                self._silence_frames = 0
+            else:
+                if len(self._preroll) == self._preroll.maxlen:
+                    self.engine.silence_bytes_dropped += len(self._preroll[0])
+                self._preroll.append(frame)
+        else:
+            self._segment += frame
+            if is_speech:
+                self._speech_frames += 1
+                self._silence_frames = 0
+            else:
+                self._silence_frames += 1
+
+            segment_ms = len(self._segment) // self.frame_bytes * VAD_FRAME_MS
+            if self._silence_frames * VAD_FRAME_MS >= VAD_SILENCE_MS:
+                self._close_segment()
+            elif segment_ms >= STREAM_MAX_SEGMENT_MS:
+                self._close_segment(forced=True)
+
+        self._position_ms += VAD_FRAME_MS
+
+    def _close_segment(self, forced=False):
+        """Close the current segment and submit it for transcription"""
+        segment = self._segment
+        start_ms = self._segment_start_ms
+
+        # Drop the trailing silence beyond the padding
+        trailing_frames = max(0, self._silence_frames - self._preroll.maxlen)
+        if trailing_frames:
+            self.engine.silence_bytes_dropped += trailing_frames * self.frame_bytes
+            del segment[len(segment) - trailing_frames * self.frame_bytes:]
+
+        self._segment = bytearray()
+        self._silence_frames = 0
+        speech_ms = self._speech_frames * VAD_FRAME_MS
+        self._speech_frames = 0
+        # A forced split continues the same utterance in the next segment
+        self._in_speech = forced
+        self._segment_start_ms = self._position_ms + VAD_FRAME_MS
+
+        if speech_ms < VAD_MIN_SPEECH_MS:
+            self.engine.silence_bytes_dropped += len(segment)
+            return
+
+        end_ms = start_ms + len(segment) // self.frame_bytes * VAD_FRAME_MS
+        index = self._segment_index
+        self._segment_index += 1
+        task = asyncio.create_task(self._transcribe_segment(index, segment, start_ms, end_ms))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _transcribe_segment(self, index, pcm, start_ms, end_ms):
+        wav_bytes = pcm_to_wav(pcm)
+        self.engine.segments_submitted += 1
+        self.engine.bytes_uploaded += len(wav_bytes)
+
+        try:
+            result = await self.engine.stt_service.transcribe_audio(
+                wav_bytes, self.language, audio_format="wav", session_id=self.session_id
+            )
+        except ServiceBusyError as e:
+            # The segment was shed because the upstream API is saturated
+            self.engine.segments_shed += 1
+            result = {"text": "", "detected_language": "unknown", "busy": True, "retry_after": e.retry_after}
+        except Exception as e:
+            # Every segment must produce a result, or the ones after it would be held back forever
+            result = {"text": f"Transcription error: {str(e)}", "detected_language": "unknown"}
+
+        result.update({
+            "segment": index,
+            "start_ms": start_ms,
+            "end_ms": end_ms
+        })
+        self._results[index] = result
+        await self._release_results()
+
+    async def _release_results(self):
+        """Pass finished results to on_result in segment order, each once the ones before it are done"""
+        if self._releasing:
+            return  # The running release picks the new result up
+        self._releasing = True
+        try:
+            while self._next_result in self._results:
+                result = self._results.pop(self._next_result)
+                self._next_result += 1
+                try:
+                    follow_up = await self.on_result(result)
+                except Exception as e:
+                    print(f"WARNING: Handling the result of stream segment {result['segment']} failed: {str(e)}")
+                    continue
+                if follow_up is not None:
+                    # Runs alongside later results instead of holding them back; finish waits for it
+                    task = asyncio.create_task(self._follow_up(result["segment"], follow_up))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+        finally:
+            self._releasing = False
+
+    async def _follow_up(self, index, work):
+        try:
+            await work
+        except Exception as e:
+            print(f"WARNING: Handling the result of stream segment {index} failed: {str(e)}")
+
+    async def finish(self):
+        """Flush buffered audio at the end of the stream and wait for pending transcriptions and their follow-up work"""
+        if self._decoder is not None:
+            self._decoder.stdin.close()
+            await self._decoder_reader
+            await self._decoder.wait()
+            self._decoder = None
+            self._decoder_reader = None
+
+        if self._pending:
+            self._pending += bytes(self.frame_bytes - len(self._pending))
+            self._feed_pcm(b"")
+        if self._in_speech and self._segment:
+            self._close_segment()
+
+        # Transcriptions start follow-up work when they finish, so wait until no task is left
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def close(self):
+        """Abort the session, stopping the decoder and pending transcriptions"""
+        if self._decoder is not None:
+            if self._decoder.returncode is None:
+                self._decoder.kill()
+            self._decoder_reader.cancel()
+            self._decoder = None
+        for task in list(self._tasks):
+            task.cancel()
+
+def pcm_to_wav(pcm, sample_rate=STREAM_SAMPLE_RATE):
+    """Wrap 16-bit mono PCM in a WAV container"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(SAMPLE_WIDTH)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm)
+    return buffer.getbuffer()
+
+class StreamingSTTEngine:
+    """
+    Streaming speech-to-text engine.
+    Keeps one StreamingSession per client session and submits each
+    voice-activity segment to the STT service as soon as it closes.
+    """
+
+    def __init__(self, stt_service, vad=None):
+        self.stt_service = stt_service
+        self.vad = vad or EnergyVAD()
+        self.sessions = {}
+
+        # Counters
+        self.bytes_received = 0
+        self.bytes_uploaded = 0
+        self.silence_bytes_dropped = 0
+        self.segments_submitted = 0
+        self.segments_shed = 0
+
+    def open_session(self, session_id, on_result, language="auto", input_format="webm",
+                     input_sample_rate=STREAM_SAMPLE_RATE, input_channels=1):
+        """
+        Return the streaming session for session_id, creating it if needed.
+
+        Parameters:
+        - session_id: Client session ID
+        - on_result: Coroutine function called with each segment's transcription result, in segment order;
+          it may return an awaitable of follow-up work, which runs concurrently with later results
+        - language: Language code of the audio (or "auto")
+        - input_format: "pcm_s16le" for raw 16-bit PCM, otherwise a container ffmpeg can decode
+        - input_sample_rate, input_channels: Layout of raw PCM input
+        """
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = StreamingSession(
+                self, session_id, on_result, language, input_format,
+                input_sample_rate, input_channels
+            )
+            self.sessions[session_id] = session
+        return session
+
+    async def finish_session(self, session_id):
+        """Flush and remove a session at the end of its stream"""
+        session = self.sessions.pop(session_id, None)
+        if session is not None:
+            await session.finish()
+
+    async def close_session(self, session_id):
+        """Abort and remove a session (e.g. on disconnect)"""
+        session = self.sessions.pop(session_id, None)
+        if session is not None:
+            await session.close()
+
+    def stats(self):
+        """Return streaming transcription statistics"""
+        return {
+            "active_sessions": len(self.sessions),
+            "bytes_received": self.bytes_received,
+            "bytes_uploaded": self.bytes_uploaded,
+            "silence_bytes_dropped": self.silence_bytes_dropped,
+            "segments_submitted": self.segments_submitted,
+            "segments_shed": self.segments_shed
+        }
@@ -1,15 +1,21 @@
-import asyncio
 import os
 from dotenv import load_dotenv
-from googletrans import Translator
+from services.translation_cache import translation_cache
+from services.fallback_translation import fallback_provider
+from services.language_id import language_identifier as shared_language_identifier
 
 # Load environment variables
 load_dotenv()
 STT_TIMEOUT = int(os.getenv("STT_TIMEOUT", 7))
 
 class STTService:
-    def __init__(self):
-        self.translator = Translator()
+    def __init__(self, cache=None, provider=None, language_identifier=None):
+        # Basic translation backend (googletrans, or async HTTP with google_web; see fallback_translation)
+        self.provider = provider or fallback_provider
+        # Local language identification, so "auto" rarely needs upstream detection
+        self.language_identifier = language_identifier or shared_language_identifier
+        # Shared translation result cache (None disables caching)
+        self.cache = cache if cache is not None else translation_cache
         self.is_listening = False
         self.timeout = STT_TIMEOUT
         
@@ -56,14 +62,18 @@ class STTService:
         Returns:
         - Translated text
         """
-        # If source and target languages are the same, return the original text
+        # Identify the source language locally; it stays "auto" if identification is unsure
+        # or finds the target language, so the provider decides whether to translate
+        source_lang = self.language_identifier.resolve(text, source_lang, target_lang)
+        
+        # If the given source and target languages are the same, return the original text
         if source_lang != "auto":
             source_lang_normalized = source_lang.lower().split('-')[0]
             target_lang_normalized = target_lang.lower().split('-')[0]
             if source_lang_normalized == target_lang_normalized:
                 return text
         
-        # Map language codes to format expected by googletrans
+        # Map language codes to the format expected by the translation provider
         source_lang = source_lang.lower()
         target_lang = target_lang.lower()
         
@@ -73,26 +83,22 @@ class STTService:
         if target_lang in self.language_map:
             target_lang = self.language_map[target_lang]
         
+        # Serve repeated phrases from the cache instead of a provider round trip
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(text, source_lang, target_lang, "basic")
+            cached_translation = await self.cache.get(cache_key)
+            if cached_translation is not None:
+                return cached_translation
+        
         try:
-            # Let the translator auto-detect language if source is 'auto'
-            if source_lang == "auto":
-                # Detect the language
-                try:
-                    detected = await asyncio.to_thread(
-                        self.translator.detect, text
-                    )
-                    source_lang = detected.lang
-                except Exception:
-                    # Continue with auto if detection fails
-                    pass
-                    
-            # Translate to target language
-            translation = await asyncio.to_thread(
-                self.translator.translate,
-                text, dest=target_lang, src=source_lang if source_lang != "auto" else None
-            )
+            # One round trip detects the source language (if 'auto') and translates
+            translated_text, detected_lang = await self.provider.translate(text, source_lang, target_lang)
+            
+            if cache_key is not None and translated_text:
+                await self.cache.set(cache_key, translated_text)
             
-            return translation.text
+            return translated_text
             
         except Exception as e:
             return f"Translation error: {str(e)}"
@@ -0,0 +1,11 @@
+# Target languages written without spaces between sentences
+UNSPACED_LANGUAGES = {"zh", "zh-cn", "ja"}
+
+def join_segments(parts, language):
+    """Join sentences or their translations, without spaces for languages written without them"""
+    separator = "" if (language or "").lower() in UNSPACED_LANGUAGES else " "
+    return separator.join(part for part in parts if part)
+
+def is_error_translation(text):
+    """Return True for the error texts that translation backends return instead of a translation"""
+    return text.startswith("Translation error") or text.startswith("Error:")
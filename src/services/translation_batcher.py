@@ -0,0 +1,181 @@
+import os
+import re
+import asyncio
+from dotenv import load_dotenv
+from services.rate_limiter import ServiceBusyError
+
+# Load environment variables
+load_dotenv()
+TRANSLATION_BATCH_ENABLED = os.getenv("TRANSLATION_BATCH_ENABLED", "true").lower() == "true"
+TRANSLATION_BATCH_WINDOW_MS = float(os.getenv("TRANSLATION_BATCH_WINDOW_MS", 20))  # How long a batch collects requests while the language pair is busy
+TRANSLATION_BATCH_MAX_ITEMS = int(os.getenv("TRANSLATION_BATCH_MAX_ITEMS", 8))
+TRANSLATION_BATCH_MAX_WORDS = int(os.getenv("TRANSLATION_BATCH_MAX_WORDS", 8))  # Longer texts are sent on their own
+
+# One numbered output line of a batch translation, e.g. "[2] Guten Morgen"
+BATCH_LINE_PATTERN = re.compile(r"^\s*\[(\d+)\]\s*(.*?)\s*$", re.MULTILINE)
+
+class TranslationBatcher:
+    """
+    Micro-batching scheduler for short translations.
+    A short text for a language pair with no request in flight is sent right
+    away. While a request is in flight, further short texts with the same
+    language pair are collected for a small window and sent as one numbered
+    chat-completion request, and the numbered outputs are split back to the
+    waiting callers. If the output cannot be matched to the inputs, every text
+    is translated with its own request instead.
+    """
+
+    def __init__(self, service, window_ms=TRANSLATION_BATCH_WINDOW_MS, max_items=TRANSLATION_BATCH_MAX_ITEMS,
+                 max_words=TRANSLATION_BATCH_MAX_WORDS, enabled=TRANSLATION_BATCH_ENABLED):
+        """
+        Parameters:
+        - service: The GroqTranslationService sending the requests
+        - window_ms: Time a batch waits for more requests after its first one, if the language pair is busy
+        - max_items: Batch size that is sent without waiting for the window to end
+        - max_words: Only texts with at most this many words are batched
+        - enabled: False sends every text on its own
+        """
+        self.service = service
+        self.window = window_ms / 1000
+        self.max_items = max_items
+        self.max_words = max_words
+        self.enabled = enabled and max_items > 1
+
+        # (source_lang, target_lang) -> list of (text, future) waiting for the next batch
+        self._groups = {}
+        self._timers = {}
+        self._tasks = set()
+        # (source_lang, target_lang) -> number of requests in flight
+        self._in_flight = {}
+
+        # Counters
+        self.items = 0
+        self.batches = 0
+        self.batched_items = 0
+        self.fallbacks = 0
+        self.immediate = 0
+
+    def accepts(self, text):
+        """Check if a text is short enough to be batched"""
+        return self.enabled and "\n" not in text and len(text.split()) <= self.max_words
+
+    async def translate(self, text, source_lang, target_lang):
+        """
+        Translate a short plain (non-Quranic) text as part of the next batch.
+
+        Returns:
+        - Tuple of (translated text or error message, success flag)
+
+        Raises:
+        - ServiceBusyError if the request was shed because the API is rate limited
+        """
+        self.items += 1
+        key = (source_lang, target_lang)
+        future = asyncio.get_running_loop().create_future()
+        group = self._groups.setdefault(key, [])
+        group.append((text, future))
+
+        if len(group) >= self.max_items:
+            self._flush(key)
+        elif not self._in_flight.get(key):
+            # Nothing to batch with: waiting would only add latency
+            self.immediate += 1
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = asyncio.get_running_loop().call_later(self.window, self._flush, key)
+
+        return await future
+
+    def _flush(self, key):
+        """Send the collected requests of a language pair"""
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        # Skip callers that went away while waiting
+        items = [(text, future) for text, future in self._groups.pop(key, []) if not future.done()]
+        if not items:
+            return
+        # Counted before the task starts, so texts arriving in the same tick are collected
+        self._in_flight[key] = self._in_flight.get(key, 0) + 1
+        task = asyncio.create_task(self._run_batch(key, items))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, key, items):
+        source_lang, target_lang = key
+        texts = [text for text, future in items]
+        try:
+            if len(texts) == 1:
+                results = [await self._translate_single(texts[0], source_lang, target_lang)]
+            else:
+                results = await self._translate_batch(texts, source_lang, target_lang)
+        except ServiceBusyError as e:
+            # Shed load reaches every waiting caller
+            for text, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        except Exception as e:
+            results = [(f"Translation error: {str(e)}", False)] * len(items)
+        finally:
+            self._in_flight[key] -= 1
+            if not self._in_flight[key]:
+                del self._in_flight[key]
+
+        for (text, future), result in zip(items, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _translate_single(self, text, source_lang, target_lang):
+        system_prompt, user_prompt = self.service.build_prompts(text, source_lang, target_lang, False, [])
+        return await self.service._request_translation(system_prompt, user_prompt, [])
+
+    async def _translate_batch(self, texts, source_lang, target_lang):
+        self.batches += 1
+        self.batched_items += len(texts)
+
+        system_prompt, user_prompt = self.service.build_batch_prompts(texts, source_lang, target_lang)
+        content, success = await self.service._request_translation(system_prompt, user_prompt, [])
+        if not success:
+            # The API call itself failed, retrying each text separately would fail as well
+            return [(content, False)] * len(texts)
+
+        translations = self.parse_batch_translation(content, len(texts))
+        if translations is None:
+            # Fall back to one request per text
+            self.fallbacks += 1
+            return await asyncio.gather(*(
+                self._translate_single(text, source_lang, target_lang) for text in texts
+            ))
+        return [(self.service.clean_translation(translation), True) for translation in translations]
+
+    @staticmethod
+    def parse_batch_translation(content, count):
+        """
+        Split a numbered batch translation into its parts.
+
+        Returns:
+        - List of count translations in input order, or None if the output does
+          not contain exactly one non-empty line for every number
+        """
+        translations = {}
+        for match in BATCH_LINE_PATTERN.finditer(content):
+            index = int(match.group(1))
+            if index in translations or not 1 <= index <= count or not match.group(2):
+                return None
+            translations[index] = match.group(2)
+        if len(translations) != count:
+            return None
+        return [translations[index] for index in range(1, count + 1)]
+
+    def stats(self):
+        """Return batching statistics"""
+        return {
+            "enabled": self.enabled,
+            "items": self.items,
+            "batches": self.batches,
+            "batched_items": self.batched_items,
+            "fallbacks": self.fallbacks,
+            "immediate": self.immediate,
+            "waiting": sum(len(group) for group in self._groups.values())
+        }
@@ -0,0 +1,231 @@
+import os
+import sys
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from dotenv import load_dotenv
+from services.state_backend import STATE_BACKEND, state_backend
+
+# Load environment variables
+load_dotenv()
+TRANSLATION_CACHE_ENABLED = os.getenv("TRANSLATION_CACHE_ENABLED", "true").lower() == "true"
+TRANSLATION_CACHE_MAX_ENTRIES = int(os.getenv("TRANSLATION_CACHE_MAX_ENTRIES", 5000))
+TRANSLATION_CACHE_MAX_BYTES = int(os.getenv("TRANSLATION_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+TRANSLATION_CACHE_TTL = float(os.getenv("TRANSLATION_CACHE_TTL", 3600))
+TRANSLATION_CACHE_DB = os.getenv("TRANSLATION_CACHE_DB", "")  # Empty disables the on-disk tier
+TRANSLATION_CACHE_DISK_TTL = float(os.getenv("TRANSLATION_CACHE_DISK_TTL", 7 * 24 * 3600))
+# Share cached translations between workers through the state backend (only useful with Redis)
+TRANSLATION_CACHE_SHARED = os.getenv("TRANSLATION_CACHE_SHARED", str(STATE_BACKEND == "redis")).lower() == "true"
+
+class TranslationCache:
+    """
+    Bounded in-process cache for translation results with LRU + TTL eviction,
+    an optional shared tier in the state backend (for several workers) and an
+    optional SQLite tier that survives restarts.
+    """
+
+    def __init__(self, max_entries=TRANSLATION_CACHE_MAX_ENTRIES, max_bytes=TRANSLATION_CACHE_MAX_BYTES,
+                 ttl=TRANSLATION_CACHE_TTL, db_path=TRANSLATION_CACHE_DB, disk_ttl=TRANSLATION_CACHE_DISK_TTL,
+                 shared_backend=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk_ttl = disk_ttl
+        self.shared_backend = shared_backend
+
+        # key -> (value, expires_at, size_in_bytes), ordered from least to most recently used
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.shared_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        # Optional on-disk tier
+        self._db = None
+        self._db_lock = threading.Lock()
+        if db_path:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path):
+        """Open (and create if needed) the SQLite database backing the disk tier"""
+        try:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            print(f"WARNING: Could not open translation cache database '{db_path}': {e}")
+            self._db = None
+
+    @staticmethod
+    def normalize_text(text):
+        """Normalize text so trivially different inputs share a cache entry"""
+        text = unicodedata.normalize("NFKC", text)
+        return " ".join(text.split()).casefold()
+
+    @classmethod
+    def make_key(cls, text, source_lang, target_lang, variant="plain", context=""):
+        """
+        Build the cache key for a translation.
+
+        Parameters:
+        - text: The text to translate
+        - source_lang: Source language code (or "auto")
+        - target_lang: Target language code
+        - variant: Prompt variant, e.g. "quranic", "plain" or "basic"
+        - context: Session context the translation was made with; translations made
+                   with different contexts never share an entry
+        """
+        if context:
+            variant = f"{variant}:{hashlib.sha1(context.encode('utf-8')).hexdigest()}"
+        return "\x1f".join((
+            variant,
+            (source_lang or "auto").lower(),
+            (target_lang or "").lower(),
+            cls.normalize_text(text)
+        ))
+
+    async def get(self, key):
+        """Return the cached translation for key, or None on a miss"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at, size = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            # Entry is stale, drop it
+            self._remove(key)
+            self.expirations += 1
+
+        if self.shared_backend is not None:
+            try:
+                value = await self.shared_backend.get(self._shared_key(key))
+            except Exception as e:
+                # A shared backend outage only costs cache hits
+                print(f"WARNING: Shared translation cache lookup failed: {e}")
+                value = None
+            if value is not None:
+                self.hits += 1
+                self.shared_hits += 1
+                self._store(key, value)
+                return value
+
+        if self._db is not None:
+            value = await asyncio.to_thread(self._db_get, key)
+            if value is not None:
+                self.hits += 1
+                self.disk_hits += 1
+                self._store(key, value)
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key, value):
+        """Store a translation in the cache"""
+        if not value:
+            return
+        self._store(key, value)
+        if self.shared_backend is not None:
+            try:
+                await self.shared_backend.set(self._shared_key(key), value, ttl=self.ttl)
+            except Exception as e:
+                print(f"WARNING: Shared translation cache update failed: {e}")
+        if self._db is not None:
+            await asyncio.to_thread(self._db_set, key, value)
+
+    @staticmethod
+    def _shared_key(key):
+        # Keep shared backend keys short regardless of the text length
+        return "translation:" + hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def _store(self, key, value):
+        """Insert into the memory tier and evict until within the configured bounds"""
+        if key in self._entries:
+            self._remove(key)
+
+        size = sys.getsizeof(key) + sys.getsizeof(value)
+        if size > self.max_bytes:
+            return
+
+        self._entries[key] = (value, time.monotonic() + self.ttl, size)
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def _remove(self, key):
+        value, expires_at, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _db_get(self, key):
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM translations WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= time.time():
+                self._db.execute("DELETE FROM translations WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            return row[0]
+
+    def _db_set(self, key, value):
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO translations (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + self.disk_ttl)
+            )
+            self._db.commit()
+
+    def clear(self):
+        """Drop all entries from the memory tier"""
+        self._entries.clear()
+        self._bytes = 0
+
+    def close(self):
+        """Close the on-disk tier"""
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+            self._db = None
+
+    def stats(self):
+        """Return cache statistics"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "disk_tier": self._db is not None,
+            "shared_tier": self.shared_backend is not None
+        }
+
+# Shared cache instance used by all translation services (None when disabled)
+translation_cache = TranslationCache(
+    shared_backend=state_backend if TRANSLATION_CACHE_SHARED else None
+) if TRANSLATION_CACHE_ENABLED else None
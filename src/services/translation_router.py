@@ -0,0 +1,335 @@
+import os
+import time
+import asyncio
+from collections import deque
+from dotenv import load_dotenv
+from services.rate_limiter import ServiceBusyError
+from services.metrics import metrics, language_label, stage_duration
+from services.text_utils import is_error_translation
+
+# Load environment variables
+load_dotenv()
+ROUTER_WINDOW = int(os.getenv("ROUTER_WINDOW", 50))  # Recent requests per backend used for latency and error rates
+ROUTER_HEDGE_PERCENTILE = float(os.getenv("ROUTER_HEDGE_PERCENTILE", 0.95))  # Latency percentile after which a hedged request is sent
+ROUTER_HEDGE_DEFAULT_MS = float(os.getenv("ROUTER_HEDGE_DEFAULT_MS", 1500))  # Hedge delay while a backend has too few samples
+ROUTER_HEDGE_MIN_MS = float(os.getenv("ROUTER_HEDGE_MIN_MS", 150))
+ROUTER_HEDGE_MAX_MS = float(os.getenv("ROUTER_HEDGE_MAX_MS", 3000))
+ROUTER_MIN_SAMPLES = int(os.getenv("ROUTER_MIN_SAMPLES", 10))  # Samples needed before percentiles are trusted
+ROUTER_ERROR_THRESHOLD = float(os.getenv("ROUTER_ERROR_THRESHOLD", 0.5))  # Error rate that opens the circuit
+ROUTER_MAX_CONSECUTIVE_FAILURES = int(os.getenv("ROUTER_MAX_CONSECUTIVE_FAILURES", 5))  # Failures in a row that open the circuit
+ROUTER_OPEN_SECONDS = float(os.getenv("ROUTER_OPEN_SECONDS", 30))  # Seconds an open circuit waits before a probe request
+
+router_events = metrics.counter(
+    "translation_router_events_total",
+    "Translation router events by backend (request, error, hedge, hedge_won, failover, circuit_open, slo_missed)",
+    ("backend", "event")
+)
+
+class TranslationError(Exception):
+    """Raised when every translation backend tried failed"""
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+class TranslationBackend:
+    """
+    A translation backend with rolling latency and error statistics and a
+    circuit breaker. The circuit opens when the recent error rate or the run
+    of consecutive failures gets too high; after ROUTER_OPEN_SECONDS one probe
+    request is let through, and its outcome closes or reopens the circuit.
+    """
+
+    def __init__(self, name, translate, translate_stream=None, window=ROUTER_WINDOW):
+        """
+        Parameters:
+        - name: Backend name, reported with every result
+        - translate: Coroutine function translate(text, source_lang, target_lang, session_id) returning the translation
+        - translate_stream: Optional coroutine function translate_stream(text, source_lang, target_lang,
+          session_id, on_delta) streaming the translation
+        """
+        self.name = name
+        self.translate = translate
+        self.translate_stream = translate_stream
+        # Latencies of successful requests and outcomes of all requests, most recent last
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_failures = 0
+
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+
+        # Counters
+        self.requests = 0
+        self.errors = 0
+        self.hedges = 0
+        self.hedges_won = 0
+        self.circuit_opened = 0
+
+    def available(self):
+        """Check whether the circuit lets a request through (without claiming a probe)"""
+        if self.state == "closed":
+            return True
+        if self.probe_in_flight:
+            return False
+        return time.monotonic() - self.opened_at >= ROUTER_OPEN_SECONDS
+
+    def start_request(self):
+        """Count a request; an open circuit past its wait sends it as the probe"""
+        self.requests += 1
+        router_events.inc(self.name, "request")
+        if self.state == "open" and self.available():
+            self.state = "half_open"
+            self.probe_in_flight = True
+
+    def record(self, latency, success):
+        """Record the outcome of a finished (not cancelled) request"""
+        self.outcomes.append(success)
+        if success:
+            self.latencies.append(latency)
+            self.consecutive_failures = 0
+            if self.state != "closed":
+                # The probe succeeded: close the circuit with a clean slate
+                self.state = "closed"
+                self.outcomes.clear()
+                self.outcomes.append(True)
+        else:
+            self.errors += 1
+            self.consecutive_failures += 1
+            router_events.inc(self.name, "error")
+            if self.state == "half_open" or self.should_open():
+                self.open()
+        self.probe_in_flight = False
+
+    def cancelled(self):
+        """A request was cancelled (its hedge won); a pending probe is released"""
+        self.probe_in_flight = False
+        if self.state == "half_open":
+            self.state = "open"
+
+    def should_open(self):
+        if self.state != "closed":
+            return False
+        if self.consecutive_failures >= ROUTER_MAX_CONSECUTIVE_FAILURES:
+            return True
+        return len(self.outcomes) >= ROUTER_MIN_SAMPLES and self.error_rate() >= ROUTER_ERROR_THRESHOLD
+
+    def open(self):
+        if self.state != "open":
+            self.circuit_opened += 1
+            router_events.inc(self.name, "circuit_open")
+            print(f"WARNING: Translation backend {self.name} is failing, routing around it for {ROUTER_OPEN_SECONDS:g}s")
+        self.state = "open"
+        self.opened_at = time.monotonic()
+
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return 1 - sum(self.outcomes) / len(self.outcomes)
+
+    def latency_ms(self, fraction):
+        """Latency percentile of recent successful requests in ms, or None without enough samples"""
+        if len(self.latencies) < ROUTER_MIN_SAMPLES:
+            return None
+        return percentile(sorted(self.latencies), fraction) * 1000
+
+    def stats(self):
+        p50 = self.latency_ms(0.5)
+        p95 = self.latency_ms(0.95)
+        return {
+            "state": self.state,
+            "requests": self.requests,
+            "errors": self.errors,
+            "error_rate": round(self.error_rate(), 3),
+            "p50_ms": round(p50, 1) if p50 is not None else None,
+            "p95_ms": round(p95, 1) if p95 is not None else None,
+            "hedges": self.hedges,
+            "hedges_won": self.hedges_won,
+            "circuit_opened": self.circuit_opened
+        }
+
+class TranslationRouter:
+    """
+    Routes each translation to the best backend. The preferred backend is
+    Groq for phrases and the basic provider for single words; a backend with
+    an open circuit is skipped, and a per-message latency SLO that the
+    preferred backend usually misses sends the request to a faster one.
+    If the first backend has not answered by its latency percentile (capped
+    by the SLO), a hedged request goes to the next one and the first good
+    answer wins; a failure fails over immediately.
+    """
+
+    def __init__(self, backends, phrase_backend=None):
+        """
+        Parameters:
+        - backends: TranslationBackends in order of preference for single words
+        - phrase_backend: Name of the backend preferred for phrases (more than two words)
+        """
+        self.backends = list(backends)
+        self.phrase_backend = phrase_backend
+
+    def backend(self, name):
+        for backend in self.backends:
+            if backend.name == name:
+                return backend
+        return None
+
+    def plan(self, text, slo_ms=None, preferred=None):
+        """Return the backends to try, in order"""
+        preferred = self.backend(preferred) if preferred else None
+        if preferred is None and self.phrase_backend and len(text.split()) > 2:
+            preferred = self.backend(self.phrase_backend)
+        order = [preferred] if preferred else []
+        order += [backend for backend in self.backends if backend is not preferred]
+
+        # Skip failing backends; with every circuit open, the preferred one is tried anyway
+        candidates = [backend for backend in order if backend.available()] or order[:1]
+
+        # Latency-aware choice: skip a backend that typically misses the SLO for one that usually meets it
+        if slo_ms and len(candidates) > 1:
+            typical = candidates[0].latency_ms(0.5)
+            alternative = candidates[1].latency_ms(0.95)
+            if typical is not None and alternative is not None and typical > slo_ms > alternative:
+                candidates[0], candidates[1] = candidates[1], candidates[0]
+        return candidates
+
+    @staticmethod
+    def hedge_delay(backend, slo_ms=None):
+        """Seconds to wait for a backend before sending a hedged request"""
+        delay_ms = backend.latency_ms(ROUTER_HEDGE_PERCENTILE)
+        if delay_ms is None:
+            delay_ms = ROUTER_HEDGE_DEFAULT_MS
+        if slo_ms:
+            # Leave the hedge half of the latency budget
+            delay_ms = min(delay_ms, slo_ms / 2)
+        return max(ROUTER_HEDGE_MIN_MS, min(ROUTER_HEDGE_MAX_MS, delay_ms)) / 1000
+
+    async def _call(self, backend, text, source_lang, target_lang, session_id, on_delta=None):
+        """
+        Run one backend request and record its outcome.
+
+        Returns:
+        - Tuple of (translation or error text, ServiceBusyError or None)
+        """
+        backend.start_request()
+        streaming = on_delta is not None and backend.translate_stream is not None
+        start = time.perf_counter()
+        busy = None
+        try:
+            if streaming:
+                translated_text = await backend.translate_stream(text, source_lang, target_lang, session_id, on_delta)
+            else:
+                translated_text = await backend.translate(text, source_lang, target_lang, session_id)
+        except asyncio.CancelledError:
+            backend.cancelled()
+            raise
+        except ServiceBusyError as e:
+            translated_text, busy = f"Translation error: {str(e)}", e
+        except Exception as e:
+            translated_text = f"Translation error: {str(e)}"
+
+        elapsed = time.perf_counter() - start
+        success = busy is None and not is_error_translation(translated_text)
+        backend.record(elapsed, success)
+        if metrics.enabled and success:
+            provider = f"{backend.name}_stream" if streaming else backend.name
+            stage_duration.observe(elapsed, "translate", provider, language_label(target_lang))
+        return translated_text, busy
+
+    async def translate(self, text, source_lang, target_lang, session_id=None, on_delta=None, slo_ms=None,
+                        preferred=None):
+        """
+        Translate text with the best available backend.
+
+        Parameters:
+        - on_delta: Optional coroutine function receiving the translation piece by piece
+        - slo_ms: Optional latency target of the message in ms
+        - preferred: Optional name of the backend to try first
+
+        Returns:
+        - Tuple of (translation, name of the backend that served it)
+
+        Raises:
+        - ServiceBusyError if every backend tried was shed as busy
+        - TranslationError if every backend tried failed, with the first real error
+        """
+        candidates = self.plan(text, slo_ms, preferred)
+        start = time.monotonic()
+        hedge_at = start + self.hedge_delay(candidates[0], slo_ms)
+        pending = {}
+        hedged = set()
+        failures = []
+        committed = False  # A backend has started streaming, so the others can no longer win
+
+        def launch(backend, stream):
+            on_backend_delta = None
+            if stream and on_delta is not None:
+                async def on_backend_delta(delta):
+                    nonlocal committed
+                    if not committed:
+                        committed = True
+                        # Deltas already reached the client: drop the competing requests
+                        for task in pending:
+                            if pending[task] is not backend:
+                                task.cancel()
+                    await on_delta(delta)
+            task = asyncio.create_task(self._call(backend, text, source_lang, target_lang, session_id, on_backend_delta))
+            pending[task] = backend
+            return task
+
+        next_index = 1
+        launch(candidates[0], stream=True)
+        try:
+            while pending:
+                timeout = None
+                if next_index < len(candidates) and not committed:
+                    timeout = max(0.0, hedge_at - time.monotonic())
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # The first backend is slower than usual: hedge with the next one
+                    hedge = candidates[next_index]
+                    next_index += 1
+                    hedge.hedges += 1
+                    hedged.add(hedge)
+                    router_events.inc(hedge.name, "hedge")
+                    launch(hedge, stream=False)
+                    continue
+
+                for task in done:
+                    backend = pending.pop(task)
+                    if task.cancelled():
+                        continue
+                    translated_text, busy = task.result()
+                    if busy is None and not is_error_translation(translated_text):
+                        if backend in hedged:
+                            backend.hedges_won += 1
+                            router_events.inc(backend.name, "hedge_won")
+                        if on_delta is not None and not committed and backend is not candidates[0]:
+                            # A hedge is not streamed: the client gets its translation in one piece
+                            await on_delta(translated_text)
+                        if slo_ms and (time.monotonic() - start) * 1000 > slo_ms:
+                            router_events.inc(backend.name, "slo_missed")
+                        return translated_text, backend.name
+                    failures.append((backend, translated_text, busy))
+
+                # Fail over at once when everything started so far has failed
+                if not pending and next_index < len(candidates):
+                    router_events.inc(candidates[next_index].name, "failover")
+                    launch(candidates[next_index], stream=False)
+                    next_index += 1
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if all(busy is not None for _, _, busy in failures):
+            raise failures[0][2]
+        # The error text is never returned as a translation, so it cannot be cached, remembered or shown as one
+        _, error_text, _ = next((failure for failure in failures if failure[2] is None))
+        raise TranslationError(error_text)
+
+    def stats(self):
+        return {backend.name: backend.stats() for backend in self.backends}
@@ -2,11 +2,20 @@ import os
 import aiohttp
 import base64
 import json
+import hashlib
 from dotenv import load_dotenv
+from services.http_client import http_pool
+from services.request_coalescer import RequestCoalescer
+from services.session_store import session_store as shared_session_store
+from services.rate_limiter import ServiceBusyError, rate_limiter as shared_rate_limiter
+from services.metrics import metrics, language_label, stage_duration
+from services.audio_preprocessor import audio_preprocessor as shared_audio_preprocessor
 
 # Load environment variables
 load_dotenv()
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
+GROQ_API_BASE_URL = os.getenv("GROQ_API_BASE_URL", "https://api.groq.com/openai/v1")  # Point at a local stand-in for benchmarks
+WHISPER_PROMPT_MAX_WORDS = int(os.getenv("WHISPER_PROMPT_MAX_WORDS", 10))  # Rolling prompt window per session
 
 # Language code mapping for Whisper API
 LANGUAGE_CODES = {
@@ -29,26 +38,48 @@ class WhisperSTTService:
     for enhanced accuracy and multilingual support with optimizations for live transcription.
     """
     
-    def __init__(self):
+    def __init__(self, http_client=None, session_store=None, rate_limiter=None, audio_preprocessor=None):
+        # Shared connection pool for all Groq requests
+        self.http_client = http_client or http_pool
+        # Transcodes uploads to compact mono 16 kHz Opus in a process pool
+        self.audio_preprocessor = audio_preprocessor or shared_audio_preprocessor
+        # Shared limiter keeping all Groq requests within the API's rate limits
+        self.rate_limiter = rate_limiter or shared_rate_limiter
+        # Coalesces identical in-flight transcription requests
+        self.coalescer = RequestCoalescer()
         self.api_key = GROQ_API_KEY
-        self.api_url = "https://api.groq.com/openai/v1/audio/transcriptions"
-        self.last_transcription = ""
+        self.api_url = f"{GROQ_API_BASE_URL.rstrip('/')}/audio/transcriptions"
+        # Each session's recent transcription (used as its Whisper prompt) lives in the
+        # shared session store, so concurrent clients never see each other's context
+        self.session_store = session_store or shared_session_store
+        self.prompt_max_words = WHISPER_PROMPT_MAX_WORDS
         self.confidence_threshold = 0.6  # Minimum confidence score to accept transcription
         
         if not self.api_key:
             print("WARNING: GROQ_API_KEY not found in environment variables. Whisper service will not work correctly.")
     
-    async def transcribe_audio(self, audio_data_base64, language=None):
+    async def transcribe_audio(self, audio_data, language=None, audio_format="webm", session_id=None, preprocess=True,
+                               background=False):
         """
         Transcribe audio using Groq's whisper-large-v3-turbo model
         
         Parameters:
-        - audio_data_base64: Base64 encoded audio data
+        - audio_data: Raw audio bytes (bytes, bytearray or memoryview), which are
+                      uploaded without copying, or base64 encoded audio data (str)
         - language: Optional language code to specify the spoken language
                    If not provided, Whisper will detect the language automatically
+        - audio_format: Container format of the audio, e.g. "webm" or "wav"
+        - session_id: Optional client session ID; its recent transcription is sent
+                      as the Whisper prompt and updated with the result
+        - preprocess: Whether to normalize the clip first (False for audio that already was,
+                      e.g. segments of a split recording)
+        - background: Whether this is bulk work (batch jobs) that yields to live requests
         
         Returns:
         - Dictionary with transcription text and detected language
+        
+        Raises:
+        - ServiceBusyError if the request was shed because the API is rate limited
         """
         # Check if API key is configured
         if not self.api_key:
@@ -69,84 +100,150 @@ class WhisperSTTService:
                 whisper_language = language
         
         try:
-            # Decode the base64 audio data
-            audio_bytes = base64.b64decode(audio_data_base64)
-            
-            headers = {
-                "Authorization": f"Bearer {self.api_key}"
+            # Raw audio is used as-is; only legacy base64 payloads need decoding
+            if isinstance(audio_data, (bytes, bytearray, memoryview)):
+                audio_bytes = audio_data
+            else:
+                with metrics.timer(stage_duration, "decode", "base64", language_label(language)):
+                    audio_bytes = base64.b64decode(audio_data)
+        except Exception as e:
+            return {
+                "text": f"Transcription error: {str(e)}", 
+                "detected_language": "unknown"
             }
-            
-            # Prepare form data with the audio file
-            form_data = aiohttp.FormData()
-            form_data.add_field(
-                name='file',
-                value=audio_bytes,
-                content_type='audio/webm',
-                filename='audio.webm'
+        
+        # Context from the session's previous transcriptions
+        prompt = await self.session_store.get_transcript_context(session_id) if session_id else ""
+        
+        # Identical audio with the same prompt already being transcribed shares one upstream call
+        request_key = (hashlib.sha1(audio_bytes).hexdigest(), whisper_language, language, audio_format, prompt, background)
+        with metrics.timer(stage_duration, "stt", "whisper", language_label(language)):
+            result = await self.coalescer.run(
+                request_key,
+                lambda: self._request_transcription(
+                    audio_bytes, language, whisper_language, audio_format, prompt, session_id, preprocess, background
+                )
             )
-            form_data.add_field('model', 'whisper-large-v3-turbo')
-            
-            # Only specify language if we're certain about it
-            if language != "auto" and whisper_language:
-                form_data.add_field('language', whisper_language)
-            
-            # Add parameters optimized for real-time transcription
-            form_data.add_field('response_format', 'json')
-            form_data.add_field('temperature', '0.0')
-            # Enable faster processing for real-time transcription
-            form_data.add_field('prompt', self.last_transcription) # Context from previous transcription
-            
-            # Send the request to the Groq API
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.api_url,
-                    headers=headers,
-                    data=form_data,
-                    timeout=10  # Reduced timeout for faster response
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        transcribed_text = result.get('text', '').strip()
-                        detected_lang = result.get('language', language or 'unknown')
-                        
-                        # Update the last transcription for context in future requests
-                        # Only store the last few words to provide context without biasing new transcriptions
-                        if transcribed_text:
-                            words = transcribed_text.split()
-                            self.last_transcription = " ".join(words[-10:]) if len(words) > 10 else transcribed_text
-                        
-                        return {
-                            "text": transcribed_text,
-                            "detected_language": detected_lang
-                        }
-                    else:
-                        error_text = await response.text()
-                        error_details = "Unknown error"
-                        try:
-                            error_json = json.loads(error_text)
-                            error_details = error_json.get('error', {}).get('message', error_text[:100])
-                        except:
-                            error_details = error_text[:100]
-                        
-                        return {
-                            "text": f"API Error: {response.status} - {error_details}",
-                            "detected_language": "unknown"
-                        }
-                        
+        
+        if session_id and result.get("success"):
+            await self._update_prompt(session_id, prompt, result["text"])
+        
+        # Give every caller its own copy of the shared result
+        result = dict(result)
+        result.pop("success", None)
+        return result
+    
+    async def _update_prompt(self, session_id, prompt, transcribed_text):
+        """
+        Append a transcription to the session's prompt context, keeping only the
+        last prompt_max_words words so the context stays small and does not bias
+        new transcriptions too much
+        """
+        words = (prompt + " " + transcribed_text).split()
+        await self.session_store.set_transcript_context(
+            session_id, " ".join(words[-self.prompt_max_words:])
+        )
+    
+    async def _request_transcription(self, audio_bytes, language, whisper_language, audio_format, prompt="", session_id=None,
+                                     preprocess=True, background=False):
+        """
+        Send one transcription request to Groq's Whisper endpoint (through the shared rate limiter)
+        
+        Returns:
+        - Dictionary with transcription text, detected language and whether the request succeeded
+        """
+        # Normalize the clip before it holds a rate limiter slot (shared by coalesced callers)
+        if preprocess:
+            audio_bytes, audio_format = await self.audio_preprocessor.process(audio_bytes, audio_format, language)
+        if not audio_bytes:
+            # Only silence: Whisper tends to invent text for it, so skip the upload
+            return {
+                "text": "",
+                "detected_language": language if language and language != "auto" else "unknown"
+            }
+        
+        try:
+            return await self.rate_limiter.run(
+                "audio", session_id,
+                lambda: self._send_transcription_request(audio_bytes, language, whisper_language, audio_format, prompt),
+                background=background
+            )
+        except ServiceBusyError:
+            raise
         except Exception as e:
             return {
                 "text": f"Transcription error: {str(e)}", 
                 "detected_language": "unknown"
             }
     
-    async def transcribe_live_audio(self, audio_chunks, language=None):
+    async def _send_transcription_request(self, audio_bytes, language, whisper_language, audio_format, prompt):
+        # The form is built per attempt because aiohttp consumes it when sending
+        headers = {
+            "Authorization": f"Bearer {self.api_key}"
+        }
+        
+        # Prepare form data with the audio file
+        form_data = aiohttp.FormData()
+        form_data.add_field(
+            name='file',
+            value=audio_bytes,
+            content_type=f'audio/{audio_format}',
+            filename=f'audio.{audio_format}'
+        )
+        form_data.add_field('model', 'whisper-large-v3-turbo')
+        
+        # Only specify language if we're certain about it
+        if language != "auto" and whisper_language:
+            form_data.add_field('language', whisper_language)
+        
+        # Add parameters optimized for real-time transcription
+        form_data.add_field('response_format', 'json')
+        form_data.add_field('temperature', '0.0')
+        if prompt:
+            form_data.add_field('prompt', prompt) # Context from the session's previous transcriptions
+        
+        # Send the request to the Groq API over the shared connection pool
+        session = await self.http_client.get_session()
+        async with session.post(
+            self.api_url,
+            headers=headers,
+            data=form_data,
+            timeout=self.http_client.timeout(total=10)  # Reduced timeout for faster response
+        ) as response:
+            self.rate_limiter.check_response("audio", response)
+            if response.status == 200:
+                result = await response.json()
+                transcribed_text = result.get('text', '').strip()
+                detected_lang = result.get('language', language or 'unknown')
+                
+                return {
+                    "text": transcribed_text,
+                    "detected_language": detected_lang,
+                    "success": bool(transcribed_text)
+                }
+            else:
+                error_text = await response.text()
+                error_details = "Unknown error"
+                try:
+                    error_json = json.loads(error_text)
+                    error_details = error_json.get('error', {}).get('message', error_text[:100])
+                except:
+                    error_details = error_text[:100]
+                
+                return {
+                    "text": f"API Error: {response.status} - {error_details}",
+                    "detected_language": "unknown"
+                }
+    
+    async def transcribe_live_audio(self, audio_chunks, language=None, session_id=None):
         """
         Process a stream of audio chunks for real-time transcription
         Optimized for low-latency processing
         """
-        # Convert the audio chunks to a single blob
-        combined_audio = b''.join(audio_chunks)
-        base64_audio = base64.b64encode(combined_audio).decode('utf-8')
+        # Combine the audio chunks into a single buffer and upload it without a base64 round trip
+        combined_audio = bytearray()
+        for chunk in audio_chunks:
+            combined_audio += chunk
         
-        result = await self.transcribe_audio(base64_audio, language)
+        result = await self.transcribe_audio(combined_audio, language, session_id=session_id)
         return result
\ No newline at end of file
@@ -69,6 +69,7 @@ document.addEventListener("DOMContentLoaded", function () {
     audioContext: null, // For audio analysis if needed
     errorRecoveryMode: false, // Flag for handling recovery from errors
     lastError: null, // Last error encountered
+    streamingTranslation: "", // Translation text received so far while it is streamed
   };
 
   // Resources
@@ -741,9 +742,25 @@ document.addEventListener("DOMContentLoaded", function () {
       const data = JSON.parse(event.data);
       debugLog("Received WebSocket message:", data);
 
-      if (data.type === "translation_only") {
+      if (data.type === "translation_delta") {
+        // Show a streamed translation word by word while it is generated
+        if (!data.is_incremental) {
+          state.streamingTranslation += data.delta;
+          translatedTextElement.className = "text-content lang-de processing";
+          translatedTextElement.textContent = state.streamingTranslation;
+        }
+      } else if (data.type === "translation_only") {
         // Handle just the translation part
+        if (state.streamingTranslation && !data.is_incremental) {
+          // Replace the streamed preview with the final, cleaned translation
+          state.streamingTranslation = "";
+          translatedTextElement.textContent = "";
+        }
         updateTranslation(data.translated_text, data.is_incremental);
+      } else if (data.type === "busy") {
+        // The server shed this request under load; later speech is processed normally
+        const retryHint = data.retry_after ? ` Retrying is possible in about ${Math.ceil(data.retry_after)} s.` : "";
+        showTemporaryMessage(`Server is busy.${retryHint}`, "info", true);
       } else if (data.type === "error") {
         showTemporaryMessage(`Error: ${data.message}`, "error");
       }
@@ -1414,7 +1431,8 @@ document.addEventListener("DOMContentLoaded", function () {
             text: text,
             source_language: supportedLanguages[state.currentLanguageIndex].shortCode,
             target_language: "de", // Always German
-            is_incremental: isIncremental
+            is_incremental: isIncremental,
+            stream: !isIncremental // Stream final translations token by token
           })
         );
       } else {
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Import the services the way main.py does, with src on the import path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
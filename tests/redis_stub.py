@@ -0,0 +1,128 @@
+import asyncio
+import time
+
+class RedisStub:
+    """
+    Minimal in-process Redis-compatible server for tests: speaks RESP and
+    implements the commands RedisStateBackend uses. Commands named in
+    fail_commands get an error reply; commands named in slow_commands are
+    answered after a delay; commands named in drop_commands are applied, but
+    the connection is closed instead of replying (only the first time if
+    drop_once is set).
+    """
+
+    def __init__(self, password=None):
+        self.password = password
+        self.data = {}
+        self.expires = {}
+        self.received = []
+        self.connections = 0
+        self.fail_commands = set()
+        self.slow_commands = {}
+        self.drop_commands = set()
+        self.drop_once = False
+        self._server = None
+        self._writers = []
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self
+
+    @property
+    def port(self):
+        return self._server.sockets[0].getsockname()[1]
+
+    def url(self, password=None, db=0):
+        auth = f":{password}@" if password else ""
+        return f"redis://{auth}127.0.0.1:{self.port}/{db}"
+
+    async def close(self):
+        self.drop_connections()
+        self._server.close()
+        await self._server.wait_closed()
+
+    def drop_connections(self):
+        for writer in self._writers:
+            writer.close()
+        self._writers.clear()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        self._writers.append(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                args = []
+                for _ in range(int(line[1:])):
+                    length = int((await reader.readline())[1:])
+                    args.append((await reader.readexactly(length + 2))[:-2].decode("utf-8"))
+                self.received.append(tuple(args))
+                if args[0] in self.slow_commands:
+                    await asyncio.sleep(self.slow_commands[args[0]])
+                reply = self._reply(args)
+                if args[0] in self.drop_commands:
+                    if self.drop_once:
+                        self.drop_commands.discard(args[0])
+                    break
+                writer.write(reply)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    def _live(self, key):
+        if key in self.expires and self.expires[key] <= time.monotonic():
+            self.data.pop(key, None)
+            del self.expires[key]
+        return self.data.get(key)
+
+    def _reply(self, args):
+        command, args = args[0].upper(), args[1:]
+        if command in self.fail_commands:
+            return b"-ERR injected failure\r\n"
+        if command == "AUTH":
+            return b"+OK\r\n" if args[0] == self.password else b"-WRONGPASS invalid password\r\n"
+        if command == "SELECT":
+            return b"+OK\r\n"
+        if command == "GET":
+            return encode_bulk(self._live(args[0]))
+        if command == "SET":
+            options = [arg.upper() for arg in args[2:]]
+            if "NX" in options and self._live(args[0]) is not None:
+                return b"$-1\r\n"
+            self.data[args[0]] = args[1]
+            self.expires.pop(args[0], None)
+            if "EX" in options:
+                self.expires[args[0]] = time.monotonic() + int(args[2 + options.index("EX") + 1])
+            return b"+OK\r\n"
+        if command == "DEL":
+            removed = sum(1 for key in args if self.data.pop(key, None) is not None)
+            return b":%d\r\n" % removed
+        if command == "RPUSH":
+            items = self._live(args[0]) or []
+            items.extend(args[1:])
+            self.data[args[0]] = items
+            return b":%d\r\n" % len(items)
+        if command == "LTRIM":
+            items = self._live(args[0]) or []
+            start, stop = int(args[1]), int(args[2])
+            self.data[args[0]] = items[start:(stop + 1) or None]
+            return b"+OK\r\n"
+        if command == "EXPIRE":
+            self.expires[args[0]] = time.monotonic() + int(args[1])
+            return b":1\r\n"
+        if command == "LRANGE":
+            items = self._live(args[0]) or []
+            start, stop = int(args[1]), int(args[2])
+            selected = items[start:(stop + 1) or None]
+            return b"*%d\r\n" % len(selected) + b"".join(encode_bulk(item) for item in selected)
+        return b"-ERR unknown command '%s'\r\n" % command.encode("utf-8")
+
+def encode_bulk(value):
+    if value is None:
+        return b"$-1\r\n"
+    data = value.encode("utf-8")
+    return b"$%d\r\n%s\r\n" % (len(data), data)
@@ -0,0 +1,113 @@
+import json
+import asyncio
+import sqlite3
+
+from services.batch_jobs import BatchJobManager, BatchJobStore
+
+class FakeTranscriber:
+    """Transcribes every recording into three segments "text 0" to "text 2" """
+
+    async def transcribe_file(self, path, language, audio_format, skip_segments=0, previous_text="", background=False):
+        for index in range(skip_segments, 3):
+            yield {
+                "segment": index, "start_ms": index * 1000, "end_ms": (index + 1) * 1000,
+                "text": f"text {index}", "detected_language": "en"
+            }
+
+class FakeTranslate:
+    """Fails the first segment; the third one hangs while hang is set"""
+
+    def __init__(self, hang=False):
+        self.hang = hang
+        self.requests = []
+
+    async def __call__(self, text, source_lang, target_lang):
+        self.requests.append(text)
+        if text == "text 0":
+            raise RuntimeError("upstream failed")
+        if text == "text 2" and self.hang:
+            await asyncio.Event().wait()
+        return text.upper()
+
+async def wait_for(condition, timeout=5):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not await condition():
+        assert loop.time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+def test_store_keeps_translation_errors(tmp_path):
+    store = BatchJobStore(str(tmp_path / "jobs.db"))
+    store.create_job("job", [("a.wav", "a.wav", False)], "auto", ["de", "en"], 0)
+    store.save_segment("job", 0, {
+        "segment": 0, "start_ms": 0, "end_ms": 1000, "text": "hello", "detected_language": "en",
+        "translations": {"de": "", "en": "hello"}, "translation_errors": {"de": "upstream failed"}
+    })
+    store.save_segment("job", 0, {
+        "segment": 1, "start_ms": 1000, "end_ms": 2000, "text": "", "detected_language": "en",
+        "translations": {}, "error": "Transcription error: timeout"
+    })
+    first, second = store.completed_segments("job", 0)
+    assert first["translation_errors"] == {"de": "upstream failed"}
+    assert "error" not in first
+    assert second["error"] == "Transcription error: timeout"
+    assert "translation_errors" not in second
+    store.close()
+
+def test_store_adds_new_columns_to_an_existing_database(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    db = sqlite3.connect(path)
+    db.execute(
+        "CREATE TABLE segments (job_id TEXT NOT NULL, position INTEGER NOT NULL, segment INTEGER NOT NULL, "
+        "start_ms INTEGER, end_ms INTEGER, text TEXT NOT NULL, detected_language TEXT, translations TEXT NOT NULL, "
+        "error TEXT, PRIMARY KEY (job_id, position, segment))"
+    )
+    db.execute("INSERT INTO segments VALUES ('job', 0, 0, 0, 1000, 'hello', 'en', '{}', NULL)")
+    db.commit()
+    db.close()
+
+    store = BatchJobStore(path)
+    assert store.completed_segments("job", 0) == [{
+        "segment": 0, "start_ms": 0, "end_ms": 1000, "text": "hello", "detected_language": "en", "translations": {}
+    }]
+    store.close()
+
+def test_batch_jobs_are_disabled_by_default():
+    manager = BatchJobManager(FakeTranscriber(), FakeTranslate())
+    assert not manager.enabled
+
+def test_resumed_recording_counts_earlier_failed_translations(tmp_path):
+    async def main():
+        recording = tmp_path / "lecture.wav"
+        recording.write_bytes(b"RIFF")
+
+        # The first run stops while the third segment is being translated
+        translate = FakeTranslate(hang=True)
+        manager = BatchJobManager(FakeTranscriber(), translate, batch_dir=str(tmp_path / "batch"), workers=1)
+        await manager.start()
+        job = await manager.submit([(str(recording), "lecture.wav", False)], "en", ["de"])
+
+        async def two_segments_saved():
+            return manager.segments_done == 2
+        await wait_for(two_segments_saved)
+        await manager.close()
+
+        translate = FakeTranslate()
+        manager = BatchJobManager(FakeTranscriber(), translate, batch_dir=str(tmp_path / "batch"), workers=1)
+        await manager.start()
+        assert manager.resumed_files == 1
+
+        async def completed():
+            return (await manager.get_job(job["job_id"]))["status"] == "completed"
+        await wait_for(completed)
+        await manager.close()
+
+        # Only the unfinished segment was translated again
+        assert translate.requests == ["text 2"]
+        lines = [json.loads(line) for line in manager.results_path(job["job_id"]).read_text().splitlines()]
+        (file_result,) = [line for line in lines if line["type"] == "file_result"]
+        assert file_result["success"]
+        assert file_result["segments"] == 3
+        assert file_result["failed_translations"] == {"de": 1}
+        assert file_result["translations"]["de"] == "TEXT 1 TEXT 2"
+    asyncio.run(main())
@@ -0,0 +1,18 @@
+from services.fallback_translation import (
+    GoogleWebTranslationProvider, GoogletransProvider, create_fallback_provider, split_text
+)
+
+def test_split_text_at_sentence_ends():
+    text = "First sentence. Second sentence! Third one?"
+    assert split_text(text, 20) == ["First sentence.", "Second sentence!", "Third one?"]
+    assert split_text(text, 40) == ["First sentence. Second sentence!", "Third one?"]
+
+def test_split_text_without_sentence_ends():
+    assert split_text("one two three four", 9) == ["one two", "three", "four"]
+    assert split_text("abcdefghij", 4) == ["abcd", "efgh", "ij"]
+
+def test_unknown_provider_falls_back_to_googletrans(capsys):
+    assert isinstance(create_fallback_provider("google_web"), GoogleWebTranslationProvider)
+    provider = create_fallback_provider("deepl")
+    assert isinstance(provider, GoogletransProvider)
+    assert "Unknown FALLBACK_TRANSLATION_PROVIDER 'deepl'" in capsys.readouterr().out
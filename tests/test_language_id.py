@@ -0,0 +1,56 @@
+import asyncio
+
+from services.language_id import LanguageIdentifier
+from services.stt_service import STTService
+
+class RecordingProvider:
+    """Fallback provider stub that records the source languages it was asked for"""
+
+    def __init__(self):
+        self.requests = []
+
+    async def translate(self, text, source_lang, target_lang):
+        self.requests.append((text, source_lang, target_lang))
+        return f"[{target_lang}] {text}", source_lang
+
+def test_identifies_long_texts():
+    identifier = LanguageIdentifier()
+    assert identifier.resolve("Where is the train station, please?", "auto", "de") == "en"
+    assert identifier.resolve("Ich weiß nicht, wo der Bahnhof ist.", "auto", "en") == "de"
+    assert identifier.resolve("¿Dónde está la estación de tren?", "auto", "de") == "es"
+    assert identifier.resolve("Как добраться до вокзала?", "auto", "de") == "ru"
+
+def test_short_texts_are_left_to_upstream_detection():
+    identifier = LanguageIdentifier()
+    # Both look German to the trigram profiles
+    assert identifier.resolve("Die hard", "auto", "en") == "auto"
+    assert identifier.resolve("Bitte", "auto", "en") == "auto"
+    assert identifier.stats()["too_short"] == 2
+
+def test_target_language_guess_is_left_to_upstream_detection():
+    identifier = LanguageIdentifier()
+    assert identifier.resolve("Ich weiß nicht, wo der Bahnhof ist.", "auto", "de") == "auto"
+    assert identifier.resolve("Ich weiß nicht, wo der Bahnhof ist.", "auto", "de-DE") == "auto"
+    assert identifier.stats()["same_as_target"] == 2
+
+def test_ambiguous_texts_are_left_to_upstream_detection():
+    identifier = LanguageIdentifier()
+    assert identifier.resolve("12345 67890 !!! ???", "auto", "de") == "auto"
+    assert identifier.resolve("Taxi Hotel Restaurant Pizza", "auto", "de") == "auto"
+
+def test_known_source_language_is_kept():
+    identifier = LanguageIdentifier()
+    assert identifier.resolve("Bitte", "de", "en") == "de"
+    assert LanguageIdentifier(enabled=False).resolve("Where is the train station?", "auto") == "auto"
+
+def test_english_text_is_translated_into_german():
+    async def main():
+        provider = RecordingProvider()
+        service = STTService(provider=provider)
+        service.cache = None  # Disable the shared cache
+        assert await service.recognize("Die hard", "auto", "de") == "[de] Die hard"
+        assert await service.recognize("Bitte", "auto", "de") == "[de] Bitte"
+        assert provider.requests == [("Die hard", "auto", "de"), ("Bitte", "auto", "de")]
+        # A source language given by the client still skips translation into the same language
+        assert await service.recognize("Bitte", "de", "de") == "Bitte"
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+import json
+import asyncio
+
+from services.long_audio import LongAudioTranscriber, count_repeated_words
+
+class FakePreprocessor:
+    """Cuts every recording into the given segments"""
+
+    def __init__(self, segments):
+        self.segments = segments
+
+    async def split(self, audio_bytes, audio_format, **options):
+        return self.segments, "wav"
+
+class FakeWhisper:
+    """Transcribes segment audio b"<n>" as texts[n] after delays[n]"""
+
+    def __init__(self, texts, delays):
+        self.texts = texts
+        self.delays = delays
+        self.running = 0
+        self.max_running = 0
+
+    async def transcribe_audio(self, audio_bytes, language, audio_format=None, preprocess=True, background=False):
+        index = int(audio_bytes)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(self.delays[index])
+        self.running -= 1
+        return {"text": self.texts[index], "detected_language": "en"}
+
+def transcriber_for(texts, delays, parallelism=4):
+    segments = [(index * 1000, (index + 1) * 1000, str(index).encode()) for index in range(len(texts))]
+    whisper = FakeWhisper(texts, delays)
+    return LongAudioTranscriber(whisper, FakePreprocessor(segments), parallelism=parallelism), whisper
+
+def test_count_repeated_words():
+    assert count_repeated_words("and then we went".split(), "We went home".split(), 10) == 2
+    # A fragment word before the overlap is dropped with it
+    assert count_repeated_words("we went home.".split(), "me, went home, and slept".split(), 10) == 3
+    assert count_repeated_words("hello there".split(), "something else".split(), 10) == 0
+
+def test_segments_are_transcribed_in_parallel_and_stitched_in_order():
+    async def main():
+        texts = ["Good morning everyone", "everyone, today we", "Transcription error: timeout", "the end"]
+        transcriber, whisper = transcriber_for(texts, [0.05, 0.01, 0, 0.02], parallelism=2)
+        results = [segment async for segment in transcriber.transcribe(b"", "en", "wav")]
+        assert whisper.max_running == 2
+        assert [(segment["segment"], segment["text"]) for segment in results] == [
+            (0, "Good morning everyone"), (1, "today we"), (2, ""), (3, "the end")
+        ]
+        assert results[2]["error"] == "Transcription error: timeout"
+        assert transcriber.stats()["failed_segments"] == 1
+    asyncio.run(main())
+
+def test_resumed_transcription_skips_finished_segments():
+    async def main():
+        transcriber, _ = transcriber_for(["one two", "two three", "three four"], [0, 0, 0])
+        results = [
+            segment async for segment in transcriber.transcribe(b"", "en", "wav", skip_segments=1, previous_text="one two")
+        ]
+        assert [(segment["segment"], segment["text"]) for segment in results] == [(1, "three"), (2, "four")]
+    asyncio.run(main())
+
+def test_ndjson_stream_reports_failed_translations(monkeypatch):
+    from api import routes
+
+    async def main():
+        transcriber, _ = transcriber_for(["Hello there.", "there. Bye."], [0.01, 0])
+        monkeypatch.setattr(routes, "long_audio_transcriber", transcriber)
+
+        async def translate_text(text, source_lang, target_lang, session_id):
+            if target_lang == "fr" and text == "Bye.":
+                raise RuntimeError("upstream failed")
+            return f"{target_lang}:{text}", "fake"
+        monkeypatch.setattr(routes, "translate_text", translate_text)
+
+        lines = [json.loads(line) async for line in routes.stream_long_transcription(b"", "en", ["de", "fr"])]
+        assert [line["type"] for line in lines[:2]] == ["segment", "segment"]
+        assert lines[1]["text"] == "Bye."
+        assert {(line["segment"], line["target_language"]) for line in lines if line["type"] == "segment_translation"} == {
+            (0, "de"), (0, "fr"), (1, "de"), (1, "fr")
+        }
+        result = lines[-1]
+        assert result["type"] == "result" and result["success"]
+        assert result["text"] == "Hello there. Bye."
+        assert result["translations"] == {"de": "de:Hello there. de:Bye.", "fr": "fr:Hello there."}
+        assert result["failed_translations"] == {"de": 0, "fr": 1}
+    asyncio.run(main())
@@ -0,0 +1,43 @@
+from services.quranic_matcher import PhraseMatcher, QuranicMatcher, normalize_arabic
+
+ADDRESSES = {
+    "قل": "Sprich",
+    "يا أيها الناس": "O ihr Menschen",
+}
+
+def make_matcher():
+    return QuranicMatcher(["سورة", "قل"], ADDRESSES)
+
+def test_phrase_inside_a_word_is_ignored():
+    assert make_matcher().scan("هذا عقل كبير") == (False, [])
+
+def test_phrase_at_word_start_or_end_inside_a_word_is_ignored():
+    matcher = make_matcher()
+    assert matcher.scan("قلم") == (False, [])
+    assert matcher.scan("سورتها") == (False, [])
+
+def test_whole_word_matches_at_text_boundaries():
+    assert make_matcher().scan("قل") == (True, [("قل", "Sprich")])
+
+def test_whole_word_matches_between_spaces_and_punctuation():
+    matcher = make_matcher()
+    assert matcher.scan("ثم قل هو الله أحد") == (True, [("قل", "Sprich")])
+    assert matcher.scan("«قل»، هو الله") == (True, [("قل", "Sprich")])
+
+def test_diacritized_text_matches_after_normalization():
+    has_marker, addresses = make_matcher().scan("يَا أَيُّهَا النَّاسُ اتَّقُوا رَبَّكُمُ")
+    assert not has_marker
+    assert addresses == [("يا أيها الناس", "O ihr Menschen")]
+
+def test_multi_word_phrase_must_end_at_a_word_boundary():
+    assert make_matcher().scan("يا أيها الناسك") == (False, [])
+
+def test_overlapping_phrases_are_matched_independently():
+    matcher = PhraseMatcher(["ab", "b", "abc"])
+    assert matcher.find_all("ab") == {0}
+    assert matcher.find_all("x b y") == {1}
+    assert matcher.find_all("abc ab") == {0, 2}
+    assert matcher.find_all("xabc") == set()
+
+def test_normalize_arabic_folds_letter_variants():
+    assert normalize_arabic("إِبْرَاهِيمَ  آية") == "ابراهيم ايه"
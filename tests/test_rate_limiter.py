@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+from services.rate_limiter import RateLimiter, ServiceBusyError, UpstreamRateLimited, parse_duration
+
+class FakeResponse:
+    def __init__(self, status, headers=None):
+        self.status = status
+        self.headers = headers or {}
+
+def test_workers_share_the_budgets():
+    limiter = RateLimiter(max_concurrency=16, rates={"chat": 120, "audio": 0}, live_reserve=4, workers=4)
+    stats = limiter.stats()
+    assert stats["max_concurrency"] == 4
+    assert stats["per_minute"] == {"chat": 30, "audio": 0}
+    assert stats["live_reserve"] == 3
+    assert RateLimiter(max_concurrency=2, workers=8).stats()["max_concurrency"] == 1
+
+def test_parse_duration():
+    assert parse_duration("1.5") == 1.5
+    assert parse_duration("2m59.5s") == 179.5
+    assert parse_duration("120ms") == pytest.approx(0.12)
+    assert parse_duration("") is None
+    assert parse_duration("soon") is None
+
+def test_concurrency_limit_and_shedding():
+    async def main():
+        limiter = RateLimiter(max_concurrency=2, max_queue=1, queue_timeout=5, rates={}, live_reserve=0, workers=1)
+        release = asyncio.Event()
+        in_flight = []
+
+        async def attempt():
+            in_flight.append(1)
+            await release.wait()
+            return "done"
+
+        running = [asyncio.create_task(limiter.run("chat", "a", attempt)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        assert len(in_flight) == 2 and limiter.stats()["waiting"] == 1
+        # The queue is full: the next request is shed right away
+        with pytest.raises(ServiceBusyError):
+            await limiter.run("chat", "b", attempt)
+        release.set()
+        assert await asyncio.gather(*running) == ["done"] * 3
+        assert limiter.stats()["in_flight"] == 0
+    asyncio.run(main())
+
+def test_waiting_sessions_are_served_round_robin():
+    async def main():
+        limiter = RateLimiter(max_concurrency=1, rates={}, live_reserve=0, workers=1)
+        release = asyncio.Event()
+        order = []
+
+        def attempt_for(name):
+            async def attempt():
+                order.append(name)
+                await release.wait()
+            return attempt
+
+        blocker = asyncio.create_task(limiter.run("chat", "busy", attempt_for("first")))
+        await asyncio.sleep(0)
+        tasks = [asyncio.create_task(limiter.run("chat", "busy", attempt_for(f"busy{index}"))) for index in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(limiter.run("chat", "quiet", attempt_for("quiet"))))
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(blocker, *tasks)
+        # The quiet session does not wait for all of the busy session's requests
+        assert order.index("quiet") < order.index("busy1")
+    asyncio.run(main())
+
+def test_rate_limited_requests_are_retried_then_shed():
+    async def main():
+        limiter = RateLimiter(max_retries=2, base_delay=0.001, max_delay=0.001, rates={}, workers=1)
+        calls = 0
+
+        async def attempt():
+            nonlocal calls
+            calls += 1
+            limiter.check_response("chat", FakeResponse(429))
+
+        with pytest.raises(ServiceBusyError):
+            await limiter.run("chat", "a", attempt)
+        assert calls == 3
+        assert limiter.stats()["retries"] == 2 and limiter.stats()["throttled"] == 3
+
+        async def succeed_second_time():
+            nonlocal calls
+            calls += 1
+            if calls == 4:
+                raise UpstreamRateLimited(503)
+            return "ok"
+
+        assert await limiter.run("chat", "a", succeed_second_time) == "ok"
+    asyncio.run(main())
+
+def test_background_requests_leave_live_reserve():
+    async def main():
+        limiter = RateLimiter(max_concurrency=3, rates={}, live_reserve=1, workers=1)
+        release = asyncio.Event()
+        started = []
+
+        def attempt_for(name):
+            async def attempt():
+                started.append(name)
+                await release.wait()
+            return attempt
+
+        background = [
+            asyncio.create_task(limiter.run("chat", None, attempt_for(f"batch{index}"), background=True))
+            for index in range(3)
+        ]
+        await asyncio.sleep(0.01)
+        assert started == ["batch0", "batch1"]
+        live = asyncio.create_task(limiter.run("chat", "a", attempt_for("live")))
+        await asyncio.sleep(0.01)
+        assert started[-1] == "live"
+        release.set()
+        await asyncio.gather(live, *background)
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from services.request_coalescer import RequestCoalescer
+
+def test_identical_requests_share_one_upstream_call():
+    async def main():
+        coalescer = RequestCoalescer()
+        calls = []
+
+        def request_for(text):
+            async def request():
+                calls.append(text)
+                await asyncio.sleep(0.01)
+                return text.upper()
+            return request
+
+        results = await asyncio.gather(
+            coalescer.run("hello", request_for("hello")),
+            coalescer.run("hello", request_for("hello")),
+            coalescer.run("bye", request_for("bye"))
+        )
+        assert results == ["HELLO", "HELLO", "BYE"]
+        assert calls == ["hello", "bye"]
+        assert coalescer.stats()["deduplicated"] == 1 and coalescer.stats()["in_flight"] == 0
+
+        # A finished request is not reused
+        assert await coalescer.run("hello", request_for("hello")) == "HELLO"
+        assert calls == ["hello", "bye", "hello"]
+    asyncio.run(main())
+
+def test_errors_reach_every_caller():
+    async def main():
+        coalescer = RequestCoalescer()
+
+        async def request():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream failed")
+
+        results = await asyncio.gather(
+            coalescer.run("key", request), coalescer.run("key", request), return_exceptions=True
+        )
+        assert [str(result) for result in results] == ["upstream failed"] * 2
+    asyncio.run(main())
+
+def test_request_is_cancelled_with_its_last_caller():
+    async def main():
+        coalescer = RequestCoalescer()
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def request():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return "late"
+
+        first = asyncio.create_task(coalescer.run("key", request))
+        second = asyncio.create_task(coalescer.run("key", request))
+        await started.wait()
+
+        # One caller going away leaves the request running for the other
+        first.cancel()
+        await asyncio.sleep(0)
+        assert not cancelled.is_set()
+
+        second.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await second
+        await asyncio.wait_for(cancelled.wait(), 1)
+        assert coalescer.stats()["cancelled"] == 1 and coalescer.stats()["in_flight"] == 0
+    asyncio.run(main())
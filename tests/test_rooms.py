@@ -0,0 +1,96 @@
+import json
+import asyncio
+
+import pytest
+
+from api.rooms import EncodedFrame, Room, RoomError, RoomListener, RoomRegistry
+from services.state_backend import InMemoryStateBackend, RedisStateBackend
+from redis_stub import RedisStub
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+async def check_rooms_stay_on_one_worker(backend):
+    # Two registries on one backend behave like two workers
+    first, second = RoomRegistry(backend), RoomRegistry(backend)
+    room = await first.join_publisher("lecture", "publisher-session")
+
+    listener = RoomListener(FakeWebSocket())
+    with pytest.raises(RoomError) as error:
+        await second.join_listener("lecture", listener)
+    assert error.value.close_code == 1013
+    assert second.stats()["rejected_joins"] == 1
+    assert "lecture" not in second.rooms
+
+    assert await first.join_listener("lecture", listener) is room
+    await first.leave(room, listener=listener)
+    await first.leave(room, session_id="publisher-session")
+    assert not first.rooms
+
+    # Once the first worker has left the room, another worker can serve it
+    other = await second.join_publisher("lecture", "other-session")
+    assert other.publisher == "other-session"
+    with pytest.raises(RoomError):
+        await first.join_listener("lecture", RoomListener(FakeWebSocket()))
+    await second.leave(other, session_id="other-session")
+
+def test_rooms_stay_on_one_worker_in_memory():
+    asyncio.run(check_rooms_stay_on_one_worker(InMemoryStateBackend()))
+
+def test_rooms_stay_on_one_worker_through_redis():
+    async def main():
+        stub = await RedisStub().start()
+        backend = RedisStateBackend(stub.url())
+        try:
+            await check_rooms_stay_on_one_worker(backend)
+        finally:
+            await backend.close()
+            await stub.close()
+    asyncio.run(main())
+
+def test_single_worker_registry_needs_no_backend():
+    async def main():
+        registry = RoomRegistry()
+        room = await registry.join_publisher("lecture", "session")
+        with pytest.raises(RoomError) as error:
+            await registry.join_publisher("lecture", "another-session")
+        assert error.value.close_code == 1008
+        with pytest.raises(RoomError):
+            await registry.join_publisher("no spaces", "session")
+        await registry.leave(room, session_id="session")
+        assert not registry.rooms
+    asyncio.run(main())
+
+def test_broadcast_reaches_listeners_of_the_frame_language():
+    room = Room("lecture")
+    english, arabic, everything = (
+        RoomListener(FakeWebSocket(), ["en"]), RoomListener(FakeWebSocket(), ["ar"]), RoomListener(FakeWebSocket())
+    )
+    for listener in (english, arabic, everything):
+        room.add_listener(listener)
+    assert sorted(room.languages()) == ["ar", "en"]
+
+    room.broadcast({"type": "processed_speech", "translated_text": "hello", "target_language": "en", "seq": 3})
+    room.broadcast({"type": "session", "session_id": "not forwarded"})
+    assert english.queued() == 1 and arabic.queued() == 0 and everything.queued() == 1
+    frame = json.loads(english._queue[0].text)
+    assert frame["room"] == "lecture" and "seq" not in frame
+
+def test_full_listener_queue_drops_interim_frames_first():
+    listener = RoomListener(FakeWebSocket(), max_queue=2, drop_policy="drop_interim")
+    listener.offer(EncodedFrame("interim_speech", None, "interim"))
+    listener.offer(EncodedFrame("processed_speech", "en", "final 1"))
+    assert listener.offer(EncodedFrame("processed_speech", "en", "final 2")) == 1
+    assert [frame.text for frame in listener._queue] == ["final 1", "final 2"]
+    # An interim frame arriving at a queue of final results is the one missed
+    assert listener.offer(EncodedFrame("interim_speech", None, "late interim")) == 1
+    assert [frame.text for frame in listener._queue] == ["final 1", "final 2"]
+
+    strict = RoomListener(FakeWebSocket(), max_queue=1, drop_policy="disconnect")
+    strict.offer(EncodedFrame("processed_speech", "en", "final"))
+    assert strict.offer(EncodedFrame("processed_speech", "en", "next")) is None
+    assert strict.closed
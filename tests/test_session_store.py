@@ -0,0 +1,59 @@
+import asyncio
+
+from services.session_store import SessionStore
+from services.state_backend import InMemoryStateBackend, RedisStateBackend
+from redis_stub import RedisStub
+
+async def check_shared_context(backend):
+    # Two stores on one backend behave like two workers sharing session state
+    first = SessionStore(backend, history_size=2)
+    second = SessionStore(backend, history_size=2)
+    session_id = SessionStore.new_session_id()
+
+    await first.add_exchange(session_id, "one", "eins", language="de")
+    await first.add_exchange(session_id, "two", "zwei", language="de")
+    await second.add_exchange(session_id, "three", "drei", language="de")
+    await second.add_exchange(session_id, "one", "un", language="fr")
+    await first.set_transcript_context(session_id, "one two three")
+
+    history = await second.get_history(session_id, language="de")
+    assert [(record.original, record.translation) for record in history] == [("two", "zwei"), ("three", "drei")]
+    history = await first.get_history(session_id, limit=1, language="fr")
+    assert [(record.original, record.translation) for record in history] == [("one", "un")]
+    assert await second.get_transcript_context(session_id) == "one two three"
+
+    await second.end_session(session_id, languages=["de", "fr"])
+    assert await first.get_history(session_id, language="de") == []
+    assert await first.get_history(session_id, language="fr") == []
+    assert await first.get_transcript_context(session_id) == ""
+
+def test_stores_share_session_context_in_memory():
+    asyncio.run(check_shared_context(InMemoryStateBackend()))
+
+def test_stores_share_session_context_through_redis():
+    async def main():
+        stub = await RedisStub().start()
+        backend = RedisStateBackend(stub.url())
+        try:
+            await check_shared_context(backend)
+        finally:
+            await backend.close()
+            await stub.close()
+    asyncio.run(main())
+
+def test_sessions_do_not_share_history():
+    async def main():
+        store = SessionStore(InMemoryStateBackend())
+        first, second = SessionStore.new_session_id(), SessionStore.new_session_id()
+        await store.add_exchange(first, "hello", "hallo")
+        assert await store.get_history(second) == []
+        assert len(await store.get_history(first)) == 1
+    asyncio.run(main())
+
+def test_session_id_format():
+    session_id = SessionStore.new_session_id()
+    assert SessionStore.is_valid_session_id(session_id)
+    assert session_id != SessionStore.new_session_id()
+    assert not SessionStore.is_valid_session_id("")
+    assert not SessionStore.is_valid_session_id("session_123")
+    assert not SessionStore.is_valid_session_id(session_id + "x")
@@ -0,0 +1,82 @@
+import asyncio
+
+from services.speculative_translation import SpeculativeTranslator, split_segments
+from services.text_utils import join_segments
+
+class FakeTranslator:
+    """Translates by upper-casing the text and records every request"""
+
+    def __init__(self):
+        self.requests = []
+
+    async def translate(self, text, source_lang, target_lang, session_id, slo_ms=None):
+        self.requests.append(text)
+        await asyncio.sleep(0)
+        return text.upper(), "fake"
+
+def test_split_and_join_segments():
+    assert split_segments("Hello there. How are you? Fine") == ["Hello there.", "How are you?", "Fine"]
+    assert split_segments("你好。再见。") == ["你好。", "再见。"]
+    assert join_segments(["A.", "B."], "de") == "A. B."
+    assert join_segments(["你好。", "再见。"], "zh") == "你好。再见。"
+
+def test_unpunctuated_hypothesis_is_translated_whole():
+    async def main():
+        fake = FakeTranslator()
+        speculator = SpeculativeTranslator(fake.translate)
+        key = ("session", "translate_text", None, "de")
+        assert await speculator.speculate(key, "hello how are", "en", "de") == ("HELLO HOW ARE", "fake")
+        assert await speculator.speculate(key, "hello how are you", "en", "de") == ("HELLO HOW ARE YOU", "fake")
+        # Whole-hypothesis translations are not kept for the final transcript
+        assert speculator.stats()["started"] == 0
+        assert await speculator.finalize(key, "hello how are you", "en", "de") == ("HELLO HOW ARE YOU", "fake")
+        assert fake.requests == ["hello how are", "hello how are you", "hello how are you"]
+    asyncio.run(main())
+
+def test_complete_sentences_are_reused_by_the_final_transcript():
+    async def main():
+        fake = FakeTranslator()
+        speculator = SpeculativeTranslator(fake.translate)
+        key = ("session", "translate_text", None, "de")
+        assert await speculator.speculate(key, "Good morning. How", "en", "de") == ("GOOD MORNING.", "fake")
+        assert await speculator.speculate(key, "Good morning. How are", "en", "de") == ("GOOD MORNING.", "fake")
+        translation, _ = await speculator.finalize(key, "Good morning. How are you?", "en", "de")
+        assert translation == "GOOD MORNING. HOW ARE YOU?"
+        assert fake.requests == ["Good morning.", "How are you?"]
+        assert speculator.stats()["reused"] == 1
+    asyncio.run(main())
+
+def test_revised_sentences_are_not_reused():
+    async def main():
+        fake = FakeTranslator()
+        speculator = SpeculativeTranslator(fake.translate)
+        key = ("session", "translate_text", None, "de")
+        await speculator.speculate(key, "I scream. Then", "en", "de")
+        translation, _ = await speculator.finalize(key, "Ice cream. Then more.", "en", "de")
+        assert translation == "ICE CREAM. THEN MORE."
+        assert speculator.stats()["reused"] == 0
+        assert speculator.stats()["wasted_chars"] == len("I scream.")
+    asyncio.run(main())
+
+def test_unpunctuated_incremental_message_gets_a_frame(monkeypatch):
+    from api import routes
+
+    async def main():
+        fake = FakeTranslator()
+        monkeypatch.setattr(routes, "speculative_translator", SpeculativeTranslator(fake.translate))
+        frames = []
+
+        async def emit(frame):
+            frames.append(frame)
+
+        message = {"action": "translate_text", "text": "good morning everyone", "source_language": "en",
+                   "is_incremental": True}
+        await routes.handle_translate_text(message, emit, "session", ["de"])
+        assert frames == [{
+            "type": "translation_only",
+            "translated_text": "GOOD MORNING EVERYONE",
+            "target_language": "de",
+            "provider": "fake",
+            "is_incremental": True
+        }]
+    asyncio.run(main())
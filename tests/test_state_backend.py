@@ -0,0 +1,232 @@
+import asyncio
+
+import pytest
+
+from services import state_backend as state_backend_module
+from services.state_backend import InMemoryStateBackend, RedisError, RedisStateBackend
+from redis_stub import RedisStub
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(state_backend_module.time, "monotonic", fake)
+    return fake
+
+def run_with_redis(test, **stub_options):
+    """Run test(stub, backend) against a fresh stub server"""
+    async def main():
+        stub = await RedisStub(**stub_options).start()
+        backend = RedisStateBackend(stub.url(stub_options.get("password")), key_prefix="test:")
+        try:
+            await test(stub, backend)
+        finally:
+            await backend.close()
+            await stub.close()
+    asyncio.run(main())
+
+# In-memory backend
+
+def test_memory_set_get_delete():
+    async def main():
+        backend = InMemoryStateBackend()
+        assert await backend.get("missing") is None
+        await backend.set("key", {"value": 1})
+        assert await backend.get("key") == {"value": 1}
+        await backend.delete("key")
+        assert await backend.get("key") is None
+        await backend.delete("key")  # Deleting a missing key is not an error
+    asyncio.run(main())
+
+def test_memory_keys_expire_after_idle_ttl(clock):
+    async def main():
+        backend = InMemoryStateBackend()
+        await backend.set("key", "value", ttl=10)
+        clock.now += 9
+        assert await backend.get("key", ttl=10) == "value"  # A read with a ttl keeps the key alive
+        clock.now += 9
+        assert await backend.get("key") == "value"
+        clock.now += 2
+        assert await backend.get("key") is None  # A read without one does not
+        assert backend.stats()["expirations"] == 1
+
+        await backend.push("list", 1, max_len=3, ttl=10)
+        clock.now += 9
+        assert await backend.range("list", ttl=10) == [1]
+        clock.now += 9
+        assert await backend.range("list") == [1]
+        clock.now += 2
+        assert await backend.range("list") == []
+    asyncio.run(main())
+
+def test_memory_push_keeps_last_items():
+    async def main():
+        backend = InMemoryStateBackend()
+        for item in range(5):
+            await backend.push("list", item, max_len=3)
+        assert await backend.range("list") == [2, 3, 4]
+        assert await backend.range("list", 2) == [3, 4]
+        assert await backend.range("missing") == []
+    asyncio.run(main())
+
+def test_memory_evicts_least_recently_used_keys():
+    async def main():
+        backend = InMemoryStateBackend(max_keys=2)
+        await backend.set("a", 1)
+        await backend.set("b", 2)
+        await backend.get("a")
+        await backend.set("c", 3)
+        assert await backend.get("a") == 1
+        assert await backend.get("b") is None
+        assert await backend.get("c") == 3
+        assert backend.stats()["evictions"] == 1
+    asyncio.run(main())
+
+def test_memory_evicts_to_stay_under_byte_cap():
+    async def main():
+        backend = InMemoryStateBackend(max_bytes=1000)
+        for index in range(10):
+            await backend.set(f"key{index}", "x" * 200)
+        stats = backend.stats()
+        assert stats["bytes"] <= 1000
+        assert stats["evictions"] > 0
+        assert await backend.get("key9") == "x" * 200
+    asyncio.run(main())
+
+# Redis backend against the RESP stub
+
+def test_redis_round_trips_json_values():
+    async def test(stub, backend):
+        await backend.set("key", {"text": "سلام", "count": 2}, ttl=60)
+        assert await backend.get("key") == {"text": "سلام", "count": 2}
+        assert ("SET", "test:key", '{"text": "\\u0633\\u0644\\u0627\\u0645", "count": 2}', "EX", "60") in stub.received
+        await backend.delete("key")
+        assert await backend.get("key") is None
+        assert await backend.get("missing") is None
+    run_with_redis(test)
+
+def test_redis_push_and_range():
+    async def test(stub, backend):
+        for item in range(5):
+            await backend.push("list", ["original", item], max_len=3, ttl=60)
+        assert await backend.range("list") == [["original", 2], ["original", 3], ["original", 4]]
+        assert await backend.range("list", 1) == [["original", 4]]
+        assert await backend.range("missing") == []
+    run_with_redis(test)
+
+def test_redis_authenticates_and_selects_database():
+    async def main():
+        stub = await RedisStub(password="secret").start()
+        backend = RedisStateBackend(stub.url("secret", db=3))
+        try:
+            await backend.get("key")
+            assert stub.received[:2] == [("AUTH", "secret"), ("SELECT", "3")]
+        finally:
+            await backend.close()
+            await stub.close()
+    asyncio.run(main())
+
+def test_redis_failed_authentication_drops_the_connection():
+    async def main():
+        stub = await RedisStub(password="secret").start()
+        backend = RedisStateBackend(stub.url("wrong"))
+        try:
+            with pytest.raises(RedisError):
+                await backend.get("key")
+            assert backend.stats()["open_connections"] == 0
+        finally:
+            await backend.close()
+            await stub.close()
+    asyncio.run(main())
+
+def test_redis_error_reply_is_raised_after_reading_all_replies():
+    async def test(stub, backend):
+        stub.fail_commands.add("LTRIM")
+        with pytest.raises(RedisError):
+            await backend.push("list", "item", max_len=3, ttl=60)
+        stub.fail_commands.clear()
+        # The EXPIRE reply was read with the pipeline, so the next command gets its own reply
+        await backend.set("key", "value")
+        assert await backend.get("key") == "value"
+        assert stub.connections == 1
+    run_with_redis(test)
+
+def test_redis_reconnects_after_the_server_closed_the_connection():
+    async def test(stub, backend):
+        await backend.set("key", "value")
+        stub.drop_connections()
+        await asyncio.sleep(0.01)
+        # The closed idle connection is replaced before anything is sent, so writes work too
+        await backend.push("list", "item", max_len=3)
+        assert await backend.get("key") == "value"
+        assert await backend.range("list") == ["item"]
+        assert stub.connections == 2
+        assert backend.stats()["errors"] == 0
+        assert backend.stats()["reconnects"] == 1
+    run_with_redis(test)
+
+def test_redis_retries_reads_but_not_sent_writes():
+    async def test(stub, backend):
+        await backend.set("key", "value")
+        stub.drop_commands.add("RPUSH")
+        with pytest.raises(ConnectionError):
+            await backend.push("list", "item", max_len=3)
+        assert [args[0] for args in stub.received].count("RPUSH") == 1
+        stub.drop_commands = {"GET"}
+        stub.drop_once = True
+        assert await backend.get("key") == "value"
+        assert [args[0] for args in stub.received].count("GET") == 2
+    run_with_redis(test)
+
+def test_redis_reads_with_ttl_restart_expiry():
+    async def test(stub, backend):
+        await backend.set("key", "value", ttl=60)
+        assert await backend.get("key", ttl=60) == "value"
+        assert ("EXPIRE", "test:key", "60") in stub.received
+        await backend.push("list", "item", max_len=3)
+        assert await backend.range("list", ttl=30) == ["item"]
+        assert stub.received[-1] == ("EXPIRE", "test:list", "30")
+        assert await backend.get("missing", ttl=60) is None
+    run_with_redis(test)
+
+def test_redis_runs_concurrent_commands_on_a_connection_pool():
+    async def main():
+        stub = await RedisStub().start()
+        backend = RedisStateBackend(stub.url(), key_prefix="test:", pool_size=3)
+        try:
+            await backend.set("key", "value")
+            stub.slow_commands["GET"] = 0.1
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            results = await asyncio.gather(*(backend.get("key") for _ in range(6)))
+            # Three connections answer six slow reads in two rounds
+            assert results == ["value"] * 6
+            assert 0.2 <= loop.time() - start < 0.35
+            assert stub.connections == 3
+            assert backend.stats()["open_connections"] == 3
+        finally:
+            await backend.close()
+            await stub.close()
+    asyncio.run(main())
+
+def test_redis_cancelled_command_does_not_leave_its_reply_behind():
+    async def test(stub, backend):
+        await backend.set("slow", "stale")
+        await backend.set("key", "fresh")
+        stub.slow_commands["GET"] = 0.2
+        task = asyncio.create_task(backend.get("slow"))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        stub.slow_commands.clear()
+        # A reused connection would answer with the reply to the cancelled GET
+        assert await backend.get("key") == "fresh"
+        assert stub.connections == 2
+    run_with_redis(test)
@@ -0,0 +1,96 @@
+import asyncio
+
+from services.streaming_stt import StreamingSTTEngine, STREAM_SAMPLE_RATE, VAD_FRAME_MS, SAMPLE_WIDTH
+
+FRAME_BYTES = STREAM_SAMPLE_RATE * VAD_FRAME_MS // 1000 * SAMPLE_WIDTH
+
+class FakeVAD:
+    """Treats any frame with a non-zero sample as speech"""
+
+    def is_speech(self, frame):
+        return any(frame)
+
+class FakeSTT:
+    """Transcribes the n-th segment as "segment n" after the n-th delay, failing the ones in failures"""
+
+    def __init__(self, delays, failures=()):
+        self.delays = delays
+        self.failures = failures
+        self.calls = 0
+
+    async def transcribe_audio(self, audio, language, audio_format=None, session_id=None):
+        index = self.calls
+        self.calls += 1
+        await asyncio.sleep(self.delays[index])
+        if index in self.failures:
+            raise RuntimeError("upstream failed")
+        return {"text": f"segment {index}", "detected_language": "en"}
+
+def speech(ms):
+    return b"\x10\x10" * (FRAME_BYTES // 2) * (ms // VAD_FRAME_MS)
+
+def silence(ms):
+    return bytes(FRAME_BYTES * (ms // VAD_FRAME_MS))
+
+async def stream(delays, follow_up_delays, failures=()):
+    engine = StreamingSTTEngine(FakeSTT(delays, failures), vad=FakeVAD())
+    events = []
+
+    async def translate(result):
+        await asyncio.sleep(follow_up_delays[result["segment"]])
+        events.append(("translation", result["segment"]))
+
+    async def on_result(result):
+        events.append(("transcript", result["segment"], result["text"]))
+        return translate(result)
+
+    session = engine.open_session("session", on_result, input_format="pcm_s16le")
+    for _ in delays:
+        await session.feed(silence(300) + speech(600) + silence(900))
+    await engine.finish_session("session")
+    return engine, events
+
+def test_results_are_released_in_segment_order():
+    async def main():
+        # The first segment is transcribed last; the second fails
+        engine, events = await stream([0.05, 0, 0.01], [0, 0, 0], failures={1})
+        transcripts = [event for event in events if event[0] == "transcript"]
+        assert transcripts == [
+            ("transcript", 0, "segment 0"),
+            ("transcript", 1, "Transcription error: upstream failed"),
+            ("transcript", 2, "segment 2")
+        ]
+        assert engine.stats()["segments_submitted"] == 3
+        assert not engine.sessions
+    asyncio.run(main())
+
+def test_translations_run_concurrently_and_finish_waits_for_them():
+    async def main():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        _, events = await stream([0.01, 0.02, 0.03], [0.2, 0.2, 0.01])
+        # Serial translations would take at least 0.41 s
+        assert loop.time() - start < 0.35
+        assert [event[1] for event in events if event[0] == "transcript"] == [0, 1, 2]
+        # The short translation of the last segment finishes before the earlier ones
+        assert events.index(("translation", 2)) < events.index(("translation", 0))
+        assert len(events) == 6
+    asyncio.run(main())
+
+def test_silence_is_not_uploaded():
+    async def main():
+        engine = StreamingSTTEngine(FakeSTT([0]), vad=FakeVAD())
+        results = []
+
+        async def on_result(result):
+            results.append(result)
+
+        session = engine.open_session("session", on_result, input_format="pcm_s16le")
+        await session.feed(silence(3000))
+        # Too short to be speech
+        await session.feed(speech(120) + silence(900))
+        await engine.finish_session("session")
+        assert results == []
+        assert engine.stats()["segments_submitted"] == 0
+        assert engine.stats()["bytes_received"] == len(silence(3000)) + len(speech(120) + silence(900))
+    asyncio.run(main())
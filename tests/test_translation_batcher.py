@@ -0,0 +1,57 @@
+import asyncio
+
+from services.translation_batcher import TranslationBatcher
+
+class FakeService:
+    """Translates by upper-casing the prompt after a delay and records every request"""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.requests = []
+
+    def build_prompts(self, text, source_lang, target_lang, is_quranic, context):
+        return "translate", text
+
+    def build_batch_prompts(self, texts, source_lang, target_lang):
+        return "translate numbered", "\n".join(f"[{index}] {text}" for index, text in enumerate(texts, 1))
+
+    def clean_translation(self, text):
+        return text
+
+    async def _request_translation(self, system_prompt, user_prompt, context):
+        self.requests.append(user_prompt)
+        await asyncio.sleep(self.delay)
+        return user_prompt.upper(), True
+
+def test_lone_request_is_sent_without_waiting():
+    async def main():
+        service = FakeService(delay=0)
+        batcher = TranslationBatcher(service, window_ms=1000, max_items=8, max_words=8, enabled=True)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        assert await batcher.translate("hello", "en", "de") == ("HELLO", True)
+        assert loop.time() - start < 0.5
+        assert batcher.stats()["immediate"] == 1 and batcher.stats()["batches"] == 0
+    asyncio.run(main())
+
+def test_requests_arriving_while_busy_are_batched():
+    async def main():
+        service = FakeService()
+        batcher = TranslationBatcher(service, window_ms=20, max_items=8, max_words=8, enabled=True)
+        first = asyncio.create_task(batcher.translate("good morning", "en", "de"))
+        await asyncio.sleep(0)
+        rest = [asyncio.create_task(batcher.translate(text, "en", "de")) for text in ("one", "two", "three")]
+        # Another language pair is not busy
+        other = asyncio.create_task(batcher.translate("bonjour", "fr", "de"))
+        results = await asyncio.gather(first, *rest, other)
+        assert results == [("GOOD MORNING", True), ("ONE", True), ("TWO", True), ("THREE", True), ("BONJOUR", True)]
+        assert service.requests == ["good morning", "bonjour", "[1] one\n[2] two\n[3] three"]
+        assert batcher.stats()["immediate"] == 2
+        assert batcher.stats()["batched_items"] == 3
+        assert not batcher._in_flight
+    asyncio.run(main())
+
+def test_parse_batch_translation():
+    assert TranslationBatcher.parse_batch_translation("[1] Eins\n[2] Zwei", 2) == ["Eins", "Zwei"]
+    assert TranslationBatcher.parse_batch_translation("[1] Eins", 2) is None
+    assert TranslationBatcher.parse_batch_translation("[1] Eins\n[1] Zwei", 2) is None
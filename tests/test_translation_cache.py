@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from services import translation_cache as translation_cache_module
+from services.state_backend import InMemoryStateBackend
+from services.translation_cache import TranslationCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(translation_cache_module.time, "monotonic", fake)
+    return fake
+
+class FailingBackend:
+    async def get(self, key):
+        raise ConnectionError("Redis is down")
+
+    async def set(self, key, value, ttl=None):
+        raise ConnectionError("Redis is down")
+
+def test_keys_ignore_case_and_spacing_but_not_context():
+    key = TranslationCache.make_key("Good  morning ", "EN", "de")
+    assert key == TranslationCache.make_key("good morning", "en", "DE")
+    assert key != TranslationCache.make_key("good morning", "en", "de", variant="quranic")
+    assert key != TranslationCache.make_key("good morning", "en", "de", context="Earlier text")
+
+def test_least_recently_used_entries_are_evicted():
+    async def main():
+        cache = TranslationCache(max_entries=2, db_path="")
+        await cache.set("a", "A")
+        await cache.set("b", "B")
+        assert await cache.get("a") == "A"
+        await cache.set("c", "C")
+        assert await cache.get("b") is None
+        assert await cache.get("a") == "A" and await cache.get("c") == "C"
+        assert cache.stats()["evictions"] == 1
+        assert cache.stats()["hits"] == 3 and cache.stats()["misses"] == 1
+    asyncio.run(main())
+
+def test_entries_expire(clock):
+    async def main():
+        cache = TranslationCache(ttl=60, db_path="")
+        await cache.set("a", "A")
+        clock.now += 59
+        assert await cache.get("a") == "A"
+        clock.now += 2
+        assert await cache.get("a") is None
+        assert cache.stats()["expirations"] == 1 and cache.stats()["entries"] == 0
+    asyncio.run(main())
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    async def main():
+        path = str(tmp_path / "cache.db")
+        cache = TranslationCache(db_path=path)
+        await cache.set("a", "A")
+        cache.close()
+
+        restarted = TranslationCache(db_path=path)
+        assert await restarted.get("a") == "A"
+        assert restarted.stats()["disk_hits"] == 1
+        # Promoted to the memory tier
+        assert await restarted.get("a") == "A"
+        assert restarted.stats()["disk_hits"] == 1
+        restarted.close()
+    asyncio.run(main())
+
+def test_shared_tier(capsys):
+    async def main():
+        backend = InMemoryStateBackend()
+        first = TranslationCache(db_path="", shared_backend=backend)
+        second = TranslationCache(db_path="", shared_backend=backend)
+        await first.set("a", "A")
+        assert await second.get("a") == "A"
+        assert second.stats()["shared_hits"] == 1
+
+        # An outage of the shared tier only costs cache hits
+        failing = TranslationCache(db_path="", shared_backend=FailingBackend())
+        await failing.set("a", "A")
+        assert await failing.get("a") == "A"
+        assert await failing.get("b") is None
+    asyncio.run(main())
+    assert "WARNING: Shared translation cache lookup failed" in capsys.readouterr().out
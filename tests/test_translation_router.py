@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+from services import translation_router
+from services.rate_limiter import ServiceBusyError
+from services.translation_router import TranslationBackend, TranslationError, TranslationRouter
+
+def fake_backend(name, delay=0, error=None):
+    """A backend answering "<name>: <text>" after delay, or raising error"""
+    calls = []
+
+    async def translate(text, source_lang, target_lang, session_id):
+        calls.append(text)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return f"{name}: {text}"
+
+    backend = TranslationBackend(name, translate)
+    backend.calls = calls
+    return backend
+
+def test_phrases_prefer_the_phrase_backend():
+    basic, groq = fake_backend("basic"), fake_backend("groq")
+    router = TranslationRouter([basic, groq], phrase_backend="groq")
+    assert router.plan("hello") == [basic, groq]
+    assert router.plan("good morning everyone") == [groq, basic]
+    assert router.plan("hello", preferred="groq") == [groq, basic]
+
+def test_slo_skips_a_backend_that_usually_misses_it():
+    slow, fast = fake_backend("slow"), fake_backend("fast")
+    for _ in range(translation_router.ROUTER_MIN_SAMPLES):
+        slow.record(0.8, True)
+        fast.record(0.1, True)
+    router = TranslationRouter([slow, fast])
+    assert router.plan("hello") == [slow, fast]
+    assert router.plan("hello", slo_ms=500) == [fast, slow]
+
+def test_failure_fails_over_to_the_next_backend():
+    async def main():
+        groq, basic = fake_backend("groq", error=RuntimeError("timeout")), fake_backend("basic")
+        router = TranslationRouter([groq, basic])
+        assert await router.translate("hello", "en", "de") == ("basic: hello", "basic")
+        assert groq.stats()["errors"] == 1 and basic.stats()["errors"] == 0
+    asyncio.run(main())
+
+def test_every_backend_failing_raises():
+    async def main():
+        router = TranslationRouter([
+            fake_backend("groq", error=ServiceBusyError("busy")),
+            fake_backend("basic", error=RuntimeError("no connection"))
+        ])
+        # The real error is reported rather than the busy one
+        with pytest.raises(TranslationError, match="no connection"):
+            await router.translate("hello", "en", "de")
+
+        busy = TranslationRouter([fake_backend("groq", error=ServiceBusyError("busy"))])
+        with pytest.raises(ServiceBusyError):
+            await busy.translate("hello", "en", "de")
+    asyncio.run(main())
+
+def test_slow_backend_is_hedged():
+    async def main():
+        slow, fast = fake_backend("slow", delay=2), fake_backend("fast", delay=0.01)
+        router = TranslationRouter([slow, fast])
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        # Without latency samples the hedge waits half of the SLO
+        assert await router.translate("hello", "en", "de", slo_ms=400) == ("fast: hello", "fast")
+        assert loop.time() - start < 1
+        assert fast.stats()["hedges"] == 1 and fast.stats()["hedges_won"] == 1
+        # The cancelled request counts as neither success nor error
+        assert slow.stats()["requests"] == 1 and slow.stats()["errors"] == 0
+        assert not slow.outcomes
+    asyncio.run(main())
+
+def test_circuit_opens_and_a_probe_closes_it(monkeypatch):
+    async def main():
+        failing = fake_backend("groq", error=RuntimeError("timeout"))
+        basic = fake_backend("basic")
+        router = TranslationRouter([failing, basic])
+        for _ in range(translation_router.ROUTER_MAX_CONSECUTIVE_FAILURES):
+            await router.translate("hello", "en", "de")
+        assert failing.stats()["state"] == "open" and failing.stats()["circuit_opened"] == 1
+
+        # While the circuit is open the failing backend is not called
+        calls = len(failing.calls)
+        assert await router.translate("hello", "en", "de") == ("basic: hello", "basic")
+        assert len(failing.calls) == calls
+
+        # After the wait one probe goes through; its success closes the circuit
+        monkeypatch.setattr(translation_router, "ROUTER_OPEN_SECONDS", 0)
+        healthy = fake_backend("groq")
+        failing.translate = healthy.translate
+        assert await router.translate("hello", "en", "de") == ("groq: hello", "groq")
+        assert failing.stats()["state"] == "closed" and failing.stats()["error_rate"] == 0
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+import json
+import struct
+import asyncio
+
+from api.ws_pipeline import ConnectionPipeline, decode_binary_frame
+
+class FakeWebSocket:
+    """Records the frames a pipeline sends"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_json(self, frame):
+        self.sent.append(frame)
+
+def make_handler(delays):
+    """Reply to each message after the delay given for its text"""
+    async def handler(message, emit):
+        await asyncio.sleep(delays.get(message["text"], 0))
+        await emit({"type": "translation_only", "translated_text": message["text"].upper()})
+    return handler
+
+async def run_messages(messages, delays):
+    websocket = FakeWebSocket()
+    pipeline = ConnectionPipeline(websocket, make_handler(delays))
+    sender = asyncio.create_task(pipeline._send_loop())
+    jobs = [await pipeline.submit(message) for message in messages]
+    await asyncio.gather(*(job.task for job in jobs), return_exceptions=True)
+    while pipeline._outgoing.qsize():
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.01)
+    sender.cancel()
+    return websocket.sent, pipeline
+
+def test_overlapping_final_messages_keep_their_order():
+    async def main():
+        # The first translation is slower than the second; clients without utterance IDs get them in order
+        sent, _ = await run_messages(
+            [{"action": "translate_text", "text": "first"}, {"action": "translate_text", "text": "second"}],
+            {"first": 0.05}
+        )
+        assert [(frame["seq"], frame["translated_text"]) for frame in sent] == [(0, "FIRST"), (1, "SECOND")]
+    asyncio.run(main())
+
+def test_different_utterances_do_not_wait_for_each_other():
+    async def main():
+        sent, _ = await run_messages(
+            [
+                {"action": "translate_text", "text": "slow", "utterance_id": "a"},
+                {"action": "translate_text", "text": "fast", "utterance_id": "b"},
+                {"action": "translate_text", "text": "after", "utterance_id": "a"}
+            ],
+            {"slow": 0.05}
+        )
+        assert [frame["translated_text"] for frame in sent] == ["FAST", "SLOW", "AFTER"]
+        assert [frame["utterance_id"] for frame in sent] == ["b", "a", "a"]
+    asyncio.run(main())
+
+def test_newer_update_supersedes_incremental_update():
+    async def main():
+        sent, pipeline = await run_messages(
+            [
+                {"action": "translate_text", "text": "interim", "is_incremental": True},
+                {"action": "translate_text", "text": "final"}
+            ],
+            {"interim": 0.05}
+        )
+        assert [frame["translated_text"] for frame in sent] == ["FINAL"]
+        assert pipeline.stats()["superseded"] == 1
+    asyncio.run(main())
+
+def test_decode_binary_frame():
+    header = json.dumps({"action": "process_audio", "language": "en"}).encode("utf-8")
+    message = decode_binary_frame(struct.pack(">H", len(header)) + header + b"\x01\x02")
+    assert message["action"] == "process_audio"
+    assert bytes(message["audio_bytes"]) == b"\x01\x02"